@@ -1,15 +1,34 @@
+import functools
+import time
+
 import numpy as np
 import streamlit as st
 import pandas as pd
 from src.utils.download_utils import download_file
-from src.data_loader import load_processed_data
-from src.data_loader import load_processed_data
+from src.app_state import load_app_state
+from src.parquet_layout import TEXT_COLUMN
 from src.nlp_matcher import (
-    load_all_embeddings,
     find_top_matches,
+    MatchCursor,
+    MAX_RANKED_RESULTS,
+    embeddings_file_exists,
+    embeddings_version,
+    build_explanation_prompt,
+    build_batch_explanation_prompt,
+    parse_batch_explanations,
+    BATCH_MAX_TOKENS_PER_CANDIDATE,
     # get_llm_explanation_for_match,
     # get_single_embedding
 )
+from src.reranker import RERANK_TOP_K, rerank_completed, rerank_matches
+from src.chat_llm import llm_available, load_llm_model
+from src.explanation_worker import LLM_EXPLANATION_MODE, get_explanation_worker
+from src.match_explainer import explain_match, load_segment_index
+from src.clustering import DEFAULT_N_PROBE
+from src.result_cache import match_result_cache
+from src.analytics import FUNNEL_STAGES, analytics_version, get_analytics_engine
+from src.staffing_optimizer import DEFAULT_MAX_PER_CANDIDATE, DEFAULT_PER_JOB, optimize_staffing
+from src.utils import metrics
 
 # Arquivos necessários e seus caminhos remotos
 FILE_URLS = {
@@ -38,20 +57,47 @@ FILE_URLS = {
         "data/processed_data/vagas.parquet"
     )
 }
-# Baixar os arquivos, se necessário
-for name, (url, path) in FILE_URLS.items():
-    try:
-        download_file(url, path)
-    except Exception as e:
+# Baixar os arquivos, se necessário (uma vez por processo: as reexecuções não refazem as verificações)
+@st.cache_resource(show_spinner="Verificando arquivos de dados...")
+def ensure_data_files():
+    """Baixa os arquivos que faltam; devolve as falhas (nome, erro)."""
+    falhas = []
+    for name, (url, path) in FILE_URLS.items():
+        if name.endswith('_embeddings') and embeddings_file_exists(path):
+            continue  # Embeddings locais (.npy ou .pkl) já disponíveis
+        try:
+            download_file(url, path)
+        except Exception as e:
+            falhas.append((name, e))
+    return falhas
+
+
+# Tempo de servidor da execução completa do script; os fragments medem as próprias
+# reexecuções em app_rerun_seconds{scope=...}
+app_run_start = time.perf_counter()
+falhas_download = ensure_data_files()
+if falhas_download:
+    # Falha (p.ex. rede) não fica em cache: a próxima execução tenta de novo
+    ensure_data_files.clear()
+    for name, e in falhas_download:
         st.error(f"Erro ao baixar {name}: {e}")
 
 st.set_page_config(layout='wide')
 
+# Exportadores de métricas (endpoint Prometheus / dump JSON), se habilitados
+metrics.start_from_env()
+
 st.set_page_config(page_title='Projeto Datathon')
 st.title('Matching de candidatos')
 
-with st.spinner("Carregando embeddings pré-gerados..."):
-    df_jobs, df_applicants, df_prospects = load_processed_data()
+# Muda quando novos embeddings são publicados, invalidando os caches
+embeddings_version_id = embeddings_version()
+# Dados, embeddings, textos, shards e clusters: um único objeto por processo
+# (st.cache_resource), sem cópia a cada reexecução
+app_state = load_app_state(embeddings_version_id)
+df_jobs, df_applicants, df_prospects = app_state['jobs'], app_state['applicants'], app_state['prospects']
+job_display_names = app_state['job_display_names']
+job_positions = app_state['job_positions']
 
 
 if df_jobs.empty or df_applicants.empty:
@@ -61,16 +107,29 @@ st.success(f'Dados carregados com sucesso: ||'
            + f'Vagas:{len(df_jobs)} || Candidatos:{len(df_applicants)}||'
            + f'Prospects:{len(df_prospects)}')
 
-with st.spinner("Carregando embeddings pré-gerados..."):
-    embeddings_data = load_all_embeddings()
-
-    # Extrai os arrays de embeddings e seus IDs correspondentes
-    vaga_embeddings = embeddings_data['jobs']['embeddings']
-    vaga_ids = embeddings_data['jobs']['ids']
-    candid_embeddings = embeddings_data['applicants']['embeddings']
-    candid_ids = embeddings_data['applicants']['ids']
-    prospect_embeddings = embeddings_data['prospects']['embeddings']
-    prospect_ids = embeddings_data['prospects']['ids']
+embeddings_data = app_state['embeddings']
+# Extrai os arrays de embeddings e seus IDs correspondentes
+vaga_embeddings = embeddings_data['jobs']['embeddings']
+vaga_ids = embeddings_data['jobs']['ids']
+candid_embeddings = embeddings_data['applicants']['embeddings']
+candid_ids = embeddings_data['applicants']['ids']
+prospect_embeddings = embeddings_data['prospects']['embeddings']
+prospect_ids = embeddings_data['prospects']['ids']
+# Projeção aplicada às consultas quando os alvos estão reduzidos (PCA); senão None
+candid_projection = embeddings_data['applicants'].get('projection')
+prospect_projection = embeddings_data['prospects'].get('projection')
+
+# Textos processados por id, lidos sob demanda (prompts e reranking)
+candid_texts = app_state['texts']['applicants']
+prospect_texts = app_state['texts']['prospects']
+
+# Busca particionada em processos locais (SEARCH_SHARDS >= 2); senão None
+candid_searcher = app_state['searchers']['applicants']
+prospect_searcher = app_state['searchers']['prospects']
+
+# Artefatos opcionais de scripts/build_candidate_clusters.py
+candid_clusters = app_state['clusters']
+candid_umap = app_state['umap']
 
 if vaga_embeddings is None or candid_embeddings is None:
     st.error("Erro ao carregar embeddings. Verifique o módulo nlp_matcher e os logs.")
@@ -80,15 +139,95 @@ st.success("Embeddings prontos para matching!")
 st.header("Ferramenta de Matching")
 
 
-job_display_names = [
-    # f"{idx} - {jobs_df.loc[idx]['informacoes_basicas']['titulo_vaga']}" for idx in jobs_df.index]
-    f"{valor['id_vaga']} - {valor['titulo_vaga']} " for _, valor in df_jobs.iterrows()
-]
-selected_job_display = st.selectbox("Selecione uma Vaga:", job_display_names)
-
-
-selected_job_id = None
-if selected_job_display:
+# Explicação extrativa (sem LLM): pares de trechos mais parecidos e termos em comum
+def render_extractive_explanation(explanation):
+    with st.expander("Por que este match? (trechos mais parecidos)"):
+        if explanation['terms']:
+            st.write("**Termos em comum:** " + ", ".join(explanation['terms']))
+        st.write("**Campos do perfil mais próximos da vaga:** " + ", ".join(
+            f"{campo} ({similarity:.2f})" for campo, similarity in explanation['fields']))
+        for job_text, candidate_text, campo, similarity in explanation['pairs']:
+            st.markdown(
+                f"- **Vaga:** {job_text}\n\n  **Perfil ({campo}):** {candidate_text} (similaridade {similarity:.2f})")
+
+
+# Paginação dos resultados: a primeira página mostra FIRST_PAGE_SIZE matches e cada
+# clique em "Mostrar próximos" acrescenta PAGE_SIZE, fatiando o ranking já calculado
+FIRST_PAGE_SIZE = 5
+PAGE_SIZE = 20
+
+
+def show_more_matches():
+    st.session_state['match_results']['shown'] += PAGE_SIZE
+
+
+# Mapa de talentos: projeção UMAP pré-calculada, com os matches em destaque
+def render_talent_map(projection, match_rows, max_points=5000):
+    sample_rows = np.unique(np.linspace(0, len(projection) - 1, max_points).astype(int))
+    points = pd.DataFrame(np.asarray(projection[sample_rows]), columns=['x', 'y'])
+    points['grupo'] = 'Candidatos'
+    matches = pd.DataFrame(np.asarray(projection[np.asarray(match_rows, dtype=int)]), columns=['x', 'y'])
+    matches['grupo'] = 'Matches da vaga'
+    st.scatter_chart(pd.concat([points, matches], ignore_index=True),
+                     x='x', y='y', color='grupo')
+
+
+# Painel de explicação do LLM: explicação pronta (ou com erro) é exibida direto;
+# só um job pendente ganha o fragment que reexecuta a cada segundo. O erro fica
+# guardado no worker e o LLM só é chamado de novo quando o usuário pede
+def render_llm_explanation(explanation_key):
+    job = get_explanation_worker().get(explanation_key)
+    if job is None:
+        return
+    if not (job.done or job.error):
+        poll_llm_explanation(explanation_key)
+        return
+    show_llm_explanation(job)
+    if job.error:
+        # O clique esquece o job antes da reexecução, que então o submete de novo
+        st.button("Tentar novamente", key=f"llm_retry_{explanation_key}",
+                  on_click=get_explanation_worker().discard, args=(explanation_key,))
+
+
+def show_llm_explanation(job):
+    if job.error:
+        st.warning(f"Não foi possível gerar a explicação: {job.error}")
+    elif job.done:
+        st.info(f"**Motivo da Seleção:** {job.text.strip()}")
+    else:
+        st.info(f"**Motivo da Seleção:** {job.text}▌")
+
+
+# Exibe os tokens já gerados pelo worker em segundo plano sem bloquear o restante
+# do app. Ao terminar o job, reexecuta o app uma vez: a execução completa cancela
+# os timers dos fragments e passa a exibir o texto final sem polling
+@st.fragment(run_every=1.0)
+def poll_llm_explanation(explanation_key):
+    job = get_explanation_worker().get(explanation_key)
+    if job is None or job.done or job.error:
+        st.rerun(scope="app")
+    show_llm_explanation(job)
+
+
+# Fragment que mede cada reexecução no histograma app_rerun_seconds{scope=...}
+def timed_fragment(scope, **fragment_kwargs):
+    def decorator(func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with metrics.span("app_rerun", scope=scope):
+                return func(*args, **kwargs)
+        return st.fragment(timed, **fragment_kwargs)
+    return decorator
+
+
+# Painel de matching (seletor da vaga, opções e busca): trocar a vaga ou uma opção
+# reexecuta só este fragment, não o app inteiro
+@timed_fragment("matching")
+def render_matching_panel():
+    selected_job_display = st.selectbox("Selecione uma Vaga:", job_display_names, key='selected_job_display')
+
+    if not selected_job_display:
+        return
 
     selected_job_id = selected_job_display.split(' - ')[0]
     selected_job = df_jobs.loc[
@@ -100,12 +239,13 @@ if selected_job_display:
     # # Encontra o embedding da vaga selecionada usando o índice do ID na lista de IDs
     # # Assumimos que a ordem dos IDs em vaga_ids corresponde à ordem dos embeddings em vaga_embeddings
     try:
-        job_embedding_idx = vaga_ids.index(selected_job_id)
-        selected_job_embedding = vaga_embeddings[job_embedding_idx]
+        with metrics.span("job_lookup"):
+            job_embedding_idx = vaga_ids.position(selected_job_id[0])
+            selected_job_embedding = vaga_embeddings[job_embedding_idx]
     except ValueError:
         st.error(
             f"Erro: Embedding para a vaga ID '{selected_job_id}' não encontrado. Pode ser um problema com os dados pré-gerados.")
-        st.stop()
+        return
 
     st.markdown(
         f"**Vaga Selecionada:** {selected_job['titulo_vaga'].values}")
@@ -117,72 +257,288 @@ if selected_job_display:
     match_type = st.radio(
         "Buscar Matches em:", ("Candidatos (applicants.json)", "Prospects (prospects.json)"))
 
+    use_rerank = st.checkbox(
+        f"Reordenar os {RERANK_TOP_K} primeiros com cross-encoder (mais preciso, mais lento)")
+
+    n_probe = None
+    if candid_clusters is not None and match_type == "Candidatos (applicants.json)":
+        if st.checkbox("Busca aproximada por clusters (mais rápida)"):
+            n_probe = st.slider("Clusters visitados", 1, len(
+                candid_clusters['centroids']), min(DEFAULT_N_PROBE, len(candid_clusters['centroids'])))
+
+    if match_type == "Candidatos (applicants.json)":
+        target_df = df_applicants
+        target_embeddings_data = {
+            'ids': candid_ids, 'embeddings': candid_embeddings, 'clusters': candid_clusters,
+            'projection': candid_projection, 'searcher': candid_searcher}
+        target_id_col = 'id_candidato'
+        target_texts = candid_texts
+
+        # Função para obter o nome do candidato de forma segura
+
+        def get_name(data): return data['infos_basicas']['nome'] if 'infos_basicas' in data and 'nome' in data[
+            'infos_basicas'] else f"Candidato {data.get(target_id_col, 'N/A')}"
+    else:  # Prospects
+        target_df = df_prospects
+        target_embeddings_data = {
+            'ids': prospect_ids, 'embeddings': prospect_embeddings, 'projection': prospect_projection,
+            'searcher': prospect_searcher}
+
+        # st.dataframe(target_df)
+
+        target_id_col = 'id_prospect'
+        target_texts = prospect_texts
+        # # # Função para obter o nome do prospect de forma segura (ajuste conforme a real estrutura do seu prospects.json)
+
+        def get_name(data): return data.get(
+            'nome', f"Prospect {data.get(target_id_col, 'N/A')}")
+
+    def search_matches():
+        # Ranking dos MAX_RANKED_RESULTS primeiros, calculado uma vez; as páginas são fatias dele
+        cursor = MatchCursor.from_query(
+            query_embedding=selected_job_embedding,
+            target_embeddings_data=target_embeddings_data,
+            n_probe=n_probe
+        )
+        if use_rerank:
+            shortlist = cursor.head(RERANK_TOP_K)
+            cursor = cursor.with_head(rerank_matches(
+                job_text=selected_job['processed_text'].iloc[0],
+                top_matches_df=shortlist,
+                candidate_texts=target_texts.get(shortlist['id']),
+                top_n=RERANK_TOP_K
+            ))
+        return cursor
+
+    search_key = (embeddings_version_id, selected_job.index[0], match_type, use_rerank, n_probe)
     if st.button("Encontrar Melhores Matches"):
-        if match_type == "Candidatos (applicants.json)":
-            target_df = df_applicants
-            target_embeddings_data = {
-                'ids': candid_ids, 'embeddings': candid_embeddings}
-            target_id_col = 'id_candidato'
-            text_col = 'processed_text'
-
-            # Função para obter o nome do candidato de forma segura
-
-            def get_name(data): return data['infos_basicas']['nome'] if 'infos_basicas' in data and 'nome' in data[
-                'infos_basicas'] else f"Candidato {data.get(target_id_col, 'N/A')}"
-        else:  # Prospects
-            target_df = df_prospects.copy()
-            target_embeddings_data = {
-                'ids': prospect_ids, 'embeddings': prospect_embeddings}
-
-            # st.dataframe(target_df)
-
-            target_id_col = 'id_prospect'
-            text_col = 'processed_text'
-            # # # Função para obter o nome do prospect de forma segura (ajuste conforme a real estrutura do seu prospects.json)
-
-            def get_name(data): return data.get(
-                'nome', f"Prospect {data.get(target_id_col, 'N/A')}")
-
         with st.spinner(f"Buscando {match_type} compatíveis..."):
-            top_matches_df = find_top_matches(
-                query_embedding=selected_job_embedding,
-                target_embeddings_data=target_embeddings_data,
-                top_n=5
-            )
-
-        if not top_matches_df.empty:
-            st.write("---")  # Separador visual para os resultados
-            for index, row in top_matches_df.iterrows():
-                match_id = row['id']
-                score = row['similarity_score']
-
-                # Acessa os dados completos do candidato/prospect usando o ID
-                match_data = target_df.loc[match_id] if match_id in target_df.index else target_df[
-                    target_df[target_id_col] == match_id].iloc[0]
+            # Resultado compartilhado entre sessões para a mesma vaga/alvo/filtros
+            st.session_state['match_results'] = {
+                'key': search_key,
+                'cursor': match_result_cache.get_or_compute(
+                    search_key + (MAX_RANKED_RESULTS,), search_matches,
+                    cacheable=lambda cursor: not cursor.missing_shards and (
+                        not use_rerank or rerank_completed(cursor.head(RERANK_TOP_K)))),
+                'shown': FIRST_PAGE_SIZE,
+            }
+
+    render_match_results(search_key, match_type, selected_job, target_df, target_id_col, target_texts, get_name)
+
+
+# Resultados e detalhes dos matches: paginar reexecuta só a lista, sem o seletor
+@timed_fragment("results")
+def render_match_results(search_key, match_type, selected_job, target_df, target_id_col, target_texts, get_name):
+    # Os resultados ficam na sessão: paginar não refaz a busca
+    match_results = st.session_state.get('match_results')
+    if match_results is None or match_results['key'] != search_key:
+        return
+
+    match_cursor = match_results['cursor']
+    top_matches_df = match_cursor.head(match_results['shown'])
+
+    if not top_matches_df.empty:
+        st.write("---")  # Separador visual para os resultados
+        if match_cursor.missing_shards:
+            st.warning(f"Resultado parcial: {len(match_cursor.missing_shards)} partição(ões) da busca "
+                       f"não respondeu(ram) a tempo. Busque novamente para o ranking completo.")
+        # Trechos pré-calculados para a explicação extrativa (só existem para candidatos)
+        job_segments_index = load_segment_index('jobs')
+        target_segments_index = load_segment_index(
+            'applicants') if match_type == "Candidatos (applicants.json)" else None
+        job_segments = job_segments_index.get(
+            selected_job.index[0]) if job_segments_index is not None else None
+
+        explain_matches = llm_available()
+        if explain_matches:
+            load_llm_model()  # carrega na thread do script, antes de acionar o worker
+            explanation_job_id = selected_job['id_vaga'].iloc[0]
+            if LLM_EXPLANATION_MODE == 'batch':
+                # Um prompt a cada FIRST_PAGE_SIZE matches: a vaga é avaliada pelo LLM uma vez por lote
+                for batch_start in range(0, len(top_matches_df), FIRST_PAGE_SIZE):
+                    batch = top_matches_df.iloc[batch_start:batch_start + FIRST_PAGE_SIZE]
+                    explanation_keys = [(explanation_job_id, match_type, match_id)
+                                        for match_id in batch['id']]
+                    get_explanation_worker().submit_batch(
+                        explanation_keys,
+                        build_batch_explanation_prompt(
+                            job_text=selected_job['processed_text'].iloc[0],
+                            candidates=list(zip(target_texts.get(batch['id']),
+                                                batch['similarity_score']))
+                        ),
+                        parse=lambda text, n=len(explanation_keys): parse_batch_explanations(text, n),
+                        max_tokens=BATCH_MAX_TOKENS_PER_CANDIDATE * len(explanation_keys)
+                    )
+        # Registros por coluna: iterrows converteria o id para float junto com os scores
+        for row in top_matches_df.to_dict('records'):
+            match_id = row['id']
+            score = row['similarity_score']
+
+            # Acessa os dados completos do candidato/prospect usando o ID
+            match_data = target_df.loc[match_id] if match_id in target_df.index else target_df[
+                target_df[target_id_col] == match_id].iloc[0]
+
+            entity_name = get_name(match_data)  # Obtém o nome formatado
+
+            st.write(
+                f"**{match_type.replace(' (...', '')[:-1]}:** {entity_name} (ID: {match_id})")
+            st.write(f"**Score de Similaridade:** {score:.4f}")
+            if pd.notna(row.get('rerank_score', np.nan)):
+                st.write(
+                    f"**Score do Cross-Encoder:** {row['rerank_score']:.4f}")
+
+            candidate_segments = target_segments_index.get(match_id) if (
+                target_segments_index is not None and job_segments is not None) else None
+            if candidate_segments is not None:
+                render_extractive_explanation(
+                    explain_match(job_segments, candidate_segments))
+
+            # Mostra um pedaço do texto processado, substituido pelo texto tabular
+            # st.write(
+            #     f"**Texto Processado:** {match_data[TEXT_COLUMN][:500]}...")
+
+            st.write(match_data.drop(labels=TEXT_COLUMN, errors='ignore'))
+
+            # --- LLM para Explicação do Match (em segundo plano) ---
+            if explain_matches:
+                explanation_key = (explanation_job_id, match_type, match_id)
+                if LLM_EXPLANATION_MODE != 'batch':
+                    get_explanation_worker().submit(
+                        explanation_key,
+                        build_explanation_prompt(
+                            job_text=selected_job['processed_text'].iloc[0],
+                            candidate_text=target_texts[match_id],
+                            match_score=score
+                        )
+                    )
+                render_llm_explanation(explanation_key)
+            st.write(f"---")  # Separador visual entre os matches
+        if match_results['shown'] < len(match_cursor):
+            st.button(f"Mostrar próximos {PAGE_SIZE}", on_click=show_more_matches)
+        if candid_umap is not None and match_type == "Candidatos (applicants.json)":
+            with st.expander("Mapa de talentos"):
+                render_talent_map(candid_umap, top_matches_df['row'])
+    else:
+        st.info(
+            f"Nenhum {match_type.replace(' (...', '')[:-1]} compatível encontrado para esta vaga.")
+
+
+render_matching_panel()
+
+
+# --- Busca para várias vagas de uma vez (um único produto matriz x matriz) ---
+MULTI_AGGREGATION_LABELS = {
+    "Maior score entre as vagas": 'max',
+    "Score médio nas vagas": 'mean',
+    "Cota por vaga, sem repetir candidatos": 'quota',
+}
 
-                entity_name = get_name(match_data)  # Obtém o nome formatado
 
-                st.write(
-                    f"**{match_type.replace(' (...', '')[:-1]}:** {entity_name} (ID: {match_id})")
-                st.write(f"**Score de Similaridade:** {score:.4f}")
-
-                # Mostra um pedaço do texto processado, substituido pelo texto tabular
-                # st.write(
-                #     f"**Texto Processado:** {match_data[text_col][:500]}...")
-
-                st.write(match_data[:-1])
-
-                # # --- LLM para Explicação do Match ---
-                # # Cria uma chave única para o botão para evitar KeyErrors no Streamlit
-                # button_key = f"explain_{match_type}_{match_id}"
-                # if st.button(f"Explicar Match com {entity_name}", key=button_key):
-                #     explanation = get_llm_explanation_for_match(
-                #         job_text=selected_job['processed_text'],
-                #         candidate_text=match_data[text_col],
-                #         match_score=score
-                #     )
-                #     st.info(f"**Motivo da Seleção:** {explanation}")
-                # st.write(f"---")  # Separador visual entre os matches
+@timed_fragment("multi_search")
+def render_multi_search():
+    with st.expander("Buscar para várias vagas ao mesmo tempo"):
+        multi_job_names = st.multiselect("Vagas:", job_display_names)
+        multi_match_type = st.radio(
+            "Buscar em:", ("Candidatos (applicants.json)", "Prospects (prospects.json)"), key="multi_match_type")
+        multi_aggregation = MULTI_AGGREGATION_LABELS[st.radio(
+            "Agregação:", list(MULTI_AGGREGATION_LABELS), key="multi_aggregation")]
+        multi_top_n = int(st.number_input(
+            "Quantidade (por vaga, na cota)", min_value=1, max_value=100, value=10))
+
+        if st.button("Buscar para as vagas selecionadas", disabled=len(multi_job_names) < 2):
+            multi_jobs = df_jobs.iloc[[job_positions[name] for name in multi_job_names]]
+            if multi_match_type == "Candidatos (applicants.json)":
+                multi_target_df = df_applicants
+                multi_target_data = {'ids': candid_ids, 'embeddings': candid_embeddings,
+                                     'projection': candid_projection}
+            else:
+                multi_target_df = df_prospects
+                multi_target_data = {'ids': prospect_ids, 'embeddings': prospect_embeddings,
+                                     'projection': prospect_projection}
+
+            with st.spinner("Buscando para as vagas selecionadas..."):
+                multi_matches = find_top_matches(
+                    query_embedding=np.asarray(
+                        vaga_embeddings[vaga_ids.positions(multi_jobs.index)]),
+                    target_embeddings_data=multi_target_data,
+                    top_n=multi_top_n,
+                    aggregation=multi_aggregation
+                )
+            multi_matches.insert(0, 'vaga', multi_jobs['titulo_vaga'].to_numpy()[multi_matches['job']])
+            multi_matches['nome'] = multi_target_df['nome'].reindex(multi_matches['id']).to_numpy()
+            st.dataframe(multi_matches[['vaga', 'id', 'nome', 'similarity_score']], hide_index=True)
+
+
+render_multi_search()
+
+
+# --- Distribuição global: cada candidato proposto a no máximo N vagas ---
+@timed_fragment("staffing")
+def render_staffing_panel():
+    with st.expander("Distribuição global de candidatos entre as vagas"):
+        st.caption("Propõe candidatos para todas as vagas de uma vez, limitando quantas vagas recebem o mesmo candidato.")
+        staffing_per_job = int(st.number_input("Candidatos por vaga", min_value=1, max_value=20, value=DEFAULT_PER_JOB))
+        staffing_max_per_candidate = int(st.number_input(
+            "Máximo de vagas por candidato", min_value=1, max_value=10, value=DEFAULT_MAX_PER_CANDIDATE))
+
+        if st.button("Calcular distribuição global"):
+            staffing_key = (embeddings_version_id, 'staffing', staffing_per_job, staffing_max_per_candidate)
+            with st.spinner("Otimizando a distribuição de candidatos entre as vagas..."):
+                staffing_df = match_result_cache.get_or_compute(staffing_key, lambda: optimize_staffing(
+                    job_embeddings=vaga_embeddings,
+                    job_ids=vaga_ids,
+                    target_embeddings_data={'ids': candid_ids, 'embeddings': candid_embeddings,
+                                            'projection': candid_projection},
+                    per_job=staffing_per_job,
+                    max_per_candidate=staffing_max_per_candidate
+                ))
+            col1, col2 = st.columns(2)
+            col1.metric("Propostas", len(staffing_df))
+            col2.metric("Candidatos distintos", staffing_df['id'].nunique())
+            st.dataframe(pd.DataFrame({
+                'vaga': df_jobs['titulo_vaga'].reindex(staffing_df['job_id']).to_numpy(),
+                'id_vaga': df_jobs['id_vaga'].reindex(staffing_df['job_id']).to_numpy(),
+                'id': staffing_df['id'].to_numpy(),
+                'nome': df_applicants['nome'].reindex(staffing_df['id']).to_numpy(),
+                'similarity_score': staffing_df['similarity_score'].to_numpy(),
+                'posição no top da vaga': staffing_df['rank'].to_numpy(),
+            }), hide_index=True)
+
+
+render_staffing_panel()
+
+
+# --- Painel de recrutamento: consultas DuckDB direto nos Parquets, sem carregar no pandas ---
+@timed_fragment("analytics")
+def render_analytics_panel():
+    with st.expander("Painel de recrutamento"):
+        analytics = get_analytics_engine(analytics_version())
+        analytics_view = st.radio("Visão:", ("Candidatos por nível profissional", "Prospects por vaga",
+                                              "Funil de situações"), key="analytics_view", horizontal=True)
+        if analytics_view == "Candidatos por nível profissional":
+            analytics_table = analytics.query('candidatos_por_nivel')
+            st.bar_chart(analytics_table.to_pandas(), x='nivel_profissional', y='candidatos')
+        elif analytics_view == "Prospects por vaga":
+            analytics_limit = int(st.number_input("Vagas", min_value=5, max_value=500, value=20))
+            analytics_table = analytics.query('prospects_por_vaga', analytics_limit)
         else:
-            st.info(
-                f"Nenhum {match_type.replace(' (...', '')[:-1]} compatível encontrado para esta vaga.")
+            # Vaga escolhida no painel de matching (outro fragment), lida da sessão
+            selected_job_display = st.session_state.get('selected_job_display')
+            funnel_job_id = None
+            if selected_job_display and st.checkbox("Só a vaga selecionada"):
+                funnel_job_id = selected_job_display.split(' - ')[0]
+            analytics_table = analytics.query('funil_situacoes', funnel_job_id)
+            stages = analytics_table.group_by('etapa').aggregate([('prospects', 'sum')]).to_pylist()
+            stage_columns = st.columns(len(FUNNEL_STAGES))
+            for column, (stage, label) in zip(stage_columns, sorted(FUNNEL_STAGES.items())):
+                column.metric(label, sum(row['prospects_sum'] for row in stages if row['etapa'] >= stage))
+        st.dataframe(analytics_table, hide_index=True)
+
+
+render_analytics_panel()
+
+if metrics.is_enabled():
+    with st.expander("Métricas de desempenho (debug)"):
+        metrics.render_streamlit_panel()
+
+metrics.observe("app_rerun_seconds", time.perf_counter() - app_run_start, scope="app")
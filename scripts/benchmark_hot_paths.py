@@ -0,0 +1,395 @@
+"""
+Suíte de benchmarks dos caminhos críticos do projeto.
+
+Gera dados sintéticos no mesmo formato de applicants.json, vagas.json e
+prospects.json e mede o tempo de:
+
+- limpar_texto (limpeza de texto do pré-processamento)
+- achatamento das seções aninhadas dos JSONs
+- load_processed_data (leitura dos Parquets)
+- load_all_embeddings (leitura dos embeddings)
+- find_top_matches (busca por similaridade)
+
+Os resultados são salvos em JSON para comparação entre versões:
+
+    python scripts/benchmark_hot_paths.py --rotulo v1 --tamanhos 10000 100000
+    python scripts/benchmark_hot_paths.py --comparar data/benchmarks/v1.json data/benchmarks/v2.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+BENCHMARK_OUTPUT_PATH = os.path.join('data', 'benchmarks')
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+DIMENSAO_EMBEDDING = 384  # all-MiniLM-L6-v2
+
+PALAVRAS = (
+    'python java sql dados analista desenvolvedor senior pleno junior '
+    'projeto sap cloud aws azure gestão equipe cliente requisitos testes '
+    'infraestrutura suporte negócios inglês espanhol avançado intermediário '
+    'ção é á ú ô'
+).split()
+
+
+def carregar_script_preprocessamento():
+    """Importa o script de pré-processamento como módulo (ele não é um pacote)."""
+    caminho = os.path.join(ROOT_DIR, 'scripts',
+                           'generate_preprocessed_data_final.py')
+    spec = importlib.util.spec_from_file_location(
+        'generate_preprocessed_data_final', caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+# --- Geradores de dados sintéticos ---
+
+def _texto(rng, n_palavras):
+    return ' '.join(rng.choice(PALAVRAS, size=n_palavras))
+
+
+def gerar_applicants(n, rng):
+    """Gera um dicionário no formato de applicants.json com `n` candidatos."""
+    dados = {}
+    for i in range(n):
+        codigo = str(i)
+        dados[codigo] = {
+            'infos_basicas': {
+                'telefone_recado': '', 'telefone': '(11) 90000-0000',
+                'objetivo_profissional': _texto(rng, 5),
+                'data_criacao': '10-11-2021 07:29:49', 'inserido_por': 'Recrutador',
+                'email': f'candidato{i}@email.com', 'local': 'São Paulo',
+                'sabendo_de_nos_por': '', 'data_atualizacao': '10-11-2021 07:29:49',
+                'codigo_profissional': codigo, 'nome': f'Candidato {i}',
+            },
+            'informacoes_pessoais': {
+                'data_aceite': '', 'nome': f'Candidato {i}', 'cpf': '',
+                'fonte_indicacao': '', 'email': f'candidato{i}@email.com',
+                'email_secundario': '', 'data_nascimento': '0000-00-00',
+                'telefone_celular': '', 'telefone_recado': '', 'sexo': '',
+                'estado_civil': '', 'pcd': '', 'endereco': '', 'skype': '',
+                'url_linkedin': '', 'facebook': '',
+            },
+            'informacoes_profissionais': {
+                'titulo_profissional': _texto(rng, 3),
+                'area_atuacao': _texto(rng, 2),
+                'conhecimentos_tecnicos': _texto(rng, 15),
+                'certificacoes': '', 'outras_certificacoes': '',
+                'remuneracao': '', 'nivel_profissional': 'Sênior',
+            },
+            'formacao_e_idiomas': {
+                'nivel_academico': 'Ensino Superior Completo',
+                'nivel_ingles': 'Avançado', 'nivel_espanhol': 'Básico',
+                'outro_idioma': '', 'instituicao_ensino_superior': '',
+                'cursos': '', 'ano_conclusao': '', 'outro_curso': '',
+            },
+            'cargo_atual': {
+                'id_ibrati': '', 'email_corporativo': '', 'cargo_atual': '',
+                'projeto_atual': '', 'cliente': '', 'unidade': '',
+                'data_admissao': '', 'data_ultima_promocao': '',
+                'nome_superior_imediato': '', 'email_superior_imediato': '',
+            },
+            'cv_pt': _texto(rng, 200),
+            'cv_en': '',
+        }
+    return dados
+
+
+def gerar_vagas(n, rng):
+    """Gera um dicionário no formato de vagas.json com `n` vagas."""
+    dados = {}
+    for i in range(n):
+        dados[str(i)] = {
+            'informacoes_basicas': {
+                'data_requicisao': '04-05-2021', 'titulo_vaga': _texto(rng, 4),
+                'vaga_sap': 'Não', 'cliente': 'Cliente', 'solicitante_cliente': '',
+                'empresa_divisao': '', 'requisitante': '', 'analista_responsavel': '',
+                'tipo_contratacao': 'CLT Full', 'prazo_contratacao': '',
+                'objetivo_vaga': '', 'prioridade_vaga': '', 'origem_vaga': '',
+                'superior_imediato': '', 'nome': '', 'telefone': '',
+            },
+            'perfil_vaga': {
+                'pais': 'Brasil', 'estado': 'São Paulo', 'cidade': 'São Paulo',
+                'bairro': '', 'regiao': '', 'local_trabalho': '2000',
+                'nivel_academico': 'Ensino Superior Completo',
+                'nivel_ingles': 'Avançado', 'nivel_espanhol': 'Básico',
+                'areas_atuacao': _texto(rng, 2),
+                'principais_atividades': _texto(rng, 60),
+                'competencia_tecnicas_e_comportamentais': _texto(rng, 60),
+                'nome_substituto': '',
+            },
+            'beneficios': {
+                'valor_venda': '', 'valor_compra_1': '', 'valor_compra_2': '',
+            },
+        }
+    return dados
+
+
+def gerar_prospects(n, rng, prospects_por_vaga=5):
+    """Gera um dicionário no formato de prospects.json com `n` prospects."""
+    dados = {}
+    n_vagas = max(1, n // prospects_por_vaga)
+    for i in range(n_vagas):
+        dados[str(i)] = {
+            'titulo': _texto(rng, 4),
+            'modalidade': '',
+            'prospects': [
+                {
+                    'nome': f'Candidato {j}', 'codigo': str(j),
+                    'situacao_candidado': 'Encaminhado ao Requisitante',
+                    'data_candidatura': '25-03-2021',
+                    'ultima_atualizacao': '25-03-2021',
+                    'comentario': '', 'recrutador': 'Recrutador',
+                }
+                for j in rng.integers(0, n, size=prospects_por_vaga)
+            ],
+        }
+    return dados
+
+
+def gerar_embeddings(n, rng, dim=DIMENSAO_EMBEDDING, bloco=100_000):
+    """Gera embeddings normalizados em float32, em blocos para limitar a memória."""
+    embeddings = np.empty((n, dim), dtype=np.float32)
+    for inicio in range(0, n, bloco):
+        fim = min(inicio + bloco, n)
+        parte = rng.standard_normal((fim - inicio, dim), dtype=np.float32)
+        parte /= np.linalg.norm(parte, axis=1, keepdims=True)
+        embeddings[inicio:fim] = parte
+    return embeddings
+
+
+# --- Medição ---
+
+def medir(funcao, repeticoes, preparar=None):
+    """Executa `funcao` `repeticoes` vezes e retorna estatísticas em segundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        'repeticoes': repeticoes,
+        'min_s': min(tempos),
+        'mediana_s': statistics.median(tempos),
+        'media_s': statistics.fmean(tempos),
+    }
+
+
+def versao_atual():
+    """Identifica a versão do código (git describe), se disponível."""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return 'desconhecida'
+
+
+def _salvar_processed_data(pasta, df_vagas, df_applicants, df_prospects,
+                           embeddings):
+    os.makedirs(pasta, exist_ok=True)
+    from src.parquet_layout import write_table
+
+    # Mesmo layout gravado pelo pré-processamento
+    write_table(df_vagas, os.path.join(pasta, 'vagas.parquet'), sort_by='id_vaga')
+    write_table(df_applicants, os.path.join(
+        pasta, 'applicants.parquet'), sort_by='id_candidato')
+    write_table(df_prospects, os.path.join(
+        pasta, 'prospects.parquet'), sort_by='id_prospect')
+    for nome, array in embeddings.items():
+        with open(os.path.join(pasta, nome), 'wb') as f:
+            pickle.dump({'ids': list(range(len(array))),
+                         'embeddings': array}, f)
+
+
+# --- Casos de benchmark ---
+
+def bench_limpar_texto(prep, n, rng, repeticoes):
+    textos = pd.Series([_texto(rng, 30) for _ in range(n)])
+    return medir(lambda: textos.apply(prep.limpar_texto), repeticoes)
+
+
+def bench_achatamento(prep, n, rng, repeticoes):
+    resultados = {}
+    brutos = {
+        'applicants': (gerar_applicants(n, rng), prep.expandir_applicants),
+        'vagas': (gerar_vagas(n, rng), prep.expandir_vagas),
+        'prospects': (gerar_prospects(n, rng), prep.expandir_prospects),
+    }
+    for nome, (dados, expandir) in brutos.items():
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, f'{nome}.json')
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump(dados, f)
+            del dados
+            entrada = prep.carregar_json_bruto(caminho)
+        resultados[nome] = medir(lambda: expandir(entrada), repeticoes)
+    return resultados
+
+
+def bench_carregamento(n, rng, repeticoes):
+    """Mede load_processed_data e load_all_embeddings sobre uma pasta temporária."""
+    from src.data_loader import load_processed_data
+    from src.nlp_matcher import load_all_embeddings
+
+    n_vagas = max(1, n // 100)
+    df_vagas = pd.DataFrame({'id_vaga': [str(i) for i in range(n_vagas)],
+                             'titulo_vaga': [_texto(rng, 4) for _ in range(n_vagas)]})
+    df_applicants = pd.DataFrame({'id_candidato': [str(i) for i in range(n)],
+                                  'nome': [f'candidato {i}' for i in range(n)],
+                                  'processed_text': [_texto(rng, 40) for _ in range(n)]})
+    df_prospects = pd.DataFrame({'id_prospect': [str(i) for i in range(n)],
+                                 'nome': [f'candidato {i}' for i in range(n)]})
+    embeddings = {
+        'vaga_embeddings.pkl': gerar_embeddings(n_vagas, rng),
+        'candid_embeddings.pkl': gerar_embeddings(n, rng),
+        'prospect_embeddings.pkl': gerar_embeddings(n, rng),
+    }
+
+    diretorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        _salvar_processed_data(os.path.join(pasta, 'data', 'processed_data'),
+                               df_vagas, df_applicants, df_prospects, embeddings)
+        del embeddings
+        os.chdir(pasta)
+        try:
+            # Limpa o cache do Streamlit antes de cada repetição para medir a leitura real
+            return {
+                'load_processed_data': medir(
+                    load_processed_data, repeticoes, load_processed_data.clear),
+                'load_all_embeddings': medir(
+                    load_all_embeddings, repeticoes, load_all_embeddings.clear),
+            }
+        finally:
+            os.chdir(diretorio_original)
+
+
+def bench_find_top_matches(n, rng, repeticoes, top_n=5):
+    from src.id_array import IdArray
+    from src.nlp_matcher import find_top_matches
+
+    target_embeddings_data = {'ids': IdArray(np.arange(n)),
+                              'embeddings': gerar_embeddings(n, rng)}
+    query_embedding = gerar_embeddings(1, rng)[0]
+    return medir(lambda: find_top_matches(query_embedding, target_embeddings_data,
+                                          top_n=top_n), repeticoes)
+
+
+CASOS = ('limpar_texto', 'achatamento', 'carregamento', 'find_top_matches')
+
+
+def executar(tamanhos, casos, repeticoes, semente):
+    prep = None
+    if 'limpar_texto' in casos or 'achatamento' in casos:
+        prep = carregar_script_preprocessamento()
+
+    resultados = []
+    for n in tamanhos:
+        rng = np.random.default_rng(semente)
+        for caso in casos:
+            print(f'DEBUG_BENCH: Executando {caso} com {n} registros...')
+            if caso == 'limpar_texto':
+                medidas = {'limpar_texto': bench_limpar_texto(
+                    prep, n, rng, repeticoes)}
+            elif caso == 'achatamento':
+                medidas = {f'achatamento_{nome}': valor for nome, valor in
+                           bench_achatamento(prep, n, rng, repeticoes).items()}
+            elif caso == 'carregamento':
+                medidas = bench_carregamento(n, rng, repeticoes)
+            else:
+                medidas = {'find_top_matches': bench_find_top_matches(
+                    n, rng, repeticoes)}
+
+            for nome, estatisticas in medidas.items():
+                print(f'DEBUG_BENCH: {nome} [{n}] mediana='
+                      f'{estatisticas["mediana_s"]:.4f}s')
+                resultados.append({'caso': nome, 'tamanho': n, **estatisticas})
+    return resultados
+
+
+def comparar(caminho_base, caminho_novo, limite_regressao):
+    """Compara dois arquivos de resultados e aponta regressões pela mediana."""
+    with open(caminho_base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(caminho_novo, encoding='utf-8') as f:
+        novo = json.load(f)
+
+    medianas_base = {(r['caso'], r['tamanho']): r['mediana_s']
+                     for r in base['resultados']}
+    print(f"Comparando {base['versao']} -> {novo['versao']}")
+    print(f"{'caso':<32}{'tamanho':>10}{'base (s)':>12}{'novo (s)':>12}{'razão':>8}")
+
+    regressoes = 0
+    for r in novo['resultados']:
+        chave = (r['caso'], r['tamanho'])
+        if chave not in medianas_base:
+            continue
+        razao = r['mediana_s'] / medianas_base[chave]
+        marca = ''
+        if razao > 1 + limite_regressao:
+            marca = '  <-- regressão'
+            regressoes += 1
+        print(f"{r['caso']:<32}{r['tamanho']:>10}{medianas_base[chave]:>12.4f}"
+              f"{r['mediana_s']:>12.4f}{razao:>8.2f}{marca}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help='Quantidade de registros/alvos por execução.')
+    parser.add_argument('--casos', nargs='+', choices=CASOS, default=list(CASOS))
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--rotulo', default=None,
+                        help='Nome do arquivo de resultados (padrão: versão do git).')
+    parser.add_argument('--saida', default=BENCHMARK_OUTPUT_PATH)
+    parser.add_argument('--comparar', nargs=2, metavar=('BASE', 'NOVO'),
+                        help='Compara dois arquivos de resultados em vez de executar.')
+    parser.add_argument('--limite-regressao', type=float, default=0.10,
+                        help='Aumento relativo da mediana considerado regressão.')
+    args = parser.parse_args()
+
+    if args.comparar:
+        regressoes = comparar(*args.comparar, args.limite_regressao)
+        sys.exit(1 if regressoes else 0)
+
+    versao = versao_atual()
+    resultados = executar(args.tamanhos, args.casos,
+                          args.repeticoes, args.semente)
+
+    os.makedirs(args.saida, exist_ok=True)
+    caminho = os.path.join(args.saida, f'{args.rotulo or versao}.json')
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({
+            'versao': versao,
+            'rotulo': args.rotulo,
+            'data': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'semente': args.semente,
+            'resultados': resultados,
+        }, f, indent=2, ensure_ascii=False)
+    print(f'Resultados salvos em {caminho}')
+
+
+if __name__ == '__main__':
+    main()
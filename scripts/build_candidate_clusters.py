@@ -0,0 +1,114 @@
+"""
+Clusterização offline dos embeddings de candidatos.
+
+Gera data/processed_data/candid_clusters.npz (centroides do k-means e linhas
+de cada cluster), usado pela busca podada do `find_top_matches` (n_probe), e
+opcionalmente candid_umap.npy, a projeção UMAP 2-D usada no mapa de talentos.
+Deve ser executado de novo sempre que os embeddings forem regenerados.
+
+    python scripts/build_candidate_clusters.py
+    python scripts/build_candidate_clusters.py --clusters 256 --umap --avaliar
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.clustering import (  # noqa: E402
+    CANDID_CLUSTERS_FILE,
+    CANDID_UMAP_FILE,
+    build_clusters,
+    probe_rows,
+    save_clusters,
+)
+from src.vector_search import batch_top_k, normalize, scan_top_k  # noqa: E402
+
+PROCESSED_DATA_PATH = os.path.join('data', 'processed_data')
+
+
+def carregar_embeddings(nome):
+    """Lê <nome>.npy (mapeado em memória) ou, na ausência dele, <nome>.pkl."""
+    caminho_npy = os.path.join(PROCESSED_DATA_PATH, f'{nome}.npy')
+    if os.path.exists(caminho_npy):
+        return np.load(caminho_npy, mmap_mode='r')
+    with open(os.path.join(PROCESSED_DATA_PATH, f'{nome}.pkl'), 'rb') as f:
+        return np.asarray(pickle.load(f)['embeddings'], dtype=np.float32)
+
+
+def gerar_umap(embeddings, amostra, semente, tamanho_lote=8192):
+    """Ajusta o UMAP em uma amostra e projeta todas as linhas em lotes."""
+    import umap
+
+    rng = np.random.default_rng(semente)
+    linhas = np.sort(rng.choice(len(embeddings), size=min(amostra, len(embeddings)),
+                                replace=False))
+    redutor = umap.UMAP(n_components=2, metric='cosine', random_state=semente)
+    redutor.fit(np.asarray(embeddings[linhas], dtype=np.float32))
+
+    projecao = np.empty((len(embeddings), 2), dtype=np.float32)
+    for inicio in range(0, len(embeddings), tamanho_lote):
+        projecao[inicio:inicio + tamanho_lote] = redutor.transform(
+            np.asarray(embeddings[inicio:inicio + tamanho_lote], dtype=np.float32))
+    return projecao
+
+
+def avaliar(clusters, embeddings, consultas, top_n=10, n_probes=(1, 2, 4, 8, 16, 32)):
+    """Recall@top_n da busca podada em relação à busca exata, por n_probe."""
+    exatos = [set(linhas) for linhas in batch_top_k(consultas, embeddings, top_n)[0]]
+
+    print(f"{'n_probe':>8}{'linhas visitadas':>18}{f'recall@{top_n}':>12}")
+    for n_probe in n_probes:
+        if n_probe > len(clusters['centroids']):
+            break
+        acertos, visitadas = 0, 0
+        for consulta, exato in zip(consultas, exatos):
+            linhas = probe_rows(clusters, consulta, n_probe)
+            melhores = scan_top_k(consulta, embeddings, top_n, rows=linhas)[0]
+            acertos += len(exato & set(melhores.tolist()))
+            visitadas += len(linhas)
+        print(f'{n_probe:>8}{visitadas / len(consultas) / len(embeddings):>17.1%}'
+              f'{acertos / (top_n * len(consultas)):>12.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clusters', type=int, default=None,
+                        help='Número de clusters (padrão: ~raiz quadrada do número de candidatos).')
+    parser.add_argument('--umap', action='store_true', help='Gera também a projeção UMAP 2-D.')
+    parser.add_argument('--umap-amostra', type=int, default=20000,
+                        help='Linhas usadas para ajustar o UMAP.')
+    parser.add_argument('--avaliar', action='store_true',
+                        help='Mede o recall da busca podada usando as vagas como consultas.')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    embeddings = carregar_embeddings('candid_embeddings')
+    print(f'{len(embeddings)} embeddings de candidatos carregados.')
+
+    inicio = time.perf_counter()
+    clusters = build_clusters(embeddings, args.clusters, random_state=args.semente)
+    save_clusters(clusters)
+    tamanhos = np.diff(clusters['offsets'])
+    print(f"{len(clusters['centroids'])} clusters (tamanho médio {tamanhos.mean():.0f}, "
+          f"máximo {tamanhos.max()}) salvos em {CANDID_CLUSTERS_FILE} "
+          f"em {time.perf_counter() - inicio:.1f}s.")
+
+    if args.umap:
+        inicio = time.perf_counter()
+        np.save(CANDID_UMAP_FILE, gerar_umap(embeddings, args.umap_amostra, args.semente))
+        print(f'Projeção UMAP salva em {CANDID_UMAP_FILE} em {time.perf_counter() - inicio:.1f}s.')
+
+    if args.avaliar:
+        consultas = normalize(np.asarray(carregar_embeddings('vaga_embeddings'))[:200])
+        avaliar(clusters, embeddings, consultas)
+
+
+if __name__ == '__main__':
+    main()
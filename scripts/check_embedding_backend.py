@@ -0,0 +1,100 @@
+"""
+Paridade e throughput dos backends de embedding (ONNX / ONNX int8 vs PyTorch).
+
+Codifica uma amostra de textos com o SentenceTransformer em PyTorch e com cada
+backend ONNX, verifica que a similaridade de cosseno de cada vetor com o de
+referência é >= --limite e mede textos/segundo de cada backend.
+
+    python scripts/check_embedding_backend.py
+    python scripts/check_embedding_backend.py --backends onnx-int8 --amostra 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.embedding_backend import (  # noqa: E402
+    EMBEDDING_MODEL_NAME,
+    load_embedding_model,
+)
+from src.parquet_layout import text_path  # noqa: E402
+
+APPLICANTS_PARQUET = os.path.join('data', 'processed_data', 'applicants.parquet')
+
+
+def carregar_amostra(n, semente):
+    """Usa textos reais de applicants.parquet quando disponível."""
+    if os.path.exists(APPLICANTS_PARQUET):
+        # Layout novo: textos em applicants_text.parquet (src/parquet_layout.py)
+        caminho = text_path(APPLICANTS_PARQUET)
+        textos = pd.read_parquet(caminho if os.path.exists(caminho) else APPLICANTS_PARQUET,
+                                 columns=['processed_text'])
+        textos = textos['processed_text'].sample(
+            n=min(n, len(textos)), random_state=semente)
+        return textos.astype(str).tolist()
+
+    print(f'{APPLICANTS_PARQUET} não encontrado, usando textos sintéticos.')
+    from benchmark_hot_paths import _texto
+    rng = np.random.default_rng(semente)
+    return [_texto(rng, int(rng.integers(5, 300))) for _ in range(n)]
+
+
+def codificar(modelo, textos, tamanho_lote):
+    inicio = time.perf_counter()
+    vetores = modelo.encode(textos, batch_size=tamanho_lote, convert_to_numpy=True)
+    duracao = time.perf_counter() - inicio
+    return np.asarray(vetores, dtype=np.float32), len(textos) / duracao
+
+
+def cosseno_por_linha(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--backends', nargs='+', default=['onnx', 'onnx-int8'])
+    parser.add_argument('--modelo', default=EMBEDDING_MODEL_NAME)
+    parser.add_argument('--amostra', type=int, default=1000)
+    parser.add_argument('--lote', type=int, default=32)
+    parser.add_argument('--limite', type=float, default=0.99,
+                        help='Cosseno mínimo aceito em relação ao PyTorch.')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    textos = carregar_amostra(args.amostra, args.semente)
+
+    referencia = load_embedding_model('torch', args.modelo)
+    # Aquecimento para não medir a inicialização preguiçosa de cada backend
+    referencia.encode(textos[:args.lote], batch_size=args.lote)
+    vetores_ref, throughput_ref = codificar(referencia, textos, args.lote)
+
+    print(f"{'backend':<12}{'textos/s':>12}{'speedup':>10}{'cos min':>10}{'cos médio':>11}")
+    print(f"{'torch':<12}{throughput_ref:>12.1f}{1.0:>10.2f}{1.0:>10.4f}{1.0:>11.4f}")
+
+    falhas = 0
+    for backend in args.backends:
+        modelo = load_embedding_model(backend, args.modelo)
+        modelo.encode(textos[:args.lote], batch_size=args.lote)
+        vetores, throughput = codificar(modelo, textos, args.lote)
+        cossenos = cosseno_por_linha(vetores_ref, vetores)
+        marca = ''
+        if cossenos.min() < args.limite:
+            marca = f'  <-- abaixo de {args.limite}'
+            falhas += 1
+        print(f'{backend:<12}{throughput:>12.1f}{throughput / throughput_ref:>10.2f}'
+              f'{cossenos.min():>10.4f}{cossenos.mean():>11.4f}{marca}')
+
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
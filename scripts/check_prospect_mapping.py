@@ -0,0 +1,69 @@
+"""
+Verificação do mapeamento prospect -> candidato (src/prospect_mapping.py).
+
+Monta um caso sintético em que dois prospects (vagas diferentes) apontam para
+o mesmo candidato e confere que a busca devolve cada candidato uma única vez,
+com k pessoas diferentes no top k (consulta única e várias vagas). Sai com
+código 1 se algum candidato se repetir.
+
+    python scripts/check_prospect_mapping.py
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.nlp_matcher import _map_prospects, find_top_matches  # noqa: E402
+from src.prospect_mapping import applicant_rows, build_row_map, save_row_map  # noqa: E402
+
+
+def main():
+    rng = np.random.default_rng(0)
+    dim = 16
+    # Candidatos (id_candidato 117, 5, 7 e 8) e seus vetores
+    applicant_codes = np.array([117, 5, 7, 8])
+    candid_ids = np.array([1000, 1001, 1002, 1003])
+    applicants = {'ids': candid_ids, 'embeddings': rng.normal(size=(4, dim)).astype(np.float32)}
+
+    # Prospects 82 e 149: o mesmo candidato 117 em duas vagas; 300 não está em applicants
+    prospect_ids = np.array([82, 149, 200, 201, 300])
+    prospect_codes = np.array([117, 117, 5, 7, 999])
+    row_map = build_row_map(applicant_rows(prospect_codes, applicant_codes, candid_ids, candid_ids))
+    own_vectors = rng.normal(size=(int((row_map < 0).sum()), dim)).astype(np.float32)
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as pasta:
+        file_path = os.path.join(pasta, 'prospect_embeddings.npy')
+        save_row_map(file_path, row_map, prospect_ids)
+        prospects = _map_prospects({'ids': prospect_ids, 'embeddings': own_vectors},
+                                   applicants, file_path)
+
+    ids = list(np.asarray(prospects['ids']))
+    if not (82 in ids) != (149 in ids):
+        falhas.append(f'esperado um único prospect do candidato 117, ids buscados: {ids}')
+
+    consultas = {
+        'vaga próxima do candidato 117': applicants['embeddings'][0],
+        'várias vagas (max)': np.stack([applicants['embeddings'][0], applicants['embeddings'][1]]),
+    }
+    for nome, consulta in consultas.items():
+        k = len(ids)
+        top = find_top_matches(consulta, prospects, top_n=k)
+        repetidos = top['id'].isin([82, 149]).sum()
+        print(f'{nome}: {list(top["id"])} scores {np.round(top["similarity_score"].to_numpy(dtype=float), 6).tolist()}')
+        if repetidos != 1 or top['id'].duplicated().any() or len(top) != k:
+            falhas.append(f'{nome}: candidato 117 aparece {repetidos} vezes em {list(top["id"])}')
+
+    if falhas:
+        print('FALHA:\n' + '\n'.join(falhas))
+        sys.exit(1)
+    print('OK: cada candidato aparece uma única vez no ranking dos prospects')
+
+
+if __name__ == '__main__':
+    main()
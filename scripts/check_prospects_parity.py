@@ -0,0 +1,69 @@
+"""
+Verificação de regressão do pipeline de prospects.
+
+Reprocessa data/prospects.json com o pipeline atual (sem gerar embeddings) e
+compara o resultado com o prospects.parquet de referência gerado por uma versão
+anterior do script de pré-processamento. Sai com código 1 se houver diferença.
+
+    python scripts/check_prospects_parity.py
+    python scripts/check_prospects_parity.py --referencia /caminho/prospects.parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from benchmark_hot_paths import carregar_script_preprocessamento
+from src.parquet_layout import CATEGORICAL_COLUMNS, TEXT_COLUMN, read_table, text_path  # noqa: E402  (benchmark_hot_paths põe a raiz no path)
+
+
+def normalizar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mesma forma para os dois lados, qualquer que seja o layout do Parquet
+    (antigo: ordem do JSON; atual: ordenado por id_vaga_associada, colunas
+    category e textos em outro arquivo): linhas pelo índice, colunas em ordem e
+    as colunas category e de texto processado como str.
+    """
+    colunas = [coluna for coluna in (*CATEGORICAL_COLUMNS['prospects'], TEXT_COLUMN) if coluna in df]
+    df = df.sort_index(kind='stable')
+    return df.astype({coluna: str for coluna in colunas})[sorted(df.columns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--json', default=os.path.join('data', 'prospects.json'))
+    parser.add_argument('--referencia', default=os.path.join(
+        'data', 'processed_data', 'prospects.parquet'))
+    args = parser.parse_args()
+
+    prep = carregar_script_preprocessamento()
+
+    inicio = time.perf_counter()
+    df_novo = prep.montar_df_prospects(
+        prep.carregar_json_bruto(args.json), prep.limpar_texto)
+    print(f'Pipeline atual executado em {time.perf_counter() - inicio:.1f}s')
+
+    df_referencia = read_table(args.referencia, with_text=True)
+
+    # Normaliza pela mesma serialização usada na referência (exportar_tabela)
+    caminho_temporario = f'{args.referencia}.paridade.parquet'
+    try:
+        prep.exportar_tabela(df_novo, 'prospects', 'id_vaga_associada', caminho_temporario)
+        df_novo = read_table(caminho_temporario, with_text=True)
+    finally:
+        for caminho in (caminho_temporario, text_path(caminho_temporario)):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    try:
+        pd.testing.assert_frame_equal(normalizar(df_novo), normalizar(df_referencia))
+    except AssertionError as e:
+        print(f'DIVERGÊNCIA em relação a {args.referencia}:\n{e}')
+        sys.exit(1)
+    print(f'OK: {len(df_novo)} linhas idênticas a {args.referencia}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Verificação da busca particionada (src/sharded_search.py).
+
+Compara o top k da busca em shards com a busca no próprio processo para
+algumas vagas, mede a latência das duas e simula um shard lento para
+conferir a degradação (resultado parcial dentro do timeout) e a recuperação
+depois de um episódio de consultas perdidas. Sai com código 1 se os
+rankings completos divergirem ou se o shard não se recuperar.
+
+    python scripts/check_sharded_search.py --shards 4
+    python scripts/check_sharded_search.py --alvo prospect_embeddings --shards 8 --consultas 100
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.sharded_search import ShardedSearcher  # noqa: E402
+from src.vector_search import normalize, scan_top_k  # noqa: E402
+
+PROCESSED_DATA_PATH = os.path.join('data', 'processed_data')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--alvo', default='candid_embeddings',
+                        help='Arquivo de vetores (sem extensão) em data/processed_data.')
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--consultas', type=int, default=50, help='Vagas usadas como consultas.')
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='Timeout por consulta no teste do shard lento.')
+    args = parser.parse_args()
+
+    caminho = os.path.join(PROCESSED_DATA_PATH, f'{args.alvo}.npy')
+    vetores = np.load(caminho, mmap_mode='r')
+    consultas = np.load(os.path.join(PROCESSED_DATA_PATH, 'vaga_embeddings.npy'), mmap_mode='r')
+    if consultas.shape[1] != vetores.shape[1]:
+        sys.exit(f'{caminho} tem {vetores.shape[1]} dimensões e as vagas {consultas.shape[1]}; '
+                 'use os vetores completos.')
+    consultas = normalize(consultas[:args.consultas])
+
+    inicio = time.perf_counter()
+    locais = []
+    for consulta in consultas:
+        locais.append(scan_top_k(consulta, vetores, args.k)[0])
+    ms_local = 1000 * (time.perf_counter() - inicio) / len(consultas)
+
+    buscador = ShardedSearcher(caminho, args.shards)
+    try:
+        inicio = time.perf_counter()
+        divergentes = sum(not np.array_equal(buscador.search(consulta, args.k)[0], local)
+                          for consulta, local in zip(consultas, locais))
+        ms_shards = 1000 * (time.perf_counter() - inicio) / len(consultas)
+    finally:
+        buscador.close()
+    print(f'{len(consultas)} consultas, {len(vetores)} vetores: {ms_local:.1f} ms/consulta no processo, '
+          f'{ms_shards:.1f} ms/consulta em {args.shards} shards, {divergentes} rankings divergentes.')
+
+    buscador = ShardedSearcher(caminho, args.shards, timeout_s=args.timeout,
+                               shard_delay_s={0: args.timeout * 3})
+    try:
+        inicio = time.perf_counter()
+        linhas, _, faltando = buscador.search(consultas[0], args.k)
+        segundos = time.perf_counter() - inicio
+        print(f'Shard lento: resposta em {segundos:.2f}s com {len(linhas)} linhas, '
+              f'shards faltando {faltando}.')
+    finally:
+        buscador.close()
+
+    # Episódio lento: com timeout curto o shard 0 perde algumas consultas seguidas, que
+    # ficam na fila dele. Com o timeout normal as consultas seguintes devem voltar completas
+    buscador = ShardedSearcher(caminho, args.shards, timeout_s=args.timeout,
+                               shard_delay_s={0: args.timeout * 0.4})
+    try:
+        buscador.timeout_s = args.timeout * 0.1
+        perdidas = [buscador.search(consulta, args.k)[2] for consulta in consultas[:3]]
+        buscador.timeout_s = args.timeout
+        depois = [buscador.search(consulta, args.k)[2] for consulta in consultas[3:8]]
+        print(f'Episódio lento: shards faltando {perdidas} durante, {depois} depois.')
+    finally:
+        buscador.close()
+
+    if divergentes or any(depois):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
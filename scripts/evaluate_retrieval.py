@@ -0,0 +1,205 @@
+"""
+Avaliação offline da busca de candidatos usando os prospects como gabarito.
+
+Para cada vaga com prospects, mede se a busca em candid_embeddings coloca os
+candidatos prospectados no topo (recall@k, MRR e nDCG@k, ver
+src/retrieval_eval.py) e compara configurações de índice, quantização e
+dimensão, imprimindo uma tabela de qualidade x latência:
+
+- exato (lote): todas as vagas em `batch_top_k`, float32;
+- exato (por vaga): uma consulta por vez, como no app (`MatchCursor`);
+- float16 / int8: embeddings quantizados (int8 com escala por linha);
+- pca-<d>: embeddings e consultas projetados em d dimensões (PCA em amostra);
+- pca-<d> (armazenado): vetores reduzidos gravados no pré-processamento, se existirem;
+- clusters n_probe=<p>: busca podada pelos clusters (se candid_clusters.npz existir).
+
+    python scripts/evaluate_retrieval.py
+    python scripts/evaluate_retrieval.py --max-vagas 500 --dimensoes 64 128 --n-probes 4 8 16 --saida data/benchmarks/eval.csv
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.clustering import CANDID_CLUSTERS_FILE  # noqa: E402
+from src.embedding_projection import PROJECTION_FILE, load_projection, load_reduced, project  # noqa: E402
+from src.nlp_matcher import (  # noqa: E402
+    CANDID_EMBEDDINGS_FILE,
+    VAGA_EMBEDDINGS_FILE,
+    MatchCursor,
+    npy_paths,
+)
+from src.id_array import IdArray  # noqa: E402
+from src.retrieval_eval import EVAL_KS, build_relevance, evaluate_rankings  # noqa: E402
+from src.vector_search import batch_top_k, normalize  # noqa: E402
+
+PROCESSED_DATA_PATH = os.path.join('data', 'processed_data')
+
+
+def carregar_embeddings(caminho):
+    """Ids e vetores de <caminho>.npy (mapeado em memória) ou, na ausência dele, do .pkl."""
+    caminho_vetores, caminho_ids = npy_paths(caminho)
+    if os.path.exists(caminho_vetores) and os.path.exists(caminho_ids):
+        return IdArray.load(caminho_ids), np.load(caminho_vetores, mmap_mode='r')
+    with open(caminho, 'rb') as f:
+        dados = pickle.load(f)
+    return IdArray.from_values(dados['ids']), np.asarray(dados['embeddings'], dtype=np.float32)
+
+
+class EmbeddingsInt8:
+    """Embeddings normalizados quantizados em int8 com escala por linha, lidos como float32."""
+
+    def __init__(self, embeddings, tamanho_lote=65536):
+        self.vetores = np.empty(embeddings.shape, dtype=np.int8)
+        self.escalas = np.empty((len(embeddings), 1), dtype=np.float32)
+        for inicio in range(0, len(embeddings), tamanho_lote):
+            bloco = normalize(embeddings[inicio:inicio + tamanho_lote])
+            escala = np.clip(np.abs(bloco).max(axis=1, keepdims=True), 1e-12, None) / 127
+            self.vetores[inicio:inicio + len(bloco)] = np.round(bloco / escala).astype(np.int8)
+            self.escalas[inicio:inicio + len(bloco)] = escala
+        self.shape = self.vetores.shape
+        self.nbytes = self.vetores.nbytes + self.escalas.nbytes
+
+    def __len__(self):
+        return len(self.vetores)
+
+    def __getitem__(self, fatia):
+        return self.vetores[fatia].astype(np.float32) * self.escalas[fatia]
+
+
+def projetar_pca(embeddings, consultas, dimensao, amostra, semente, tamanho_lote=65536):
+    """Ajusta um PCA em uma amostra e projeta embeddings (em lotes) e consultas."""
+    from sklearn.decomposition import PCA
+
+    rng = np.random.default_rng(semente)
+    linhas = np.sort(rng.choice(len(embeddings), size=min(amostra, len(embeddings)), replace=False))
+    pca = PCA(n_components=dimensao, random_state=semente).fit(normalize(embeddings[linhas]))
+    projetados = np.empty((len(embeddings), dimensao), dtype=np.float32)
+    for inicio in range(0, len(embeddings), tamanho_lote):
+        projetados[inicio:inicio + tamanho_lote] = pca.transform(
+            normalize(embeddings[inicio:inicio + tamanho_lote]))
+    return projetados, pca.transform(normalize(consultas)).astype(np.float32)
+
+
+def empilhar(rankings, k):
+    """Matriz (consultas x k) de rankings que podem ter menos de k linhas, completada com -1."""
+    matriz = np.full((len(rankings), k), -1, dtype=np.int64)
+    for posicao, linhas in enumerate(rankings):
+        matriz[posicao, :len(linhas)] = linhas[:k]
+    return matriz
+
+
+def medir(nome, buscar, relevancia, memoria_mb):
+    """Executa `buscar()` (que devolve o ranking consultas x k) e avalia."""
+    inicio = time.perf_counter()
+    ranking = buscar()
+    segundos = time.perf_counter() - inicio
+    linha = {'configuracao': nome, **evaluate_rankings(ranking, relevancia),
+             'ms/vaga': 1000 * segundos / len(ranking), 'memoria (MB)': memoria_mb}
+    print(f"DEBUG_EVAL: {nome} avaliado em {segundos:.2f}s.")
+    return linha
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--max-vagas', type=int, default=None,
+                        help='Avalia só as primeiras N vagas com prospects.')
+    parser.add_argument('--dimensoes', type=int, nargs='*', default=[64, 128],
+                        help='Dimensões do PCA avaliadas.')
+    parser.add_argument('--pca-amostra', type=int, default=50000,
+                        help='Linhas usadas para ajustar o PCA.')
+    parser.add_argument('--n-probes', type=int, nargs='*', default=[4, 8, 16],
+                        help='n_probe avaliados na busca por clusters.')
+    parser.add_argument('--sem-quantizacao', action='store_true',
+                        help='Não avalia float16 e int8.')
+    parser.add_argument('--saida', default=None, help='Grava a tabela em CSV.')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    df_jobs = pd.read_parquet(os.path.join(PROCESSED_DATA_PATH, 'vagas.parquet'), columns=['id_vaga'])
+    df_applicants = pd.read_parquet(os.path.join(PROCESSED_DATA_PATH, 'applicants.parquet'),
+                                    columns=['id_candidato'])
+    df_prospects = pd.read_parquet(os.path.join(PROCESSED_DATA_PATH, 'prospects.parquet'),
+                                   columns=['id_vaga_associada', 'id_prospect', 'situacao_candidado'])
+    vaga_ids, vaga_embeddings = carregar_embeddings(VAGA_EMBEDDINGS_FILE)
+    candid_ids, candid_embeddings = carregar_embeddings(CANDID_EMBEDDINGS_FILE)
+
+    relevancia = build_relevance(df_jobs, df_prospects, vaga_ids, df_applicants, candid_ids)
+    if args.max_vagas:
+        manter = relevancia['query_codes'] < args.max_vagas
+        relevancia = dict(relevancia, queries=relevancia['queries'][:args.max_vagas],
+                          **{chave: relevancia[chave][manter] for chave in ('keys', 'gains', 'query_codes')})
+    consultas = np.asarray(vaga_embeddings[relevancia['queries']], dtype=np.float32)
+    k = max(EVAL_KS)
+    print(f"{len(consultas)} vagas com prospects, {len(relevancia['keys'])} pares relevantes, "
+          f"{len(candid_embeddings)} candidatos.")
+
+    memoria_float32 = candid_embeddings.shape[0] * candid_embeddings.shape[1] * 4 / 2**20
+    linhas = [
+        medir('exato (lote)', lambda: batch_top_k(consultas, candid_embeddings, k)[0],
+              relevancia, memoria_float32),
+        medir('exato (por vaga)', lambda: empilhar([
+            MatchCursor.from_query(consulta, {'ids': candid_ids, 'embeddings': candid_embeddings}, k)
+            .ranked['row'].to_numpy() for consulta in consultas], k), relevancia, memoria_float32),
+    ]
+
+    if not args.sem_quantizacao:
+        embeddings_float16 = np.asarray(candid_embeddings, dtype=np.float16)
+        linhas.append(medir('float16', lambda: batch_top_k(consultas, embeddings_float16, k)[0],
+                            relevancia, embeddings_float16.nbytes / 2**20))
+        del embeddings_float16
+        embeddings_int8 = EmbeddingsInt8(candid_embeddings)
+        linhas.append(medir('int8', lambda: batch_top_k(consultas, embeddings_int8, k)[0],
+                            relevancia, embeddings_int8.nbytes / 2**20))
+        del embeddings_int8
+
+    for dimensao in args.dimensoes:
+        if dimensao >= candid_embeddings.shape[1]:
+            continue
+        projetados, consultas_projetadas = projetar_pca(
+            candid_embeddings, consultas, dimensao, args.pca_amostra, args.semente)
+        linhas.append(medir(f'pca-{dimensao}', lambda: batch_top_k(consultas_projetadas, projetados, k)[0],
+                            relevancia, projetados.nbytes / 2**20))
+        del projetados
+
+    # Vetores reduzidos gravados no pré-processamento (os que o app usa)
+    projecao = load_projection(PROJECTION_FILE)
+    reduzidos = load_reduced(CANDID_EMBEDDINGS_FILE, len(candid_embeddings)) if projecao is not None else None
+    if reduzidos is not None:
+        consultas_projetadas = project(consultas, projecao)
+        linhas.append(medir(f'pca-{reduzidos.shape[1]} (armazenado)',
+                            lambda: batch_top_k(consultas_projetadas, reduzidos, k)[0],
+                            relevancia, reduzidos.nbytes / 2**20))
+
+    if os.path.exists(CANDID_CLUSTERS_FILE):
+        with np.load(CANDID_CLUSTERS_FILE) as arquivo:
+            clusters = {chave: arquivo[chave] for chave in arquivo.files}
+        if int(clusters['n_rows']) == len(candid_embeddings):
+            alvo = {'ids': candid_ids, 'embeddings': candid_embeddings, 'clusters': clusters}
+            for n_probe in args.n_probes:
+                linhas.append(medir(f'clusters n_probe={n_probe}', lambda: empilhar([
+                    MatchCursor.from_query(consulta, alvo, k, n_probe).ranked['row'].to_numpy()
+                    for consulta in consultas], k), relevancia, memoria_float32))
+        else:
+            print(f"{CANDID_CLUSTERS_FILE} está desatualizado; rode scripts/build_candidate_clusters.py.")
+
+    tabela = pd.DataFrame(linhas).set_index('configuracao')
+    with pd.option_context('display.float_format', '{:.3f}'.format, 'display.width', 200,
+                           'display.max_columns', None):
+        print(tabela)
+    if args.saida:
+        os.makedirs(os.path.dirname(args.saida) or '.', exist_ok=True)
+        tabela.to_csv(args.saida)
+        print(f'Tabela salva em {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
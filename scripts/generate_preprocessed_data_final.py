@@ -1,13 +1,28 @@
 
+import hashlib
 import os
 import pathlib
 import re
+import sys
 import pandas as pd
 import json
 import numpy as np
-import pickle
-from sentence_transformers import SentenceTransformer
+import pyarrow as pa
+import pyarrow.compute as pc
 import unicodedata
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from src.embedding_backend import load_embedding_model  # noqa: E402
+from src.embedding_projection import REDUCED_DIM, reduce_embedding_files  # noqa: E402
+from src.id_array import IdArray  # noqa: E402
+from src.match_explainer import build_segments  # noqa: E402
+from src.parquet_layout import memory_report, optimize_dtypes, read_table, write_table  # noqa: E402
+from src.prospect_mapping import applicant_rows, build_row_map, remove_row_map, save_row_map  # noqa: E402
+from src.utils import metrics  # noqa: E402
+
 pd.set_option('display.max_columns', None)
 
 
@@ -33,8 +48,377 @@ def limpar_texto(texto):
     return texto
 
 
+# Esquemas de achatamento: para cada seção do JSON, os campos mantidos na ordem
+# de saída. Campos presentes em mais de uma seção ficam com o valor da última
+# seção (mesma semântica do antigo {**secao_1, **secao_2}). A chave None
+# representa campos no nível raiz do registro. Campos fora do esquema (cpf,
+# telefone, endereco, ...) nunca chegam a virar colunas.
+ESQUEMA_APPLICANTS = {
+    'infos_basicas': (
+        'objetivo_profissional', 'sabendo_de_nos_por',
+        'codigo_profissional', 'nome',
+    ),
+    'informacoes_pessoais': ('nome', 'url_linkedin'),
+    'informacoes_profissionais': (
+        'titulo_profissional', 'area_atuacao', 'conhecimentos_tecnicos',
+        'certificacoes', 'outras_certificacoes', 'nivel_profissional',
+    ),
+    'formacao_e_idiomas': (
+        'nivel_academico', 'nivel_ingles', 'nivel_espanhol', 'outro_idioma',
+        'instituicao_ensino_superior', 'cursos', 'ano_conclusao',
+    ),
+    'cargo_atual': ('cargo_atual', 'projeto_atual', 'cliente', 'unidade'),
+    None: ('cv_pt',),
+}
+
+# Campos conhecidos e descartados (dados pessoais ou sem valor para o matching)
+CAMPOS_DESCARTADOS_APPLICANTS = {
+    'telefone_recado', 'telefone', 'telefone_celular', 'data_criacao',
+    'inserido_por', 'data_atualizacao', 'data_aceite', 'cpf',
+    'fonte_indicacao', 'email_secundario', 'data_nascimento', 'sexo',
+    'estado_civil', 'pcd', 'endereco', 'skype', 'facebook', 'remuneracao',
+    'download_cv', 'outro_curso', 'id_ibrati', 'email_corporativo',
+    'data_admissao', 'email', 'local', 'data_ultima_promocao',
+    'nome_superior_imediato', 'email_superior_imediato', 'cv_en',
+}
+
+ESQUEMA_VAGAS = {
+    'informacoes_basicas': (
+        'data_requicisao', 'limite_esperado_para_contratacao', 'titulo_vaga',
+        'vaga_sap', 'empresa_divisao', 'tipo_contratacao', 'prazo_contratacao',
+        'objetivo_vaga', 'prioridade_vaga', 'nome', 'data_inicial',
+        'data_final',
+    ),
+    'perfil_vaga': (
+        'estado', 'cidade', 'bairro', 'regiao', 'vaga_especifica_para_pcd',
+        'faixa_etaria', 'horario_trabalho', 'nivel profissional',
+        'nivel_academico', 'nivel_ingles', 'nivel_espanhol', 'outro_idioma',
+        'areas_atuacao', 'principais_atividades',
+        'competencia_tecnicas_e_comportamentais', 'demais_observacoes',
+        'viagens_requeridas', 'equipamentos_necessarios',
+        'habilidades_comportamentais_necessarias',
+    ),
+    'beneficios': ('valor_venda', 'valor_compra_1', 'valor_compra_2'),
+}
+
+CAMPOS_DESCARTADOS_VAGAS = {
+    'solicitante_cliente', 'cliente', 'requisitante', 'analista_responsavel',
+    'superior_imediato', 'origem_vaga', 'telefone', 'pais', 'local_trabalho',
+    'nome_substituto',
+}
+
+# Campos divididos em trechos para a explicação extrativa dos matches
+CAMPOS_SEGMENTOS_APPLICANTS = (
+    'titulo_profissional', 'area_atuacao', 'conhecimentos_tecnicos',
+    'certificacoes', 'outras_certificacoes', 'cursos', 'cargo_atual',
+    'objetivo_profissional', 'cv_pt',
+)
+
+CAMPOS_SEGMENTOS_VAGAS = (
+    'titulo_vaga', 'areas_atuacao', 'principais_atividades',
+    'competencia_tecnicas_e_comportamentais',
+    'habilidades_comportamentais_necessarias', 'demais_observacoes',
+)
+
+# Marcador de campo ausente no registro (diferente de um valor vazio)
+_AUSENTE = object()
+
+
+def carregar_json_bruto(path):
+    """Carrega o JSON como dicionário {id: registro}, sem montar DataFrame."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def achatar_registros(dados, esquema, coluna_chave=None):
+    """
+    Achata registros aninhados em um DataFrame contendo apenas as colunas
+    declaradas em `esquema`. O trabalho é feito coluna a coluna, sem copiar os
+    dicionários de cada registro. Se `coluna_chave` for informado, a chave do
+    registro no JSON vira uma coluna (string) ao final.
+    """
+    registros = list(dados.values())
+    colunas = {}
+
+    for secao, campos in esquema.items():
+        if secao is None:
+            dicts_secao = registros
+        else:
+            dicts_secao = [
+                valor if isinstance(valor, dict) else {}
+                for valor in (registro.get(secao) for registro in registros)
+            ]
+
+        for campo in campos:
+            valores = [d.get(campo, _AUSENTE) for d in dicts_secao]
+            if campo in colunas:
+                # A seção mais recente sobrescreve a anterior quando possui o campo
+                valores = [anterior if novo is _AUSENTE else novo
+                           for anterior, novo in zip(colunas[campo], valores)]
+            colunas[campo] = valores
+
+    df = pd.DataFrame({
+        campo: ['' if valor is _AUSENTE or valor is None else valor
+                for valor in valores]
+        for campo, valores in colunas.items()
+    })
+    if coluna_chave is not None:
+        df[coluna_chave] = [str(chave) for chave in dados.keys()]
+    return df
+
+
+def verificar_esquema(dados, esquema, descartados, amostra=1000):
+    """Avisa sobre campos do JSON que não estão no esquema nem nos descartados."""
+    conhecidos = set(descartados)
+    for secao, campos in esquema.items():
+        conhecidos.update(campos)
+        if secao is not None:
+            conhecidos.add(secao)
+
+    encontrados = set()
+    for registro in list(dados.values())[:amostra]:
+        for secao, valor in registro.items():
+            if isinstance(valor, dict):
+                encontrados.update(valor.keys())
+            else:
+                encontrados.add(secao)
+
+    novos = sorted(encontrados - conhecidos)
+    if novos:
+        print(f'AVISO: campos fora do esquema serão ignorados: {novos}')
+    return novos
+
+
+def expandir_applicants(dados):
+    """Achata as seções aninhadas de applicants.json em um DataFrame plano."""
+    return achatar_registros(dados, ESQUEMA_APPLICANTS)
+
+
+def expandir_vagas(dados):
+    """Achata as seções aninhadas de vagas.json em um DataFrame plano."""
+    return achatar_registros(dados, ESQUEMA_VAGAS, coluna_chave='id_vaga')
+
+
+# Campos de cada prospect dentro da lista `prospects` de uma vaga
+CAMPOS_PROSPECT = (
+    'nome', 'codigo', 'situacao_candidado', 'data_candidatura',
+    'ultima_atualizacao', 'comentario', 'recrutador',
+)
+
+
+def _somente_textos(prospects):
+    """Troca valores não textuais por None (limpar_texto já os tornaria vazios)."""
+    if not isinstance(prospects, list):
+        return None
+    return [
+        {campo: valor if isinstance(valor, str) else None
+         for campo, valor in prospect.items()}
+        if isinstance(prospect, dict) else None
+        for prospect in prospects
+    ]
+
+
+def _coluna_texto(registros, campo):
+    return pa.array([valor if isinstance(valor, str) else None
+                     for valor in (registro.get(campo) for registro in registros)],
+                    type=pa.string())
+
+
+def expandir_prospects(dados):
+    """
+    Explode a lista de prospects de cada vaga em uma linha por prospect.
+    A lista é convertida para uma coluna Arrow list<struct>, achatada com
+    list_flatten e os campos da vaga são replicados por list_parent_indices,
+    sem laços linha a linha em pandas. Vagas sem prospects não geram linhas.
+    """
+    ids_vaga = pa.array([str(chave) for chave in dados.keys()], type=pa.string())
+    registros = list(dados.values())
+
+    tipo = pa.list_(pa.struct([(campo, pa.string()) for campo in CAMPOS_PROSPECT]))
+    listas = [registro.get('prospects') for registro in registros]
+    try:
+        prospects = pa.array(listas, type=tipo)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        prospects = pa.array([_somente_textos(lista) for lista in listas], type=tipo)
+
+    planos = pc.list_flatten(prospects)
+    pais = pc.list_parent_indices(prospects)
+    validos = planos.is_valid()
+    planos = planos.filter(validos)
+    pais = pais.filter(validos)
+
+    tabela = pa.table({
+        'id_vaga_associada': ids_vaga.take(pais),
+        **{campo: planos.field(campo) for campo in CAMPOS_PROSPECT},
+        'titulo': _coluna_texto(registros, 'titulo').take(pais),
+        'modalidade': _coluna_texto(registros, 'modalidade').take(pais),
+    })
+    return tabela.to_pandas().fillna('')
+
+
+def limpar_coluna(serie, limpar_texto):
+    """Aplica `limpar_texto` uma única vez por valor distinto da coluna."""
+    codigos, unicos = pd.factorize(serie)
+    # O código -1 (valor nulo) aponta para o último elemento, que fica vazio
+    limpos = np.array([limpar_texto(valor) for valor in unicos] + [''],
+                      dtype=object)
+    return pd.Series(limpos[codigos], index=serie.index)
+
+
+def juntar_textos(df):
+    """
+    Concatena as colunas de texto com espaço ignorando valores vazios, de forma
+    colunar. Equivale a ' '.join(filter(None, linha)) aplicado linha a linha.
+    """
+    textos = None
+    for coluna in df.columns:
+        valores = df[coluna].to_numpy(dtype=object)
+        if textos is None:
+            textos = valores.copy()
+            continue
+        vazio_textos = textos == ''
+        vazio_valores = valores == ''
+        juntos = textos + ' ' + valores
+        textos = np.where(vazio_valores, textos,
+                          np.where(vazio_textos, valores, juntos))
+    return pd.Series(textos, index=df.index, dtype=object)
+
+
+def montar_df_prospects(dados, limpar_texto):
+    """Gera o DataFrame final de prospects (o mesmo gravado em prospects.parquet)."""
+    df_prospects = expandir_prospects(dados)
+
+    for coluna in df_prospects.columns:
+        print(f'Limpeza da coluna {coluna}')
+        df_prospects[coluna] = limpar_coluna(df_prospects[coluna], limpar_texto)
+
+    df_prospects['processed_text'] = juntar_textos(df_prospects)
+
+    df_prospects['id_prospect'] = df_prospects['codigo'].copy()
+    df_prospects.drop(columns='codigo', inplace=True)
+    return df_prospects
+
+
+def _gravar_checkpoint(caminho, estado):
+    temporario = f'{caminho}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f)
+    os.replace(temporario, caminho)
+
+
+def _assinatura_textos(textos, ids):
+    """Hash dos textos e ids, usado para só retomar um checkpoint da mesma entrada."""
+    h = hashlib.sha256()
+    for texto in textos:
+        h.update(texto.encode('utf-8'))
+        h.update(b'\0')
+    h.update(np.ascontiguousarray(ids).tobytes())
+    return h.hexdigest()
+
+
+def gerar_embeddings_em_lotes(embedding_model, textos, ids, caminho_base,
+                              tamanho_lote=4096):
+    """
+    Codifica `textos` em lotes gravando cada lote direto em um .npy mapeado em
+    memória, sem manter o array completo em RAM. Gera:
+
+    - <caminho_base>.npy: vetores float32 (n, dimensao), na ordem de `ids`;
+    - <caminho_base>_ids.npy: ids correspondentes a cada linha (int64 ou, para
+      ids não numéricos, códigos do dicionário <caminho_base>_ids_labels.npy);
+    - <caminho_base>.checkpoint.json: progresso, removido ao final.
+
+    Se o processo cair no meio, uma nova execução com os mesmos textos retoma
+    a partir do último lote gravado.
+    """
+    caminho_vetores = f'{caminho_base}.npy'
+    caminho_parcial = f'{caminho_base}.parcial.npy'
+    caminho_ids = f'{caminho_base}_ids.npy'
+    caminho_checkpoint = f'{caminho_base}.checkpoint.json'
+
+    ids = np.asarray(ids)
+    if ids.dtype == object:
+        ids = ids.astype(str)
+    total = len(textos)
+    assinatura = _assinatura_textos(textos, ids)
+
+    estado = None
+    if os.path.exists(caminho_checkpoint) and os.path.exists(caminho_parcial):
+        with open(caminho_checkpoint, encoding='utf-8') as f:
+            estado = json.load(f)
+        if estado.get('assinatura') != assinatura or estado.get('total') != total:
+            print('Checkpoint de outra entrada encontrado, recomeçando do zero.')
+            estado = None
+
+    vetores = None
+    if estado is not None:
+        vetores = np.lib.format.open_memmap(caminho_parcial, mode='r+')
+        print(f"Retomando embeddings a partir de {estado['concluidos']}/{total}.")
+    else:
+        estado = {'assinatura': assinatura, 'total': total, 'concluidos': 0}
+
+    # Os ids são gravados de uma vez, antes dos vetores
+    IdArray.from_values(ids).save(caminho_ids)
+
+    for inicio in range(estado['concluidos'], total, tamanho_lote):
+        fim = min(inicio + tamanho_lote, total)
+        with metrics.span("embedding_encode_batch"):
+            lote = embedding_model.encode(
+                textos[inicio:fim], convert_to_numpy=True).astype(np.float32)
+
+        if vetores is None:
+            # Aloca o arquivo completo ao conhecer a dimensão do modelo
+            vetores = np.lib.format.open_memmap(
+                caminho_parcial, mode='w+', dtype=np.float32,
+                shape=(total, lote.shape[1]))
+
+        vetores[inicio:fim] = lote
+        vetores.flush()
+        estado['concluidos'] = fim
+        _gravar_checkpoint(caminho_checkpoint, estado)
+        print(f'Embeddings gravados: {fim}/{total}')
+
+    if vetores is None:
+        # Nenhum texto para codificar
+        np.save(caminho_parcial, np.empty((0, 0), dtype=np.float32))
+    del vetores
+
+    os.replace(caminho_parcial, caminho_vetores)
+    if os.path.exists(caminho_checkpoint):
+        os.remove(caminho_checkpoint)
+    print(f'Embeddings salvos em {caminho_vetores} e {caminho_ids}')
+
+
+def exportar_tabela(df, nome, coluna_id, caminho):
+    """
+    Grava a tabela `nome` em `caminho` no layout de src/parquet_layout.py, com as colunas de
+    perfil de poucos valores distintos como category. `df` não é alterado.
+    """
+    otimizado = optimize_dtypes(df, nome)
+    print(f'Memória de {nome} com colunas category:\n{memory_report(df, otimizado)}')
+    write_table(otimizado, caminho, sort_by=coluna_id)
+
+
+def gerar_segmentos(embedding_model, df, campos, caminho_base):
+    """
+    Divide os `campos` de cada linha de `df` em trechos e grava a tabela de
+    trechos (<caminho_base>.parquet) e os vetores dos trechos distintos
+    (<caminho_base>_vectors.npy), usados na explicação extrativa dos matches.
+    Trechos repetidos entre linhas são codificados uma única vez.
+    """
+    segmentos = build_segments(df, campos)
+    codigos, textos_unicos = pd.factorize(segmentos['texto'])
+    segmentos['vetor'] = codigos.astype(np.int32)
+    print(f'{len(segmentos)} trechos ({len(textos_unicos)} distintos) em {len(df)} linhas.')
+
+    segmentos.to_parquet(f'{caminho_base}.parquet', index=False)
+    with metrics.span("embedding_encode", entidade=os.path.basename(caminho_base)):
+        gerar_embeddings_em_lotes(
+            embedding_model, list(textos_unicos), np.arange(len(textos_unicos)),
+            f'{caminho_base}_vectors')
+
+
 def processing_applicants(embedding_model,
-                          carregar_json_com_dict,
+                          carregar_json,
                           limpar_texto,
                           BASE_DATA_PATH,
                           PROCESSED_DATA_PATH,
@@ -42,42 +426,21 @@ def processing_applicants(embedding_model,
 
     print('Processamento de applicants iniciado')
 
-    df_applicants = carregar_json_com_dict(
+    dados_applicants = carregar_json(
         f"{BASE_DATA_PATH}/applicants.json")
 
-    applicants_expand = df_applicants.apply(lambda row: {
-        **row.get('infos_basicas', {}),
-        **row.get('informacoes_pessoais', {}),
-        **row.get('informacoes_profissionais', {}),
-        **row.get('formacao_e_idiomas', {}),
-        **row.get('cargo_atual', {}),
-        'cv_pt': row.get('cv_pt', '')
-    }, axis=1)
-    df_applicants = pd.DataFrame(applicants_expand.tolist()).fillna('')
+    verificar_esquema(dados_applicants, ESQUEMA_APPLICANTS,
+                      CAMPOS_DESCARTADOS_APPLICANTS)
+    df_applicants = expandir_applicants(dados_applicants)
+    del dados_applicants
 
     df_applicants.insert(
         0, "id_candidato",
-        df_applicants['codigo_profissional'],
+        df_applicants.pop('codigo_profissional'),
     )
 
     print(f'Shape de applicants : {df_applicants.shape}')
 
-    df_applicants.describe(include='all')
-
-    cols_to_drop = [
-        'telefone_recado', 'telefone', 'telefone_celular', 'data_criacao',
-        'inserido_por', 'data_atualizacao', 'codigo_profissional',
-        'data_aceite', 'cpf', 'fonte_indicacao', 'email_secundario',
-        'data_nascimento', 'sexo', 'estado_civil', 'pcd', 'endereco',
-        'skype', 'facebook', 'remuneracao', 'download_cv', 'outro_curso',
-        'id_ibrati', 'email_corporativo', 'data_admissao', 'email', 'local',
-        'data_ultima_promocao', 'nome_superior_imediato',
-        'email_superior_imediato', 'inserido_por'
-    ]
-
-    df_applicants.drop(columns=cols_to_drop, axis=1, inplace=True)
-    print(df_applicants.shape)
-
     print(f'Apenas candidatos únicos?'
           f'{df_applicants["id_candidato"].nunique() == df_applicants.shape[0]}')
 
@@ -85,18 +448,17 @@ def processing_applicants(embedding_model,
 
     for coluna in df_applicants.columns:
         print(f'Limpeza da coluna {coluna}')
-        df_applicants[coluna] = df_applicants[coluna].apply(
-            limpar_texto)
+        df_applicants[coluna] = limpar_coluna(
+            df_applicants[coluna], limpar_texto)
 
     print('Gerando texto único processado.')
 
-    df_applicants.loc[slice(None), 'processed_text'] = df_applicants.apply(
-        lambda x: ' '.join(filter(None, [*x])).strip(), axis=1)
+    df_applicants['processed_text'] = juntar_textos(df_applicants)
 
     print('Exportando arquivo gerado em applicants inicialmente em parquet.')
 
-    df_applicants.to_parquet(os.path.join(
-        PROCESSED_DATA_PATH, 'applicants.parquet'), index=True)
+    exportar_tabela(df_applicants, 'applicants', 'id_candidato',
+                    os.path.join(PROCESSED_DATA_PATH, 'applicants.parquet'))
 
     print('Gerando embeddings em df_applicants (candidatos)')
 
@@ -108,131 +470,113 @@ def processing_applicants(embedding_model,
                     for text in candid_texts
                     ]
 
-    candid_embeddings_array = embedding_model.encode(
-        candid_texts, show_progress_bar=True, convert_to_numpy=True)
+    candid_ids = df_applicants.index.to_numpy()
+
+    print('Gerando trechos de applicants para as explicações dos matches')
+    gerar_segmentos(embedding_model, df_applicants, CAMPOS_SEGMENTOS_APPLICANTS,
+                    os.path.join(PROCESSED_DATA_PATH, 'candid_segments'))
+    del df_applicants
 
-    print('Exportando o arquivo de candidatos embeddado em pickle.')
-    with open(CANDID_EMBEDDINGS_FILE, 'wb') as f:
-        pickle.dump({'ids': df_applicants.index.tolist(),
-                     'embeddings': candid_embeddings_array}, f)
+    print('Exportando o arquivo de candidatos embeddado em lotes (.npy).')
+    with metrics.span("embedding_encode", entidade="applicants"):
+        gerar_embeddings_em_lotes(
+            embedding_model, candid_texts, candid_ids,
+            os.path.splitext(CANDID_EMBEDDINGS_FILE)[0])
 
     print('Processamento de applicants concluído')
 
 
-def processing_vagas(embedding_model, carregar_json_com_dict, limpar_texto, BASE_DATA_PATH, PROCESSED_DATA_PATH, VAGA_EMBEDDINGS_FILE):
+def processing_vagas(embedding_model, carregar_json, limpar_texto, BASE_DATA_PATH, PROCESSED_DATA_PATH, VAGA_EMBEDDINGS_FILE):
     print('Iniciado processsamento de vagas')
 
-    df_vagas = carregar_json_com_dict(
+    dados_vagas = carregar_json(
         f"{BASE_DATA_PATH}/vagas.json")
 
-    vagas_expand = df_vagas.apply(lambda row: {
-        **row.get('informacoes_basicas', {}),
-        **row.get('perfil_vaga', {}),
-        **row.get('beneficios', {}),
-        'id_vaga': row.name
-    }, axis=1)
-
-    df_vagas = pd.DataFrame(vagas_expand.tolist()).fillna('')
-    df_vagas["id_vaga"] = df_vagas["id_vaga"].astype(str)
-    print(f'Shape de vagas : {df_vagas.shape}')
-
-    cols_to_drop = [
-        'solicitante_cliente', 'cliente', 'requisitante', 'analista_responsavel',
-        'superior_imediato', 'origem_vaga', 'telefone', 'pais', 'local_trabalho',
-        'nome_substituto'
-    ]
-    df_vagas.drop(columns=cols_to_drop, axis=1, inplace=True)
+    verificar_esquema(dados_vagas, ESQUEMA_VAGAS, CAMPOS_DESCARTADOS_VAGAS)
+    df_vagas = expandir_vagas(dados_vagas)
+    del dados_vagas
 
     print(f'Shape de vagas : {df_vagas.shape}')
 
     for coluna in df_vagas.columns:
         print(f'Limpeza da coluna {coluna}')
-        df_vagas[coluna] = df_vagas[coluna].apply(
-            limpar_texto)
+        df_vagas[coluna] = limpar_coluna(df_vagas[coluna], limpar_texto)
 
-    df_vagas['processed_text'] = df_vagas.apply(
-        lambda x: ' '.join(filter(None, [*x])).strip(), axis=1)
+    df_vagas['processed_text'] = juntar_textos(df_vagas)
 
-    df_vagas.to_parquet(os.path.join(
-        PROCESSED_DATA_PATH, "vagas.parquet"), index=True)
+    exportar_tabela(df_vagas, 'vagas', 'id_vaga',
+                    os.path.join(PROCESSED_DATA_PATH, 'vagas.parquet'))
 
     print('Gerando embedding para vagas')
 
     vaga_texts = df_vagas['processed_text'].tolist()
     vaga_texts = [str(text) if pd.notna(
         text) else "" for text in vaga_texts]
-    vaga_embeddings_array = embedding_model.encode(
-        vaga_texts, show_progress_bar=True, convert_to_numpy=True)
-
-    print('Exportando o arquivo de vagas embeddado em pickle.')
-
-    with open(VAGA_EMBEDDINGS_FILE, 'wb') as f:
-        pickle.dump({'ids': df_vagas.index.tolist(),
-                     'embeddings': vaga_embeddings_array}, f)
-
-
-def processing_prospects(embedding_model, carregar_json_com_dict, limpar_texto, BASE_DATA_PATH, PROCESSED_DATA_PATH, PROSPECT_EMBEDDINGS_FILE):
-    df_prospects = carregar_json_com_dict(
+    print('Exportando o arquivo de vagas embeddado em lotes (.npy).')
+    with metrics.span("embedding_encode", entidade="vagas"):
+        gerar_embeddings_em_lotes(
+            embedding_model, vaga_texts, df_vagas.index.to_numpy(),
+            os.path.splitext(VAGA_EMBEDDINGS_FILE)[0])
+
+    print('Gerando trechos de vagas para as explicações dos matches')
+    gerar_segmentos(embedding_model, df_vagas, CAMPOS_SEGMENTOS_VAGAS,
+                    os.path.join(PROCESSED_DATA_PATH, 'vaga_segments'))
+
+
+def mapear_prospects_em_candidatos(df_prospects, PROCESSED_DATA_PATH, CANDID_EMBEDDINGS_FILE):
+    """
+    Linha em candid_embeddings do candidato de cada prospect (-1 se ele não
+    está em applicants), pelo código do candidato. None se os embeddings de
+    candidatos ainda não foram gerados.
+    """
+    caminho_ids = f'{os.path.splitext(CANDID_EMBEDDINGS_FILE)[0]}_ids.npy'
+    caminho_applicants = os.path.join(PROCESSED_DATA_PATH, 'applicants.parquet')
+    if not (os.path.exists(caminho_ids) and os.path.exists(caminho_applicants)):
+        return None
+    df_applicants = read_table(caminho_applicants, columns=['id_candidato'])
+    return applicant_rows(df_prospects['id_prospect'], df_applicants['id_candidato'],
+                          df_applicants.index, IdArray.load(caminho_ids))
+
+
+def processing_prospects(embedding_model, carregar_json, limpar_texto, BASE_DATA_PATH, PROCESSED_DATA_PATH,
+                         PROSPECT_EMBEDDINGS_FILE, CANDID_EMBEDDINGS_FILE=None):
+    dados_prospects = carregar_json(
         f"{BASE_DATA_PATH}/prospects.json")
 
-    df_prospects = df_prospects.explode('prospects')
-
-    df_prospects['prospects'] = df_prospects['prospects'].fillna('')
-
-    df_prospects['allblankorna'] = df_prospects.apply(
-        lambda x: sum(x.isna()) + sum(x == ''), axis=1)
-
-    df_prospects = df_prospects.loc[
-        df_prospects.loc[
-            slice(None), 'allblankorna'
-        ] != 3, slice(None)
-    ]
-    df_prospects.insert(0, 'id_vaga_associada', df_prospects.index,
-                        allow_duplicates=True)
-    df_prospects['id_vaga_associada'] = df_prospects['id_vaga_associada'].astype(
-        str)
-    df_prospects.drop('allblankorna', axis=1, inplace=True)
-
-    prospects_expand = df_prospects.apply(lambda row: {
-        'id_vaga_associada': row.get('id_vaga_associada', ''),
-        **row.get('prospects', {}),
-        'titulo': row.get('titulo', ''),
-        'modalidade': row.get('modalidade', '')
-    }, axis=1)
-
-    df_prospects = pd.DataFrame(prospects_expand.tolist()).fillna('')
-
-    for coluna in df_prospects.columns:
-        print(f'Limpeza da coluna {coluna}')
-        df_prospects[coluna] = df_prospects[coluna].apply(
-            limpar_texto)
-
-    df_prospects.loc[slice(None), 'processed_text'] = df_prospects.apply(
-        lambda x: ' '.join(filter(None, [*x])).strip(), axis=1)
-
-    # df_prospects['id_prospect'] = df_prospects['codigo'].copy()
-    df_prospects['id_prospect'] = df_prospects['codigo'].copy()
-    df_prospects.drop(columns='codigo', inplace=True)
-    df_prospects.set_index('id_prospect')
+    df_prospects = montar_df_prospects(dados_prospects, limpar_texto)
+    del dados_prospects
 
     print('Exportando arquivo gerado em prospect inicialmente em parquet.')
 
-    df_prospects.to_parquet(os.path.join(
-        PROCESSED_DATA_PATH, 'prospects.parquet'), index=True)
+    exportar_tabela(df_prospects, 'prospects', 'id_vaga_associada',
+                    os.path.join(PROCESSED_DATA_PATH, 'prospects.parquet'))
+
+    # Prospects com registro em applicants usam o vetor do candidato (ver src/prospect_mapping.py)
+    linhas_candidatos = None
+    if CANDID_EMBEDDINGS_FILE is not None:
+        linhas_candidatos = mapear_prospects_em_candidatos(
+            df_prospects, PROCESSED_DATA_PATH, CANDID_EMBEDDINGS_FILE)
+    if linhas_candidatos is None:
+        linhas_candidatos = np.full(len(df_prospects), -1, dtype=np.int64)
+    proprios = linhas_candidatos < 0
+    print(f'{len(df_prospects) - proprios.sum()} de {len(df_prospects)} prospects usam o vetor do '
+          f'candidato; {proprios.sum()} serão codificados.')
+    if proprios.all():
+        remove_row_map(PROSPECT_EMBEDDINGS_FILE)
+    else:
+        save_row_map(PROSPECT_EMBEDDINGS_FILE, build_row_map(linhas_candidatos),
+                     df_prospects.index.to_numpy())
 
     print("Gerando embeddings para prospects...")
-    prospect_texts = df_prospects['processed_text'].tolist()
+    prospect_texts = df_prospects['processed_text'][proprios].tolist()
 
     prospect_texts = [str(text) if pd.notna(
         text) else "" for text in prospect_texts]
-    prospect_embeddings_array = embedding_model.encode(
-        prospect_texts, show_progress_bar=True, convert_to_numpy=True)
-
-    print('Exportando o arquivo de vagas embeddado em pickle.')
-
-    with open(PROSPECT_EMBEDDINGS_FILE, 'wb') as f:
-        pickle.dump({'ids': df_prospects.index.tolist(),
-                     'embeddings': prospect_embeddings_array}, f)
+    print('Exportando o arquivo de prospects embeddado em lotes (.npy).')
+    with metrics.span("embedding_encode", entidade="prospects"):
+        gerar_embeddings_em_lotes(
+            embedding_model, prospect_texts, df_prospects.index.to_numpy()[proprios],
+            os.path.splitext(PROSPECT_EMBEDDINGS_FILE)[0])
 
 
 if __name__ == '__main__':
@@ -258,11 +602,12 @@ if __name__ == '__main__':
 
     print('Setando o modelo que será usado para embeddings')
 
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Backend definido por EMBEDDING_BACKEND (torch, onnx ou onnx-int8)
+    embedding_model = load_embedding_model()
 
     processing_applicants(
         embedding_model,
-        carregar_json_com_dict,
+        carregar_json_bruto,
         limpar_texto,
         BASE_DATA_PATH,
         PROCESSED_DATA_PATH,
@@ -271,7 +616,7 @@ if __name__ == '__main__':
 
     processing_vagas(
         embedding_model,
-        carregar_json_com_dict,
+        carregar_json_bruto,
         limpar_texto,
         BASE_DATA_PATH,
         PROCESSED_DATA_PATH,
@@ -280,9 +625,24 @@ if __name__ == '__main__':
 
     processing_prospects(
         embedding_model,
-        carregar_json_com_dict,
+        carregar_json_bruto,
         limpar_texto,
         BASE_DATA_PATH,
         PROCESSED_DATA_PATH,
-        PROSPECT_EMBEDDINGS_FILE
+        PROSPECT_EMBEDDINGS_FILE,
+        CANDID_EMBEDDINGS_FILE
     )
+
+    # Vetores reduzidos por PCA para a busca (EMBEDDING_REDUCED_DIM=0 desativa)
+    if REDUCED_DIM:
+        print(f'Reduzindo embeddings de candidatos e prospects para {REDUCED_DIM} dimensões')
+        reduce_embedding_files(
+            [f'{os.path.splitext(caminho)[0]}.npy'
+             for caminho in (CANDID_EMBEDDINGS_FILE, PROSPECT_EMBEDDINGS_FILE)],
+            REDUCED_DIM)
+
+    if metrics.is_enabled():
+        metrics_file = os.getenv("METRICS_DUMP_PATH", os.path.join(
+            PROCESSED_DATA_PATH, "preprocessing_metrics.json"))
+        metrics.dump_json(metrics_file)
+        print(f'Métricas do pré-processamento salvas em {metrics_file}')
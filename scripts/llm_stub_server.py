@@ -0,0 +1,102 @@
+"""
+Servidor local compatível com a API da OpenAI que responde com o StubLlama.
+
+Substitui o servidor do LLM (ex.: `llama.cpp server`) em testes do app e do
+cliente HTTP, sem carregar nenhum modelo. Atende `POST /v1/chat/completions`
+(com ou sem streaming SSE), `GET /v1/models` e `GET /health`.
+
+    python scripts/llm_stub_server.py --port 8080
+    LLM_BACKEND=http LLM_BASE_URL=http://localhost:8080/v1 streamlit run main.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.llm_client import StubLlama  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como um servidor real
+    modelo = StubLlama()
+
+    def _json(self, status, corpo):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._json(200, {'status': 'ok'})
+        elif self.path == '/v1/models':
+            self._json(200, {'object': 'list', 'data': [{'id': 'stub', 'object': 'model'}]})
+        else:
+            self._json(404, {'error': {'message': f'Rota {self.path} não encontrada'}})
+
+    def do_POST(self):
+        if self.path != '/v1/chat/completions':
+            self._json(404, {'error': {'message': f'Rota {self.path} não encontrada'}})
+            return
+        pedido = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        resposta = self.modelo.create_chat_completion(
+            messages=pedido['messages'],
+            max_tokens=pedido.get('max_tokens', 200),
+            stream=pedido.get('stream', False),
+        )
+        base = {'id': f'chatcmpl-stub-{time.time_ns()}', 'model': pedido.get('model', 'stub'),
+                'created': int(time.time())}
+        if not pedido.get('stream'):
+            escolha = dict(resposta['choices'][0], index=0, finish_reason='stop')
+            self._json(200, dict(base, object='chat.completion', choices=[escolha]))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in resposta:
+            escolha = dict(chunk['choices'][0], index=0, finish_reason=None)
+            self._evento(json.dumps(dict(base, object='chat.completion.chunk', choices=[escolha])))
+        self._evento(json.dumps(dict(base, object='chat.completion.chunk', choices=[
+            {'index': 0, 'delta': {}, 'finish_reason': 'stop'}])))
+        self._evento('[DONE]')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _evento(self, dados):
+        evento = f'data: {dados}\n\n'.encode('utf-8')
+        self.wfile.write(f'{len(evento):X}\r\n'.encode('ascii') + evento + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, formato, *args):
+        print(f'DEBUG_LLM_STUB: {formato % args}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--atraso', type=float, default=0.02,
+                        help='Segundos entre tokens no streaming.')
+    args = parser.parse_args()
+
+    StubHandler.modelo = StubLlama(token_delay_s=args.atraso)
+    servidor = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f'Servidor stub do LLM em http://{args.host}:{args.port}/v1')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Redução por PCA dos embeddings de candidatos e prospects já gerados.
+
+Mesma etapa executada ao final de generate_preprocessed_data_final.py, para
+rodar sem regenerar os embeddings. Grava embedding_projection.npz e
+<base>_reduced.npy e mede o impacto na busca: recall@k da busca nos vetores
+reduzidos em relação à busca exata em 384 dimensões, usando as vagas como
+consultas. Para o impacto medido pelos prospects, ver evaluate_retrieval.py.
+
+    python scripts/reduce_embeddings.py --dimensao 128
+    python scripts/reduce_embeddings.py --apenas-avaliar --dimensoes-avaliadas 64 96 128 192
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.embedding_projection import (  # noqa: E402
+    PROJECTION_FILE,
+    REDUCED_DIM,
+    fit_projection,
+    project,
+    reduce_embedding_files,
+)
+from src.vector_search import batch_top_k, normalize  # noqa: E402
+
+PROCESSED_DATA_PATH = os.path.join('data', 'processed_data')
+ARQUIVOS = [os.path.join(PROCESSED_DATA_PATH, f'{nome}.npy')
+            for nome in ('candid_embeddings', 'prospect_embeddings')]
+
+
+def avaliar(embeddings, consultas, projecao, ks=(10, 50)):
+    """Recall@k da busca no espaço reduzido em relação à exata, e ms por consulta de cada uma."""
+    completos = normalize(embeddings)
+    reduzidos = project(embeddings, projecao)
+    consultas_reduzidas = project(consultas, projecao)
+
+    inicio = time.perf_counter()
+    exatos = batch_top_k(consultas, completos, max(ks))[0]
+    ms_completo = 1000 * (time.perf_counter() - inicio) / len(consultas)
+    inicio = time.perf_counter()
+    aproximados = batch_top_k(consultas_reduzidas, reduzidos, max(ks))[0]
+    ms_reduzido = 1000 * (time.perf_counter() - inicio) / len(consultas)
+
+    recall = {k: np.mean([len(set(e[:k]) & set(a[:k])) / k for e, a in zip(exatos, aproximados)])
+              for k in ks}
+    return recall, ms_completo, ms_reduzido
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dimensao', type=int, default=REDUCED_DIM,
+                        help='Dimensão dos vetores reduzidos gravados.')
+    parser.add_argument('--apenas-avaliar', action='store_true',
+                        help='Só mede o recall, sem gravar a projeção nem os vetores.')
+    parser.add_argument('--dimensoes-avaliadas', type=int, nargs='*', default=None,
+                        help='Dimensões comparadas no relatório (padrão: só --dimensao).')
+    parser.add_argument('--amostra-avaliacao', type=int, default=100000,
+                        help='Candidatos usados no relatório de recall.')
+    parser.add_argument('--consultas', type=int, default=200, help='Vagas usadas como consultas.')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.apenas_avaliar:
+        reduce_embedding_files(ARQUIVOS, args.dimensao, projection_file=PROJECTION_FILE)
+
+    candidatos = np.load(ARQUIVOS[0], mmap_mode='r')
+    rng = np.random.default_rng(args.semente)
+    linhas = np.sort(rng.choice(len(candidatos), size=min(args.amostra_avaliacao, len(candidatos)),
+                                replace=False))
+    amostra = np.asarray(candidatos[linhas], dtype=np.float32)
+    vagas = np.load(os.path.join(PROCESSED_DATA_PATH, 'vaga_embeddings.npy'), mmap_mode='r')
+    consultas = normalize(vagas[:args.consultas])
+
+    print(f"\nRecall da busca reduzida em relação à exata ({len(amostra)} candidatos, "
+          f"{len(consultas)} vagas):")
+    print(f"{'dimensão':>9}{'variância':>11}{'recall@10':>11}{'recall@50':>11}"
+          f"{'ms exato':>10}{'ms reduz.':>11}")
+    for dimensao in args.dimensoes_avaliadas or [args.dimensao]:
+        if dimensao >= candidatos.shape[1]:
+            continue
+        projecao = fit_projection(candidatos, dimensao, random_state=args.semente)
+        recall, ms_completo, ms_reduzido = avaliar(amostra, consultas, projecao)
+        print(f"{dimensao:>9}{projecao['explained_variance_ratio'].sum():>11.1%}{recall[10]:>11.3f}"
+              f"{recall[50]:>11.3f}{ms_completo:>10.3f}{ms_reduzido:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Regrava os Parquets de data/processed_data no layout de src/parquet_layout.py.
+
+Mesmo layout gravado por generate_preprocessed_data_final.py, para converter
+arquivos já gerados (ou baixados) sem reprocessar os JSONs. Mostra o tamanho
+antes e depois e o tempo de leitura da tabela e de uma busca de textos por id.
+
+    python scripts/rewrite_parquet_layout.py
+    python scripts/rewrite_parquet_layout.py --sem-separar-textos
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.parquet_layout import (  # noqa: E402
+    TEXT_COLUMN,
+    TextStore,
+    memory_report,
+    optimize_dtypes,
+    read_table,
+    text_path,
+    write_table,
+)
+
+PROCESSED_DATA_PATH = os.path.join('data', 'processed_data')
+TABELAS = {'applicants': 'id_candidato', 'vagas': 'id_vaga', 'prospects': 'id_vaga_associada'}
+
+
+def tamanho_mb(caminho):
+    return os.path.getsize(caminho) / 2**20 if os.path.exists(caminho) else 0.0
+
+
+def tempo_ms(funcao, repeticoes=3):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return 1000 * (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sem-separar-textos', action='store_true',
+                        help=f'Mantém {TEXT_COLUMN} dentro das tabelas.')
+    parser.add_argument('--ids-consultados', type=int, default=50,
+                        help='Ids lidos no teste de busca de textos.')
+    args = parser.parse_args()
+
+    for nome, coluna_id in TABELAS.items():
+        caminho = os.path.join(PROCESSED_DATA_PATH, f'{nome}.parquet')
+        if not os.path.exists(caminho):
+            print(f'{caminho} não encontrado.')
+            continue
+        antes_mb = tamanho_mb(caminho) + tamanho_mb(text_path(caminho))
+        ms_antes = tempo_ms(lambda: pd.read_parquet(caminho))
+
+        df = read_table(caminho, with_text=True)
+        otimizado = optimize_dtypes(df, nome)
+        print(f'Memória de {nome} com colunas category:\n{memory_report(df, otimizado)}')
+        write_table(otimizado, caminho, sort_by=coluna_id if coluna_id in df else None,
+                    split_text=not args.sem_separar_textos)
+
+        depois_mb = tamanho_mb(caminho) + tamanho_mb(text_path(caminho))
+        ms_depois = tempo_ms(lambda: pd.read_parquet(caminho))
+        print(f'{nome}: {len(df)} linhas, {antes_mb:.1f} MB -> {depois_mb:.1f} MB '
+              f'(tabela {tamanho_mb(caminho):.1f} MB); leitura {ms_antes:.0f} ms -> {ms_depois:.0f} ms')
+
+        if os.path.exists(text_path(caminho)):
+            ids = df.index.to_series().sample(min(args.ids_consultados, len(df)), random_state=42)
+            textos = TextStore(path=text_path(caminho))
+            print(f'  {len(ids)} textos por id: {tempo_ms(lambda: textos.get(ids)):.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
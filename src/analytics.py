@@ -0,0 +1,117 @@
+"""
+Consultas analíticas (DuckDB) sobre os Parquets de data/processed_data.
+
+Os painéis de recrutamento (candidatos por nível, prospects por vaga, funil de
+situações) não carregam as tabelas no pandas: cada Parquet vira uma view do
+DuckDB, que lê só as colunas e row groups usados pela consulta, dentro de
+ANALYTICS_MEMORY_LIMIT. As consultas do app ficam em QUERIES (parâmetros
+ligados pelo DuckDB, sem montar SQL com valores) e os resultados saem como
+tabelas Arrow, sem cópia para o pandas, guardados em um cache LRU com chave
+(versão dos Parquets, consulta, parâmetros).
+"""
+import os
+import threading
+
+import duckdb
+import pyarrow as pa
+import streamlit as st
+
+from src.result_cache import LRUCache, artifact_version
+from src.prospect_stages import DEFAULT_STAGE, SITUACAO_STAGES, STAGE_ADVANCED, STAGE_HIRED, STAGE_LABELS
+from src.utils import metrics
+
+PROCESSED_DATA_PATH = os.path.join("data", "processed_data")
+ANALYTICS_TABLES = ('applicants', 'vagas', 'prospects')
+ANALYTICS_MEMORY_LIMIT = os.getenv("ANALYTICS_MEMORY_LIMIT", "256MB")
+ANALYTICS_THREADS = int(os.getenv("ANALYTICS_THREADS", "2"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "64"))
+
+# Etapas do funil (src/prospect_stages.py): 3 contratado, 2 avançou no processo, 1 prospectado
+FUNNEL_STAGES = STAGE_LABELS
+
+QUERIES = {
+    # Sem parâmetros
+    'candidatos_por_nivel': """
+        SELECT coalesce(nullif(nivel_profissional, ''), '(não informado)') AS nivel_profissional,
+               count(*) AS candidatos,
+               round(100 * count(*) / sum(count(*)) OVER (), 1) AS percentual
+        FROM applicants
+        GROUP BY ALL
+        ORDER BY candidatos DESC
+    """,
+    # $1: quantidade de vagas
+    'prospects_por_vaga': f"""
+        SELECT p.id_vaga_associada AS id_vaga,
+               any_value(v.titulo_vaga) AS titulo_vaga,
+               count(*) AS prospects,
+               count(*) FILTER (WHERE coalesce(e.etapa, {DEFAULT_STAGE}) >= {STAGE_ADVANCED}) AS avancaram,
+               count(*) FILTER (WHERE e.etapa = {STAGE_HIRED}) AS contratados
+        FROM prospects p
+        LEFT JOIN vagas v ON v.id_vaga = p.id_vaga_associada
+        LEFT JOIN etapas e ON e.situacao = p.situacao_candidado
+        GROUP BY ALL
+        ORDER BY prospects DESC, id_vaga
+        LIMIT $1
+    """,
+    # $1: id_vaga, ou NULL para todas as vagas
+    'funil_situacoes': f"""
+        SELECT p.situacao_candidado AS situacao,
+               coalesce(e.etapa, {DEFAULT_STAGE}) AS etapa,
+               count(*) AS prospects,
+               count(DISTINCT p.id_vaga_associada) AS vagas
+        FROM prospects p
+        LEFT JOIN etapas e ON e.situacao = p.situacao_candidado
+        WHERE $1::VARCHAR IS NULL OR p.id_vaga_associada = $1::VARCHAR
+        GROUP BY ALL
+        ORDER BY etapa DESC, prospects DESC
+    """,
+}
+
+
+def parquet_paths(data_path: str = PROCESSED_DATA_PATH) -> dict:
+    return {nome: os.path.join(data_path, f"{nome}.parquet") for nome in ANALYTICS_TABLES}
+
+
+def analytics_version(data_path: str = PROCESSED_DATA_PATH) -> str:
+    """Muda quando algum dos Parquets é regravado."""
+    return artifact_version(parquet_paths(data_path).values())
+
+
+class AnalyticsEngine:
+    """
+    Conexão DuckDB em memória com uma view por Parquet. A conexão não é
+    compartilhável entre threads: as consultas são serializadas por um lock
+    (são agregações curtas, e as repetidas saem do cache).
+    """
+
+    def __init__(self, data_path: str = PROCESSED_DATA_PATH, memory_limit: str = ANALYTICS_MEMORY_LIMIT,
+                 threads: int = ANALYTICS_THREADS, cache_size: int = ANALYTICS_CACHE_SIZE):
+        self.version = analytics_version(data_path)
+        self._con = duckdb.connect(config={'memory_limit': memory_limit, 'threads': threads})
+        for nome, caminho in parquet_paths(data_path).items():
+            caminho_sql = caminho.replace("'", "''")
+            self._con.execute(f"CREATE VIEW {nome} AS SELECT * FROM read_parquet('{caminho_sql}')")
+        self._con.register('etapas', pa.table({
+            'situacao': list(SITUACAO_STAGES), 'etapa': list(SITUACAO_STAGES.values())}))
+        self._cache = LRUCache(cache_size, metric="analytics_cache_total")
+        self._lock = threading.Lock()
+
+    def query(self, name: str, *params) -> pa.Table:
+        """Resultado (Arrow) da consulta `name` de QUERIES com os `params`."""
+        return self._cache.get_or_compute((self.version, name, params), lambda: self._execute(name, params))
+
+    def _execute(self, name: str, params: tuple) -> pa.Table:
+        with self._lock, metrics.span("analytics_query", query=name):
+            return self._con.execute(QUERIES[name], list(params)).to_arrow_table()
+
+    def close(self):
+        self._con.close()
+
+
+@st.cache_resource(show_spinner=False)
+def get_analytics_engine(version: str = None) -> AnalyticsEngine:
+    """
+    Motor compartilhado entre as sessões. `version` (analytics_version) só
+    entra na chave do cache, para recriar as views quando os Parquets mudarem.
+    """
+    return AnalyticsEngine()
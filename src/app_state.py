@@ -0,0 +1,63 @@
+"""
+Estado pesado do app, montado uma vez por processo.
+
+Cada interação do Streamlit reexecuta o script (ou só o fragment da
+interação). Os DataFrames, embeddings, textos, shards e clusters ficam em um
+único objeto de `st.cache_resource`, compartilhado entre as sessões e as
+reexecuções: o app recebe as mesmas referências em toda execução, sem refazer
+os rótulos do seletor de vagas. Os carregadores chamados aqui
+(`load_processed_data`, `load_all_embeddings`) também são `st.cache_resource`,
+então nenhuma leitura passa por cópias de `st.cache_data`.
+"""
+import pandas as pd
+import streamlit as st
+
+from src.clustering import load_clusters, load_umap_projection
+from src.data_loader import load_processed_data, load_text_store
+from src.nlp_matcher import load_all_embeddings
+from src.sharded_search import get_sharded_searcher
+from src.utils import metrics
+
+
+def job_display_names(df_jobs: pd.DataFrame) -> list:
+    """Rótulos do seletor ("<id_vaga> - <titulo_vaga> "), na ordem de `df_jobs`."""
+    return (df_jobs['id_vaga'].astype(str) + ' - ' + df_jobs['titulo_vaga'].astype(str) + ' ').tolist()
+
+
+@st.cache_resource(show_spinner="Carregando dados e embeddings pré-gerados...")
+def load_app_state(version: str = None) -> dict:
+    """
+    Dados do app compartilhados entre as sessões. `version`
+    (embeddings_version) só entra na chave do cache, para recarregar tudo
+    quando novos embeddings forem publicados. Os objetos devolvidos são
+    somente leitura para o app.
+    """
+    with metrics.span("load_app_state"):
+        df_jobs, df_applicants, df_prospects = load_processed_data()
+        embeddings_data = load_all_embeddings(version)
+        n_candidatos = len(embeddings_data['applicants']['ids'])
+        nomes_vagas = job_display_names(df_jobs)
+        return {
+            'jobs': df_jobs,
+            'applicants': df_applicants,
+            'prospects': df_prospects,
+            'job_display_names': nomes_vagas,
+            # Posição em df_jobs de cada rótulo do seletor (busca para várias vagas)
+            'job_positions': {nome: posicao for posicao, nome in enumerate(nomes_vagas)},
+            'embeddings': embeddings_data,
+            # Textos processados por id, lidos sob demanda (prompts e reranking)
+            'texts': {
+                'applicants': load_text_store('applicants', df_applicants, version=version),
+                'prospects': load_text_store('prospects', df_prospects, version=version),
+            },
+            # Busca particionada em processos locais (SEARCH_SHARDS >= 2); senão None
+            'searchers': {
+                'applicants': get_sharded_searcher(
+                    embeddings_data['applicants'].get('vectors_path'), version=version),
+                'prospects': get_sharded_searcher(
+                    embeddings_data['prospects'].get('vectors_path'), version=version),
+            },
+            # Artefatos opcionais de scripts/build_candidate_clusters.py
+            'clusters': load_clusters(n_rows=n_candidatos, version=version),
+            'umap': load_umap_projection(n_rows=n_candidatos, version=version),
+        }
@@ -1,17 +1,33 @@
-# from llama_cpp import Llama
 import os
 import streamlit as st
 
-# USE_LOCAL_LLM = os.getenv("USE_LOCAL_LLM", "False") == "True"
-# removido porque não consigo levar para o streamlit
-# if USE_LOCAL_LLM:
-#     try:
-#         from llama_cpp import Llama
-#         # código local do modelo
-#     except ImportError:
-#         st.warning("Local LLM não disponível.")
+from src.llm_client import InProcessClient, OpenAICompatibleClient, StubLlama
+from src.utils import metrics
+
+# O LLM fica desligado por padrão: o modelo não cabe na memória do deploy do
+# streamlit. LLM_BACKEND escolhe onde ele roda:
+# - 'http': servidor compatível com a OpenAI fora do processo (LLM_BASE_URL);
+# - 'llama': llama.cpp no próprio processo, com o .gguf de LLM_MODEL_PATH;
+# - 'stub': modelo falso, sem pesos, para testes.
+# USE_LOCAL_LLM=True continua equivalendo a LLM_BACKEND=llama.
+USE_LOCAL_LLM = os.getenv("USE_LOCAL_LLM", "False") == "True"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "llama" if USE_LOCAL_LLM else "none")
+LLM_BACKENDS = ('none', 'http', 'llama', 'stub')
+
+MODEL_PATH = os.getenv("LLM_MODEL_PATH", os.path.join(
+    "models", "mistral-7b-openorca.Q4_0.gguf"))
+# Contexto do modelo: o prompt em lote (vaga + top-k perfis) não cabe em 1024 tokens
+LLM_N_CTX = int(os.getenv("LLM_N_CTX", "4096"))
+
+SYSTEM_PROMPT = "Você é um especialista em recrutamento que explica por que um candidato é compatível com uma vaga."
+
+
+def llm_available() -> bool:
+    """Indica se há um LLM configurado (e, no llama.cpp local, se o modelo existe)."""
+    if LLM_BACKEND == 'llama':
+        return os.path.exists(MODEL_PATH)
+    return LLM_BACKEND in ('http', 'stub')
 
-# MODEL_PATH = os.path.join("models", "mistral-7b-openorca.Q4_0.gguf")
 
 # Carregando o modelo para economizar processamento no momento de disponibilizar
 
@@ -19,27 +35,40 @@ import streamlit as st
 @st.cache_resource(
     show_spinner="Carregando modelo de LLM... (primeira vez pode demorar)")
 def load_llm_model():
-    """carrega o modelo que será utilizado no LLM.
+    """carrega o cliente do LLM (e o modelo, quando ele roda no processo).
     """
+    if LLM_BACKEND not in LLM_BACKENDS:
+        raise ValueError(
+            f"LLM_BACKEND '{LLM_BACKEND}' inválido. Use um de {LLM_BACKENDS}.")
+    if LLM_BACKEND == 'http':
+        client = OpenAICompatibleClient()
+        print(f"DEBUG_LLM: Usando servidor de LLM em {client.url}.")
+        return client
+    if LLM_BACKEND == 'stub':
+        return InProcessClient(StubLlama())
+
     print(
         f"DEBUG_LLM: Carregando modelo LLM de: {MODEL_PATH} (Isso só deve acontecer uma vez por sessão/cache!)")
     try:
-        llm_instance = Llama(
-            model_path=MODEL_PATH,
-            # tamanho máximo de tokens (será o interpretado).
-            n_ctx=1024,
-            # Número de threads da CPU para usar.
-            n_threads=4,
-            # Tamanho do batch para processamento de tokens. Ajuste se tiver problemas de memória.
-            n_batch=512,
-            # Bloqueia a memória para evitar swap, bom para performance, mas pode causar OOM se não houver RAM suficiente.
-            use_mlock=True,
-            chat_format="chatml"
-            # n_gpu_layers=0 # Descomente e defina para o número de camadas que quer descarregar na GPU (Metal no M1/M2).
-            # Se não tiver Metal configurado ou estiver tendo problemas, defina como 0.
-        )
+        from llama_cpp import Llama
+
+        with metrics.span("llm_model_load"):
+            llm_instance = Llama(
+                model_path=MODEL_PATH,
+                # tamanho máximo de tokens (será o interpretado).
+                n_ctx=LLM_N_CTX,
+                # Número de threads da CPU para usar.
+                n_threads=4,
+                # Tamanho do batch para processamento de tokens. Ajuste se tiver problemas de memória.
+                n_batch=512,
+                # Bloqueia a memória para evitar swap, bom para performance, mas pode causar OOM se não houver RAM suficiente.
+                use_mlock=True,
+                chat_format="chatml"
+                # n_gpu_layers=0 # Descomente e defina para o número de camadas que quer descarregar na GPU (Metal no M1/M2).
+                # Se não tiver Metal configurado ou estiver tendo problemas, defina como 0.
+            )
         print("DEBUG_LLM: Modelo LLM carregado com sucesso.")
-        return llm_instance
+        return InProcessClient(llm_instance)
     except Exception as e:
         print(f"DEBUG_LLM: ERRO ao carregar o modelo LLM: {e}")
         st.error(
@@ -48,35 +77,38 @@ def load_llm_model():
         st.stop()
 
 
-# A instância do LLM será carregada e cacheada na primeira vez que o aplicativo rodar.
-# llm = load_llm_model()
+def ask_llm_stream(prompt: str, max_tokens=200):
+    """
+    Faz uma pergunta ao LLM no formato de chat e devolve os tokens da resposta
+    à medida que são gerados. Pode ser consumido fora da thread do Streamlit.
+    """
+    client = load_llm_model()
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    print(
+        f"DEBUG_LLM: Gerando resposta com chat_format (max_tokens={max_tokens}).")
+    # O llama.cpp reaproveita o KV-cache do prefixo em comum com o prompt anterior:
+    # prompts que começam pelo mesmo texto (system + vaga) só avaliam o que muda
+    with metrics.span("llm_call", backend=LLM_BACKEND):
+        yield from client.stream_chat(messages, max_tokens=max_tokens, temperature=0.7)
 
 
-# def ask_llm(prompt: str, max_tokens=200):
-#     """
-#     Faz uma pergunta ao LLM no formato de chat e retorna a resposta.
-#     """
-#     with st.spinner("O LLM está pensando... Por favor, aguarde."):
-#         print(
-#             f"DEBUG_LLM: Gerando resposta com chat_format (max_tokens={max_tokens}).")
-#         try:
-#             messages = [
-#                 {"role": "system", "content": "Você é um especialista em recrutamento que explica por que um candidato é compatível com uma vaga."},
-#                 {"role": "user", "content": prompt}
-#             ]
-#             output = llm.create_chat_completion(
-#                 messages=messages,
-#                 max_tokens=max_tokens,
-#                 temperature=0.7,
-#             )
-#             response_text = output["choices"][0]["message"]["content"].strip()
-#             print(
-#                 f"DEBUG_LLM: Resposta do LLM gerada. (Primeiras 50 chars: {response_text[:50]})")
-#             return response_text
-#         except Exception as e:
-#             print(f"DEBUG_LLM: ERRO durante a inferência do LLM: {e}")
-#             st.error(f"Erro durante a inferência do LLM: {e}")
-#             return "Não foi possível gerar uma resposta. Tente novamente."
+def ask_llm(prompt: str, max_tokens=200):
+    """
+    Faz uma pergunta ao LLM no formato de chat e retorna a resposta.
+    """
+    with st.spinner("O LLM está pensando... Por favor, aguarde."):
+        try:
+            response_text = "".join(ask_llm_stream(prompt, max_tokens)).strip()
+            print(
+                f"DEBUG_LLM: Resposta do LLM gerada. (Primeiras 50 chars: {response_text[:50]})")
+            return response_text
+        except Exception as e:
+            print(f"DEBUG_LLM: ERRO durante a inferência do LLM: {e}")
+            st.error(f"Erro durante a inferência do LLM: {e}")
+            return "Não foi possível gerar uma resposta. Tente novamente."
 
 
 # %%%%%%%%%%%%%%%%%%%
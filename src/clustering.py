@@ -0,0 +1,104 @@
+"""
+Clusters dos embeddings de candidatos para busca podada e mapa de talentos.
+
+Gerado offline por `scripts/build_candidate_clusters.py`:
+- candid_clusters.npz: centroides do k-means (normalizados) e, para cada
+  cluster, as linhas de candid_embeddings que pertencem a ele (em formato
+  CSR: `rows` ordenado por cluster e `offsets` com k + 1 posições);
+- candid_umap.npy (opcional): projeção UMAP 2-D de cada linha, na mesma ordem
+  dos embeddings, para o app desenhar o mapa sem calcular nada na consulta.
+"""
+import os
+
+import numpy as np
+import streamlit as st
+
+from src.utils import metrics
+from src.vector_search import normalize
+
+PROCESSED_DATA_PATH = "data/processed_data"
+CANDID_CLUSTERS_FILE = os.path.join(PROCESSED_DATA_PATH, "candid_clusters.npz")
+CANDID_UMAP_FILE = os.path.join(PROCESSED_DATA_PATH, "candid_umap.npy")
+
+# Clusters visitados por padrão na busca podada
+DEFAULT_N_PROBE = 8
+
+
+def build_clusters(embeddings: np.ndarray, n_clusters: int = None, batch_size: int = 4096,
+                   max_fit_rows: int = 200_000, random_state: int = 42) -> dict:
+    """
+    Agrupa os embeddings (normalizados, para o k-means aproximar o cosseno)
+    com MiniBatchKMeans. Por padrão usa ~sqrt(n) clusters. O ajuste usa uma
+    amostra de até `max_fit_rows` linhas e a atribuição é feita em lotes, já
+    que os embeddings podem ser um memmap maior que a RAM.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    n_clusters = n_clusters or max(1, int(np.sqrt(len(embeddings))))
+    rng = np.random.default_rng(random_state)
+    amostra = np.sort(rng.choice(len(embeddings), size=min(max_fit_rows, len(embeddings)),
+                                 replace=False))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size,
+                             random_state=random_state, n_init=3)
+    kmeans.fit(normalize(np.asarray(embeddings[amostra], dtype=np.float32)))
+
+    labels = np.empty(len(embeddings), dtype=np.int32)
+    for inicio in range(0, len(embeddings), batch_size):
+        labels[inicio:inicio + batch_size] = kmeans.predict(normalize(np.asarray(
+            embeddings[inicio:inicio + batch_size], dtype=np.float32)))
+
+    rows = np.argsort(labels, kind='stable').astype(np.int32)
+    offsets = np.zeros(n_clusters + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_clusters), out=offsets[1:])
+    return {
+        'centroids': normalize(kmeans.cluster_centers_.astype(np.float32)),
+        'rows': rows,
+        'offsets': offsets,
+        'labels': labels,
+        'n_rows': np.int64(len(embeddings)),
+    }
+
+
+def save_clusters(clusters: dict, file_path: str = CANDID_CLUSTERS_FILE):
+    np.savez(file_path, **clusters)
+
+
+@st.cache_resource(show_spinner="Carregando clusters de candidatos...")
+def load_clusters(file_path: str = CANDID_CLUSTERS_FILE, n_rows: int = None, version: str = None):
+    """
+    Carrega os clusters, ou None se não foram gerados ou se foram gerados para
+    outra versão dos embeddings (`n_rows` diferente). `version` só entra na
+    chave do cache, para recarregar quando o arquivo mudar.
+    """
+    if not os.path.exists(file_path):
+        return None
+    with metrics.span("load_clusters"):
+        with np.load(file_path) as arquivo:
+            clusters = {chave: arquivo[chave] for chave in arquivo.files}
+    if n_rows is not None and int(clusters['n_rows']) != n_rows:
+        print(f"DEBUG_CLUSTER: {file_path} foi gerado para {int(clusters['n_rows'])} linhas, "
+              f"os embeddings têm {n_rows}. Ignorando os clusters.")
+        return None
+    return clusters
+
+
+@st.cache_resource(show_spinner="Carregando mapa de talentos...")
+def load_umap_projection(file_path: str = CANDID_UMAP_FILE, n_rows: int = None, version: str = None):
+    """Projeção 2-D dos candidatos, ou None se não foi gerada (ou está desatualizada)."""
+    if not os.path.exists(file_path):
+        return None
+    projecao = np.load(file_path, mmap_mode='r')
+    if n_rows is not None and len(projecao) != n_rows:
+        return None
+    return projecao
+
+
+def probe_rows(clusters: dict, query_embedding: np.ndarray, n_probe: int = DEFAULT_N_PROBE) -> np.ndarray:
+    """Linhas dos `n_probe` clusters cujos centroides são mais próximos da consulta."""
+    centroides = clusters['centroids']
+    n_probe = min(n_probe, len(centroides))
+    similaridades = centroides @ normalize(np.asarray(query_embedding, dtype=np.float32).ravel())
+    mais_proximos = np.argpartition(-similaridades, n_probe - 1)[:n_probe]
+    offsets, rows = clusters['offsets'], clusters['rows']
+    return np.sort(np.concatenate(
+        [rows[offsets[c]:offsets[c + 1]] for c in mais_proximos]))
@@ -1,18 +1,22 @@
 import pandas as pd
 import os
-import streamlit as st  # Para st.cache_data e exibir mensagens de erro
+import streamlit as st  # Para st.cache_resource e exibir mensagens de erro
+from src.parquet_layout import TEXT_COLUMN, TextStore, memory_report, optimize_dtypes, read_table, text_path
+from src.utils import metrics
 
 # Define caminhos absolutos baseados no WORKDIR do Docker (/workspaces/match_nlp_app)
 BASE_DATA_PATH = "data"
 PROCESSED_DATA_PATH = os.path.join(BASE_DATA_PATH, "processed_data")
 
 
-@st.cache_data(show_spinner="Carregando dados processados do Parquet...", persist=True)
+@st.cache_resource(show_spinner="Carregando dados processados do Parquet...")
 def load_processed_data():
     """
     Carrega dados dos arquivos Parquet pré-existentes.
     Esta função ASSUME que os arquivos Parquet já foram gerados
     pelo script 'generate_preprocessed_data.py'.
+    Os DataFrames são compartilhados (st.cache_resource, sem cópia por
+    leitura) e tratados como somente leitura.
     """
     jobs_parquet_path = os.path.join(PROCESSED_DATA_PATH, "vagas.parquet")
     applicants_parquet_path = os.path.join(
@@ -33,9 +37,11 @@ def load_processed_data():
 
     print(f"DEBUG_DL: Carregando dados do Parquet de: {PROCESSED_DATA_PATH}")
     try:
-        jobs_df = pd.read_parquet(jobs_parquet_path)
-        applicants_df = pd.read_parquet(applicants_parquet_path)
-        prospects_df = pd.read_parquet(prospects_parquet_path)
+        with metrics.span("load_processed_data"):
+            # Vagas são poucas: o texto separado (layout novo) volta para o DataFrame
+            jobs_df = _optimized(read_table(jobs_parquet_path, with_text=True), 'vagas')
+            applicants_df = _optimized(read_table(applicants_parquet_path), 'applicants')
+            prospects_df = _optimized(read_table(prospects_parquet_path), 'prospects')
         # print(prospects_df.columns)
         print(f"DEBUG_DL: Dados do Parquet carregados com sucesso.")
         return jobs_df, applicants_df, prospects_df
@@ -45,3 +51,28 @@ def load_processed_data():
         st.error(
             f"Erro ao ler arquivos Parquet: {e}. Por favor, tente re-executar o script de pré-processamento.")
         st.stop()  # Parar em caso de erro de leitura grave
+
+
+def _optimized(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Colunas de perfil como category (Parquets gravados antes da otimização de dtypes)."""
+    otimizado = optimize_dtypes(df, table)
+    if otimizado is not df:
+        print(f"DEBUG_DL: Memória de {table} com colunas category:\n{memory_report(df, otimizado)}")
+    return otimizado
+
+
+@st.cache_resource(show_spinner=False)
+def load_text_store(name: str, _df: pd.DataFrame = None, version: str = None) -> TextStore:
+    """
+    Textos processados de `name` ('applicants', 'prospects' ou 'vagas') por id.
+    Com o layout que separa os textos (<name>_text.parquet), lê só os ids
+    pedidos; senão usa a coluna 'processed_text' de `_df`.
+    `version` só entra na chave do cache.
+    """
+    caminho = text_path(os.path.join(PROCESSED_DATA_PATH, f"{name}.parquet"))
+    if os.path.exists(caminho):
+        return TextStore(path=caminho)
+    if _df is not None and TEXT_COLUMN in _df:
+        return TextStore(texts=_df[TEXT_COLUMN])
+    print(f"DEBUG_DL: Textos processados de {name} não encontrados.")
+    return TextStore(texts=pd.Series(dtype=object))
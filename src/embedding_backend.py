@@ -0,0 +1,195 @@
+"""
+Backends de inferência do modelo de embedding.
+
+- 'torch': SentenceTransformer em PyTorch (padrão, comportamento original);
+- 'onnx': o mesmo modelo exportado para ONNX e executado no ONNX Runtime;
+- 'onnx-int8': o modelo ONNX com quantização dinâmica int8 dos pesos.
+
+O backend é escolhido pela variável de ambiente EMBEDDING_BACKEND. Os
+vetores dos backends ONNX seguem o mesmo pipeline do SentenceTransformer
+(mean pooling + normalização L2), então são compatíveis com os embeddings
+já gerados. onnxruntime é uma dependência opcional, importada só quando um
+backend ONNX é usado.
+"""
+import inspect
+import json
+import os
+
+import numpy as np
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+# Pasta onde os modelos exportados para ONNX são guardados
+ONNX_MODELS_PATH = os.path.join("models", "onnx")
+# Threads usadas por operação no ONNX Runtime (padrão: todos os núcleos)
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0")) or (os.cpu_count() or 1)
+
+ONNX_FP32_FILE = "model.onnx"
+ONNX_INT8_FILE = "model.int8.onnx"
+ONNX_METADATA_FILE = "metadata.json"
+
+
+def _onnx_model_dir(model_name: str) -> str:
+    return os.path.join(ONNX_MODELS_PATH, model_name.replace('/', '__'))
+
+
+def export_onnx(model_name: str = EMBEDDING_MODEL_NAME, output_dir: str = None) -> str:
+    """
+    Exporta o transformer do SentenceTransformer para ONNX, junto com o
+    tokenizer e os metadados de pooling. Retorna a pasta de saída.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    output_dir = output_dir or _onnx_model_dir(model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"DEBUG_EMBED: Exportando '{model_name}' para ONNX em {output_dir}.")
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    exemplo = tokenizer(['texto de exemplo para exportação'],
+                        return_tensors='pt', padding=True)
+    input_names = [nome for nome in ('input_ids', 'attention_mask', 'token_type_ids')
+                   if nome in exemplo]
+
+    class _LastHiddenState(torch.nn.Module):
+        """Fixa a ordem das entradas e devolve só o last_hidden_state."""
+
+        def __init__(self, modelo):
+            super().__init__()
+            self.modelo = modelo
+
+        def forward(self, *entradas):
+            return self.modelo(**dict(zip(input_names, entradas)))[0]
+    eixos = {nome: {0: 'batch', 1: 'sequence'} for nome in input_names}
+    eixos['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    opcoes_export = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # Versões novas do PyTorch usam o exportador dynamo por padrão
+        opcoes_export['dynamo'] = False
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(transformer),
+            tuple(exemplo[nome] for nome in input_names),
+            os.path.join(output_dir, ONNX_FP32_FILE),
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=eixos,
+            opset_version=14,
+            **opcoes_export,
+        )
+
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'model_name': model_name,
+            'input_names': input_names,
+            'max_seq_length': st_model.max_seq_length,
+            'normalize': any(isinstance(modulo, Normalize) for modulo in st_model),
+            'dimension': st_model.get_sentence_embedding_dimension(),
+        }, f, indent=2)
+    return output_dir
+
+
+def quantize_onnx(model_dir: str) -> str:
+    """Aplica quantização dinâmica int8 nos pesos do modelo ONNX exportado."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    destino = os.path.join(model_dir, ONNX_INT8_FILE)
+    print(f"DEBUG_EMBED: Quantizando modelo ONNX para int8 em {destino}.")
+    quantize_dynamic(os.path.join(model_dir, ONNX_FP32_FILE), destino,
+                     weight_type=QuantType.QInt8)
+    return destino
+
+
+class OnnxSentenceEncoder:
+    """
+    Codificador de sentenças sobre ONNX Runtime com a mesma interface de
+    `SentenceTransformer.encode` usada no projeto.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ONNX_METADATA_FILE), encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = self.metadata['max_seq_length']
+
+        opcoes = ort.SessionOptions()
+        opcoes.intra_op_num_threads = intra_op_threads
+        opcoes.inter_op_num_threads = 1
+        opcoes.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        arquivo = ONNX_INT8_FILE if quantized else ONNX_FP32_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, arquivo), opcoes,
+            providers=['CPUExecutionProvider'])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.metadata['dimension']
+
+    def _encode_batch(self, textos):
+        tokens = self.tokenizer(textos, padding=True, truncation=True,
+                                max_length=self.max_seq_length, return_tensors='np')
+        entradas = {nome: tokens[nome].astype(np.int64)
+                    for nome in self.metadata['input_names']}
+        estados = self.session.run(None, entradas)[0]
+
+        # Mean pooling considerando apenas os tokens reais (sem padding)
+        mascara = entradas['attention_mask'][..., None].astype(np.float32)
+        vetores = (estados * mascara).sum(axis=1) / np.clip(mascara.sum(axis=1), 1e-9, None)
+        if self.metadata['normalize']:
+            vetores /= np.clip(np.linalg.norm(vetores, axis=1, keepdims=True), 1e-12, None)
+        return vetores.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, **kwargs):
+        unica = isinstance(sentences, str)
+        textos = [sentences] if unica else list(sentences)
+        if not textos:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Agrupa textos de tamanho parecido para reduzir o padding, como o SentenceTransformer
+        ordem = np.argsort([-len(texto) for texto in textos], kind='stable')
+        vetores = np.empty((len(textos), self.get_sentence_embedding_dimension()),
+                           dtype=np.float32)
+        for inicio in range(0, len(textos), batch_size):
+            indices = ordem[inicio:inicio + batch_size]
+            vetores[indices] = self._encode_batch([textos[i] for i in indices])
+
+        return vetores[0] if unica else vetores
+
+
+def load_embedding_model(backend: str = None, model_name: str = EMBEDDING_MODEL_NAME):
+    """
+    Carrega o modelo de embedding no backend escolhido (ou EMBEDDING_BACKEND).
+    Nos backends ONNX, exporta/quantiza o modelo na primeira execução.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Backend de embedding '{backend}' inválido. Use um de {EMBEDDING_BACKENDS}.")
+
+    if backend == 'torch':
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    model_dir = _onnx_model_dir(model_name)
+    if not os.path.exists(os.path.join(model_dir, ONNX_FP32_FILE)):
+        export_onnx(model_name, model_dir)
+    quantized = backend == 'onnx-int8'
+    if quantized and not os.path.exists(os.path.join(model_dir, ONNX_INT8_FILE)):
+        quantize_onnx(model_dir)
+
+    print(f"DEBUG_EMBED: Usando backend '{backend}' ({ONNX_INTRA_OP_THREADS} threads).")
+    return OnnxSentenceEncoder(model_dir, quantized=quantized)
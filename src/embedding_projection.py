@@ -0,0 +1,114 @@
+"""
+Redução de dimensão dos embeddings armazenados (PCA).
+
+Os vetores do all-MiniLM-L6-v2 têm 384 dimensões. No pré-processamento um
+PCA é ajustado sobre uma amostra dos embeddings de candidatos (normalizados)
+e os embeddings de candidatos e prospects são gravados também reduzidos
+(`<base>_reduced.npy`, normalizados, na mesma ordem de `<base>_ids.npy`),
+junto com a projeção (embedding_projection.npz: média e componentes).
+Na busca, a consulta passa pela mesma projeção (ver `find_top_matches`),
+e cada varredura e os arrays residentes ficam ~3x menores com 128 dimensões.
+"""
+import os
+
+import numpy as np
+import streamlit as st
+
+from src.utils import metrics
+from src.vector_search import normalize
+
+PROCESSED_DATA_PATH = "data/processed_data"
+PROJECTION_FILE = os.path.join(PROCESSED_DATA_PATH, "embedding_projection.npz")
+REDUCED_DIM = int(os.getenv("EMBEDDING_REDUCED_DIM", "128"))
+# Usa os embeddings reduzidos na busca quando eles existem
+USE_REDUCED_EMBEDDINGS = os.getenv("USE_REDUCED_EMBEDDINGS", "True") == "True"
+
+
+def reduced_path(file_path: str) -> str:
+    """Caminho dos vetores reduzidos de um arquivo de embeddings (.pkl ou .npy)."""
+    return f"{os.path.splitext(file_path)[0]}_reduced.npy"
+
+
+def fit_projection(embeddings: np.ndarray, n_components: int = REDUCED_DIM, max_fit_rows: int = 100_000,
+                   random_state: int = 42) -> dict:
+    """
+    Ajusta o PCA em uma amostra de até `max_fit_rows` linhas (os embeddings
+    podem ser um memmap maior que a RAM). Devolve 'mean', 'components'
+    (n_components x dimensão original) e 'explained_variance_ratio'.
+    """
+    from sklearn.decomposition import PCA
+
+    rng = np.random.default_rng(random_state)
+    amostra = np.sort(rng.choice(len(embeddings), size=min(max_fit_rows, len(embeddings)), replace=False))
+    pca = PCA(n_components=n_components, random_state=random_state)
+    pca.fit(normalize(embeddings[amostra]))
+    return {
+        'mean': pca.mean_.astype(np.float32),
+        'components': pca.components_.astype(np.float32),
+        'explained_variance_ratio': pca.explained_variance_ratio_.astype(np.float32),
+    }
+
+
+def project(vectors: np.ndarray, projection: dict) -> np.ndarray:
+    """Projeta vetores (1-D ou 2-D) no espaço reduzido, já normalizados."""
+    vectors = normalize(vectors)
+    return normalize((vectors - projection['mean']) @ projection['components'].T)
+
+
+def save_projection(projection: dict, file_path: str = PROJECTION_FILE):
+    np.savez(file_path, **projection)
+
+
+def write_reduced(embeddings: np.ndarray, projection: dict, output_path: str, batch_size: int = 65536):
+    """Grava `embeddings` projetados em `output_path` (.npy), em lotes."""
+    reduzidos = np.lib.format.open_memmap(
+        output_path, mode='w+', dtype=np.float32,
+        shape=(len(embeddings), len(projection['components'])))
+    for inicio in range(0, len(embeddings), batch_size):
+        reduzidos[inicio:inicio + batch_size] = project(embeddings[inicio:inicio + batch_size], projection)
+    reduzidos.flush()
+    del reduzidos
+
+
+@st.cache_resource(show_spinner=False)
+def load_projection(file_path: str = PROJECTION_FILE, version: str = None):
+    """Projeção salva, ou None se não foi gerada. `version` só entra na chave do cache."""
+    if not os.path.exists(file_path):
+        return None
+    with np.load(file_path) as arquivo:
+        return {chave: arquivo[chave] for chave in arquivo.files}
+
+
+def load_reduced(file_path: str, n_rows: int):
+    """
+    Vetores reduzidos (memmap) de um arquivo de embeddings, ou None se não
+    existem ou foram gerados para outra versão dos embeddings.
+    """
+    caminho = reduced_path(file_path)
+    if not os.path.exists(caminho):
+        return None
+    reduzidos = np.load(caminho, mmap_mode='r')
+    if len(reduzidos) != n_rows:
+        print(f"DEBUG_EMBED: {caminho} tem {len(reduzidos)} linhas, os embeddings têm {n_rows}. Ignorando.")
+        return None
+    return reduzidos
+
+
+def reduce_embedding_files(file_paths, n_components: int = REDUCED_DIM, fit_file: str = None,
+                           projection_file: str = PROJECTION_FILE) -> dict:
+    """
+    Etapa do pré-processamento: ajusta a projeção nos embeddings de `fit_file`
+    (padrão: o primeiro de `file_paths`) e grava os vetores reduzidos de cada
+    arquivo. Os arquivos são os .npy de vetores gerados em lotes.
+    """
+    fit_file = fit_file or file_paths[0]
+    with metrics.span("fit_projection", dim=n_components):
+        projection = fit_projection(np.load(fit_file, mmap_mode='r'), n_components)
+    save_projection(projection, projection_file)
+    print(f"Projeção PCA para {n_components} dimensões salva em {projection_file} "
+          f"({projection['explained_variance_ratio'].sum():.1%} da variância).")
+    for file_path in file_paths:
+        with metrics.span("write_reduced", dim=n_components):
+            write_reduced(np.load(file_path, mmap_mode='r'), projection, reduced_path(file_path))
+        print(f"Embeddings reduzidos gravados em {reduced_path(file_path)}.")
+    return projection
@@ -0,0 +1,173 @@
+"""
+Geração de explicações do LLM em segundo plano.
+
+Assim que os matches são exibidos, o app enfileira uma explicação para cada
+par (vaga, candidato) do top-k. Um pool de threads consome a fila e acumula os
+tokens à medida que o LLM os gera, e a interface só lê o texto parcial de cada
+job, sem bloquear a execução do script do Streamlit. Pedidos repetidos para a
+mesma chave reaproveitam o job em andamento (ou já concluído). Um job com erro
+também é reaproveitado: o LLM só é chamado de novo quando o usuário pede
+(`discard` e nova submissão), e não a cada reexecução do script.
+
+No modo em lote (LLM_EXPLANATION_MODE=batch, padrão) o top-k inteiro é
+explicado por um único prompt: a descrição da vaga é avaliada uma vez só e a
+resposta é dividida entre os jobs de cada candidato durante o streaming.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from src.llm_client import LLM_MAX_CONCURRENCY
+from src.utils import metrics
+
+# Quantas explicações (concluídas ou não) ficam guardadas em memória
+MAX_EXPLANATION_JOBS = 500
+# 'batch': um prompt para todo o top-k; 'individual': um prompt por candidato
+LLM_EXPLANATION_MODE = os.getenv("LLM_EXPLANATION_MODE", "batch")
+
+
+class ExplanationJob:
+    """Estado de uma explicação: texto acumulado até agora, fim e erro."""
+
+    def __init__(self, key):
+        self.key = key
+        self.done = False
+        self.error = None
+        self._chunks = []
+        self._lock = threading.Lock()
+
+    @property
+    def text(self) -> str:
+        with self._lock:
+            return "".join(self._chunks)
+
+    def append(self, token: str):
+        with self._lock:
+            self._chunks.append(token)
+
+    def set_text(self, text: str):
+        with self._lock:
+            self._chunks = [text]
+
+
+class ExplanationWorker:
+    """
+    Pool de threads que executa `generate_stream(prompt, max_tokens)` (um
+    gerador de tokens) para cada job submetido, com deduplicação por chave.
+    """
+
+    def __init__(self, generate_stream, max_workers: int = LLM_MAX_CONCURRENCY,
+                 max_jobs: int = MAX_EXPLANATION_JOBS):
+        self.generate_stream = generate_stream
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm-explain")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, prompt: str, max_tokens: int = 200) -> ExplanationJob:
+        """Enfileira a explicação de `key`, a menos que já exista um job (mesmo com erro) para ela."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+                metrics.inc_counter("llm_explanations_total", status="dedup")
+                return job
+
+            job = ExplanationJob(key)
+            self._jobs[key] = job
+            self._evict()
+        metrics.inc_counter("llm_explanations_total", status="submitted")
+        self._executor.submit(self._run, job, prompt, max_tokens)
+        return job
+
+    def submit_batch(self, keys, prompt: str, parse, max_tokens: int):
+        """
+        Enfileira um único prompt que explica todas as `keys`. `parse(texto)`
+        recebe a resposta acumulada e devolve {posição em keys: explicação}.
+        Chaves que já têm job (mesmo com erro) são reaproveitadas; se todas
+        tiverem, nada é gerado.
+        """
+        with self._lock:
+            jobs, novos = [], {}
+            for posicao, key in enumerate(keys):
+                job = self._jobs.get(key)
+                if job is None:
+                    job = ExplanationJob(key)
+                    self._jobs[key] = job
+                    novos[posicao] = job
+                else:
+                    self._jobs.move_to_end(key)
+                jobs.append(job)
+            self._evict()
+        metrics.inc_counter("llm_explanations_total",
+                            len(keys) - len(novos), status="dedup")
+        if novos:
+            metrics.inc_counter("llm_explanations_total", len(novos), status="submitted")
+            self._executor.submit(self._run_batch, novos, prompt, parse, max_tokens)
+        return jobs
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def discard(self, key):
+        """Esquece o job de `key` (p.ex. com erro), para que a próxima submissão gere de novo."""
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def _evict(self):
+        # Descarta os jobs concluídos mais antigos; os em andamento são mantidos
+        excesso = len(self._jobs) - self.max_jobs
+        for chave in [chave for chave, job in self._jobs.items() if job.done][:max(excesso, 0)]:
+            del self._jobs[chave]
+
+    def _run(self, job: ExplanationJob, prompt: str, max_tokens: int):
+        try:
+            with metrics.span("llm_explanation"):
+                for token in self.generate_stream(prompt, max_tokens):
+                    job.append(token)
+        except Exception as e:
+            print(f"DEBUG_LLM_EXPLAIN: ERRO ao gerar explicação para {job.key}: {e}")
+            job.error = str(e)
+        finally:
+            job.done = True
+
+    def _run_batch(self, jobs: dict, prompt: str, parse, max_tokens: int):
+        resposta = []
+        try:
+            with metrics.span("llm_explanation_batch"):
+                for token in self.generate_stream(prompt, max_tokens):
+                    resposta.append(token)
+                    # Só uma linha nova ou um "[n]" muda a divisão entre os perfis
+                    if '\n' in token or ']' in token:
+                        self._split_batch(jobs, parse("".join(resposta)))
+            explicadas = parse("".join(resposta))
+            self._split_batch(jobs, explicadas)
+            for posicao, job in jobs.items():
+                if not explicadas.get(posicao):
+                    job.error = "O LLM não retornou explicação para este perfil."
+        except Exception as e:
+            print(f"DEBUG_LLM_EXPLAIN: ERRO ao gerar explicações em lote: {e}")
+            for job in jobs.values():
+                job.error = str(e)
+        finally:
+            for job in jobs.values():
+                job.done = True
+
+    @staticmethod
+    def _split_batch(jobs: dict, explicacoes: dict):
+        for posicao, texto in explicacoes.items():
+            if posicao in jobs:
+                jobs[posicao].set_text(texto)
+
+
+@st.cache_resource
+def get_explanation_worker() -> ExplanationWorker:
+    """Worker único por processo, compartilhado entre as sessões do Streamlit."""
+    from src.chat_llm import ask_llm_stream
+
+    return ExplanationWorker(ask_llm_stream)
@@ -0,0 +1,94 @@
+"""
+Ids dos embeddings como arrays NumPy compactos.
+
+Cada linha dos arquivos de embeddings corresponde a um id (o índice do
+DataFrame processado). Em vez de uma lista Python de objetos, `IdArray`
+guarda os ids como int64 ou, quando não são numéricos, como códigos int32 em
+um dicionário de strings (`labels`). Assim o id das linhas do top k sai de
+uma indexação vetorizada (`ids[linhas]`) e a linha de um id, de um índice
+hash construído uma única vez (`position` / `positions`), no lugar de
+`list.index`.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def labels_path(ids_path: str) -> str:
+    """Arquivo do dicionário de strings de um arquivo de ids (<base>_ids.npy)."""
+    return f"{os.path.splitext(ids_path)[0]}_labels.npy"
+
+
+class IdArray:
+    """Ids de cada linha de um arquivo de embeddings."""
+
+    def __init__(self, codes: np.ndarray, labels: np.ndarray = None):
+        self.codes = np.asarray(codes, dtype=np.int64 if labels is None else np.int32)
+        self.labels = None if labels is None else np.asarray(labels, dtype=str)
+        self._positions = None
+
+    @classmethod
+    def from_values(cls, values) -> 'IdArray':
+        """Converte uma lista/array de ids (ints, floats inteiros vindos do pandas ou strings)."""
+        if isinstance(values, IdArray):
+            return values
+        values = np.asarray(values)
+        if values.dtype.kind in 'iu' or values.dtype == bool:
+            return cls(values)
+        if values.dtype.kind == 'f' and np.all(np.mod(values, 1) == 0):
+            return cls(values.astype(np.int64))
+        codes, labels = pd.factorize(values.astype(str))
+        return cls(codes, np.asarray(labels, dtype=str))
+
+    @classmethod
+    def load(cls, ids_path: str) -> 'IdArray':
+        """Lê os ids gravados por `save` (ou um .npy antigo, de ints ou strings)."""
+        codes = np.load(ids_path)
+        if os.path.exists(labels_path(ids_path)) and codes.dtype.kind in 'iu':
+            return cls(codes, np.load(labels_path(ids_path)))
+        return cls.from_values(codes)
+
+    def save(self, ids_path: str):
+        np.save(ids_path, self.codes)
+        if self.labels is not None:
+            np.save(labels_path(ids_path), self.labels)
+        elif os.path.exists(labels_path(ids_path)):
+            os.remove(labels_path(ids_path))
+
+    @property
+    def values(self) -> np.ndarray:
+        """Os ids em um array (int64 ou strings)."""
+        return self.codes if self.labels is None else self.labels[self.codes]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        return self.codes[rows] if self.labels is None else self.labels[self.codes[rows]]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.values, dtype=dtype)
+
+    def __getstate__(self):
+        # O índice de posições é refeito sob demanda (não vai para o cache do Streamlit)
+        return {'codes': self.codes, 'labels': self.labels}
+
+    def __setstate__(self, state):
+        self.__init__(state['codes'], state['labels'])
+
+    def positions(self, ids) -> np.ndarray:
+        """Linha de cada um dos `ids`. ValueError se algum não existe."""
+        if self._positions is None:
+            self._positions = pd.Index(self.values)
+        linhas = self._positions.get_indexer(np.asarray(ids))
+        if (linhas < 0).any():
+            raise ValueError(f"Ids sem embedding: {np.asarray(ids)[linhas < 0][:5].tolist()}")
+        return linhas
+
+    def position(self, row_id) -> int:
+        """Linha de `row_id` (como `list.index`, ValueError se não existe)."""
+        return int(self.positions([row_id])[0])
@@ -0,0 +1,152 @@
+"""
+Clientes de LLM intercambiáveis para o app.
+
+- 'llama': llama.cpp dentro do processo (llama-cpp-python), como antes;
+- 'http': servidor compatível com a API da OpenAI (ex.: `llama.cpp server`,
+  vLLM) fora do processo, para que a memória do modelo não fique em cada
+  worker do Streamlit. Usa um pool de conexões, timeouts, limite de chamadas
+  simultâneas e streaming via SSE;
+- 'stub': modelo falso em processo, sem pesos, para testes.
+
+Todos expõem `stream_chat(messages, max_tokens, temperature)`, um gerador dos
+tokens da resposta, e `chat(...)`, que devolve a resposta inteira.
+"""
+import abc
+import json
+import os
+import re
+import threading
+import time
+
+# Chamadas simultâneas ao LLM (por processo)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "1"))
+
+# Servidor compatível com a OpenAI (LLM_BACKEND=http)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:8080/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "local-model")
+LLM_API_KEY = os.getenv("LLM_API_KEY")
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+# Tempo máximo sem receber dados do servidor (entre tokens do streaming)
+LLM_READ_TIMEOUT_S = float(os.getenv("LLM_READ_TIMEOUT_S", "60"))
+
+
+class StubLlama:
+    """
+    Modelo falso com a mesma interface de `create_chat_completion` do
+    llama.cpp, para testar o fluxo de explicações sem carregar pesos.
+    Responde uma linha "[n] ..." para cada perfil numerado do prompt.
+    """
+
+    def __init__(self, token_delay_s: float = 0.02):
+        self.token_delay_s = token_delay_s
+
+    def _resposta(self, prompt: str) -> str:
+        perfis = dict.fromkeys(re.findall(r'^\[(\d+)\]', prompt, flags=re.M))
+        if not perfis:
+            return "Perfil compatível com os principais requisitos da vaga."
+        return "\n".join(
+            f"[{n}] Perfil {n} compatível com os principais requisitos da vaga." for n in perfis)
+
+    def create_chat_completion(self, messages, max_tokens=200, temperature=0.7, stream=False, **kwargs):
+        tokens = re.findall(r'\S+\s*', self._resposta(messages[-1]["content"]))[:max_tokens]
+        if not stream:
+            return {"choices": [{"message": {"role": "assistant", "content": "".join(tokens)}}]}
+        return self._stream(tokens)
+
+    def _stream(self, tokens):
+        for token in tokens:
+            time.sleep(self.token_delay_s)
+            yield {"choices": [{"delta": {"content": token}}]}
+
+
+class LLMClient(abc.ABC):
+    """Interface comum dos clientes de LLM."""
+
+    @abc.abstractmethod
+    def stream_chat(self, messages, max_tokens: int = 200, temperature: float = 0.7):
+        """Gerador dos tokens da resposta."""
+
+    def chat(self, messages, max_tokens: int = 200, temperature: float = 0.7) -> str:
+        return "".join(self.stream_chat(messages, max_tokens, temperature))
+
+
+class InProcessClient(LLMClient):
+    """
+    Cliente sobre um modelo carregado no próprio processo (`llama_cpp.Llama`
+    ou `StubLlama`). A instância do llama.cpp não é thread-safe, então as
+    gerações são serializadas.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+
+    def stream_chat(self, messages, max_tokens: int = 200, temperature: float = 0.7):
+        with self._lock:
+            for chunk in self.model.create_chat_completion(
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+            ):
+                token = chunk["choices"][0]["delta"].get("content")
+                if token:
+                    yield token
+
+
+class OpenAICompatibleClient(LLMClient):
+    """
+    Cliente HTTP para `/chat/completions` de um servidor compatível com a
+    OpenAI. As conexões ficam em um pool (keep-alive) e no máximo
+    `max_concurrency` chamadas ficam abertas ao mesmo tempo.
+    """
+
+    def __init__(self, base_url: str = LLM_BASE_URL, model: str = LLM_MODEL,
+                 api_key: str = LLM_API_KEY, connect_timeout_s: float = LLM_CONNECT_TIMEOUT_S,
+                 read_timeout_s: float = LLM_READ_TIMEOUT_S,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.model = model
+        self.timeout = (connect_timeout_s, read_timeout_s)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def stream_chat(self, messages, max_tokens: int = 200, temperature: float = 0.7):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+        }
+        # Espera por uma vaga no limite de concorrência no máximo o timeout de leitura
+        if not self._slots.acquire(timeout=self.timeout[1]):
+            raise TimeoutError(
+                f"Nenhuma conexão livre com o LLM em {self.timeout[1]:.0f}s.")
+        try:
+            with self.session.post(self.url, json=payload, stream=True,
+                                   timeout=self.timeout) as resposta:
+                resposta.raise_for_status()
+                # Server-sent events: linhas "data: {json}" terminadas por "data: [DONE]"
+                for linha in resposta.iter_lines():
+                    linha = linha.decode("utf-8").strip()
+                    if not linha.startswith("data:"):
+                        continue
+                    dados = linha[len("data:"):].strip()
+                    if dados == "[DONE]":
+                        break
+                    escolhas = json.loads(dados).get("choices") or [{}]
+                    token = escolhas[0].get("delta", {}).get("content")
+                    if token:
+                        yield token
+        finally:
+            self._slots.release()
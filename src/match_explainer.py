@@ -0,0 +1,187 @@
+"""
+Explicação extrativa dos matches, sem LLM.
+
+No pré-processamento os campos de texto de vagas e candidatos são divididos
+em trechos (campos curtos inteiros, campos longos em frases), e cada trecho
+distinto é codificado uma vez pelo mesmo modelo de embedding. No app a
+explicação de um match é só um produto entre os vetores dos trechos da vaga
+e do candidato: os pares de trechos mais parecidos, os campos do perfil que
+mais se aproximam da vaga e os termos em comum.
+
+Artefatos por entidade (em data/processed_data):
+- <base>.parquet: um trecho por linha (owner, campo, texto, vetor), agrupado
+  por owner, que é o mesmo id usado nos arquivos de embeddings;
+- <base>_vectors.npy: vetores dos trechos distintos (coluna 'vetor').
+"""
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.utils import metrics
+from src.vector_search import normalize
+
+PROCESSED_DATA_PATH = "data/processed_data"
+SEGMENT_FILES = {
+    'jobs': os.path.join(PROCESSED_DATA_PATH, "vaga_segments"),
+    'applicants': os.path.join(PROCESSED_DATA_PATH, "candid_segments"),
+}
+
+SEGMENT_MAX_WORDS = 40
+SEGMENT_MIN_CHARS = 3
+MAX_SEGMENTS_PER_ROW = 48
+
+# Frases: pontuação final, ponto e vírgula ou marcadores de lista
+_SENTENCE_SPLIT = re.compile(r'(?<=[.;!?])\s+|\s+-\s+|\s*[•*]\s*')
+_TERM = re.compile(r'[a-z0-9+#]+(?:[.\-/][a-z0-9+#]+)*')
+
+# Palavras frequentes que não indicam competência
+STOPWORDS = frozenset("""
+a ao aos as com como da das de do dos e em entre era essa esse esta este eu
+foi for ha isso ja la mais mas me mesmo na nas nao no nos o os ou para pela
+pelas pelo pelos por que se sem ser seu sua suas seus sobre tambem tem ter um
+uma umas uns the and of to in for with on at by an is are be as or from
+ate apos anos ano area areas atividades atuacao bom boa conhecimento
+conhecimentos desejavel empresa experiencia experiencias nivel profissional
+projeto projetos trabalho vaga cliente clientes equipe equipes atual
+""".split())
+
+Segments = namedtuple('Segments', ['vectors', 'fields', 'texts'])
+
+
+def split_segments(text: str, max_words: int = SEGMENT_MAX_WORDS):
+    """Divide um texto em frases de no máximo `max_words` palavras."""
+    trechos = []
+    for frase in _SENTENCE_SPLIT.split(str(text)):
+        palavras = frase.strip(' .;!?').split()
+        for inicio in range(0, len(palavras), max_words):
+            trecho = ' '.join(palavras[inicio:inicio + max_words])
+            if len(trecho) >= SEGMENT_MIN_CHARS:
+                trechos.append(trecho)
+    return trechos
+
+
+def build_segments(df: pd.DataFrame, fields, max_segments: int = MAX_SEGMENTS_PER_ROW) -> pd.DataFrame:
+    """
+    Gera a tabela de trechos (owner, campo, texto) das linhas de `df`, na
+    ordem das linhas e dos `fields`, com no máximo `max_segments` por linha.
+    """
+    colunas = {campo: df[campo].to_numpy(dtype=object) for campo in fields if campo in df}
+    owners, campos, textos = [], [], []
+    for posicao, owner in enumerate(df.index):
+        restantes = max_segments
+        for campo, valores in colunas.items():
+            if not valores[posicao] or restantes == 0:
+                continue
+            trechos = split_segments(valores[posicao])[:restantes]
+            restantes -= len(trechos)
+            owners.extend([owner] * len(trechos))
+            campos.extend([campo] * len(trechos))
+            textos.extend(trechos)
+    return pd.DataFrame({
+        'owner': pd.Series(owners, dtype=df.index.dtype),
+        'campo': pd.Categorical(campos, categories=list(colunas)),
+        'texto': pd.Series(textos, dtype=object),
+    })
+
+
+class SegmentIndex:
+    """Trechos de uma entidade, com acesso por owner em O(1)."""
+
+    def __init__(self, base_path: str):
+        import pyarrow.parquet as pq
+
+        tabela = pq.read_table(f"{base_path}.parquet")
+        self.vectors = np.load(f"{base_path}_vectors.npy", mmap_mode='r')
+        # O texto fica em Arrow (compacto) e só é materializado por match
+        self._texts = tabela.column('texto').combine_chunks()
+        self._vector_rows = tabela.column('vetor').to_numpy()
+        campos = tabela.column('campo').to_pandas().astype('category')
+        self._field_codes = campos.cat.codes.to_numpy()
+        self._field_names = np.asarray(campos.cat.categories, dtype=object)
+
+        owners = tabela.column('owner').to_numpy(zero_copy_only=False)
+        inicios = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else np.array([], dtype=np.int64)
+        fins = np.r_[inicios[1:], len(owners)]
+        self._spans = dict(zip(owners[inicios].tolist(), zip(inicios.tolist(), fins.tolist())))
+
+    def __len__(self):
+        return len(self._spans)
+
+    def get(self, owner):
+        span = self._spans.get(owner)
+        if span is None:
+            return None
+        inicio, fim = span
+        return Segments(
+            vectors=np.asarray(self.vectors[self._vector_rows[inicio:fim]], dtype=np.float32),
+            fields=self._field_names[self._field_codes[inicio:fim]],
+            texts=self._texts.slice(inicio, fim - inicio).to_pylist(),
+        )
+
+
+def segments_available(entity: str) -> bool:
+    base = SEGMENT_FILES.get(entity)
+    return base is not None and all(
+        os.path.exists(f"{base}{sufixo}") for sufixo in ('.parquet', '_vectors.npy'))
+
+
+@st.cache_resource(show_spinner="Carregando trechos para explicações...")
+def load_segment_index(entity: str):
+    """Índice de trechos da entidade ('jobs' ou 'applicants'), ou None se não foi gerado."""
+    if not segments_available(entity):
+        return None
+    with metrics.span("load_segment_index", target=entity):
+        return SegmentIndex(SEGMENT_FILES[entity])
+
+
+def skill_terms(texts) -> list:
+    """Termos (em ordem de aparição) que podem indicar competências."""
+    termos = {}
+    for texto in texts:
+        for termo in _TERM.findall(texto):
+            if termo in STOPWORDS or termo.isdigit():
+                continue
+            if len(termo) >= 3 or any(c in termo for c in '+#'):
+                termos.setdefault(termo, None)
+    return list(termos)
+
+
+def explain_match(job: Segments, candidate: Segments, top_pairs: int = 3,
+                  top_fields: int = 3, max_terms: int = 15) -> dict:
+    """
+    Compara os trechos da vaga e do candidato e devolve:
+    - 'pairs': pares (trecho da vaga, trecho do candidato, campo, similaridade)
+      mais parecidos, sem repetir o trecho do candidato;
+    - 'fields': campos do candidato e a maior similaridade de cada um com a vaga;
+    - 'terms': termos presentes nos dois textos.
+    """
+    with metrics.span("explain_match"):
+        similaridades = normalize(job.vectors) @ normalize(candidate.vectors).T
+        melhor_trecho_vaga = similaridades.argmax(axis=0)
+        melhor_similaridade = similaridades.max(axis=0)
+
+        pares, vistos = [], set()
+        for posicao in np.argsort(-melhor_similaridade, kind='stable'):
+            if candidate.texts[posicao] in vistos:
+                continue
+            vistos.add(candidate.texts[posicao])
+            pares.append((job.texts[melhor_trecho_vaga[posicao]], candidate.texts[posicao],
+                          candidate.fields[posicao], float(melhor_similaridade[posicao])))
+            if len(pares) == top_pairs:
+                break
+
+        campos = (pd.Series(melhor_similaridade, index=candidate.fields)
+                  .groupby(level=0).max().sort_values(ascending=False).head(top_fields))
+
+        termos_candidato = set(skill_terms(candidate.texts))
+        termos = [termo for termo in skill_terms(job.texts) if termo in termos_candidato]
+
+    return {
+        'pairs': pares,
+        'fields': list(campos.items()),
+        'terms': termos[:max_terms],
+    }
@@ -1,14 +1,24 @@
 
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import streamlit as st
 import os
 import pickle
 import hashlib  # Adicionado para gerar chaves de cache únicas
-
-# Importa SentenceTransformer para embeddings de alta qualidade
-from sentence_transformers import SentenceTransformer
+import re
+
+# Modelo de embedding (SentenceTransformer em PyTorch ou ONNX Runtime, conforme EMBEDDING_BACKEND)
+from src.embedding_backend import EMBEDDING_BACKEND, load_embedding_model
+from src.clustering import CANDID_CLUSTERS_FILE, CANDID_UMAP_FILE, probe_rows
+from src.embedding_projection import (
+    PROJECTION_FILE, USE_REDUCED_EMBEDDINGS, load_projection, load_reduced, project, reduced_path)
+from src.id_array import IdArray, labels_path
+from src.prospect_mapping import (
+    MappedEmbeddings, load_row_map, row_map_ids_path, row_map_path, unique_candidate_rows)
+from src.result_cache import artifact_version
+from src.utils import metrics
+from src.vector_search import (
+    SCAN_BLOCK_SIZE, batch_top_k, merge_top_k, normalize, normalized_blocks, scan_top_k, sorted_by_score)
 
 # A instância LLM do chat_llm.py
 # from src.chat_llm import ask_llm
@@ -34,9 +44,11 @@ def load_embedding_model_for_inference():
     Esta função é executada apenas uma vez devido ao cache do Streamlit.
     Será usada para gerar embeddings de queries pontuais, se necessário.
     """
-    print("DEBUG_EMBED: Carregando modelo de embedding SentenceTransformer 'all-MiniLM-L6-v2' para inferência.")
+    print(
+        f"DEBUG_EMBED: Carregando modelo de embedding 'all-MiniLM-L6-v2' (backend '{EMBEDDING_BACKEND}') para inferência.")
     try:
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        with metrics.span("embedding_model_load", backend=EMBEDDING_BACKEND):
+            model = load_embedding_model()
         print("DEBUG_EMBED: Modelo de embedding carregado com sucesso para inferência.")
         return model
     except Exception as e:
@@ -53,11 +65,58 @@ embedding_model_inference = load_embedding_model_for_inference()
 
 # --- Funções de Carregamento de Embeddings (Assumem que já foram gerados) ---
 
-@st.cache_data(show_spinner="Carregando embeddings pré-gerados...", persist=True)
-def load_all_embeddings():
+def npy_paths(file_path: str):
+    """
+    Caminhos dos arquivos .npy (vetores e ids) gravados em lotes pelo script de
+    pré-processamento para um arquivo de embeddings .pkl.
+    """
+    base = os.path.splitext(file_path)[0]
+    return f"{base}.npy", f"{base}_ids.npy"
+
+
+def embeddings_file_exists(file_path: str) -> bool:
+    """Indica se os embeddings existem em .npy (preferido) ou .pkl."""
+    return all(os.path.exists(p) for p in npy_paths(file_path)) or os.path.exists(file_path)
+
+
+def _read_embeddings_file(file_path: str) -> dict:
+    vectors_path, ids_path = npy_paths(file_path)
+    if os.path.exists(vectors_path) and os.path.exists(ids_path):
+        # Mapeado em memória: as páginas são lidas sob demanda
+        return {'ids': IdArray.load(ids_path),
+                'embeddings': np.load(vectors_path, mmap_mode='r'),
+                'vectors_path': vectors_path}
+    with open(file_path, 'rb') as f:
+        embeddings_data = pickle.load(f)
+    embeddings_data['ids'] = IdArray.from_values(embeddings_data['ids'])
+    return embeddings_data
+
+
+def embeddings_version() -> str:
+    """
+    Versão dos artefatos de embeddings (e clusters) publicados: muda quando
+    algum arquivo é regenerado, invalidando os caches que a usam na chave.
+    """
+    paths = [CANDID_CLUSTERS_FILE, CANDID_UMAP_FILE, PROJECTION_FILE]
+    for file_path in (VAGA_EMBEDDINGS_FILE, CANDID_EMBEDDINGS_FILE, PROSPECT_EMBEDDINGS_FILE):
+        paths += [file_path, *npy_paths(file_path), labels_path(npy_paths(file_path)[1]),
+                  reduced_path(file_path), row_map_path(file_path), row_map_ids_path(file_path)]
+    return artifact_version(paths)
+
+
+@st.cache_resource(show_spinner="Carregando embeddings pré-gerados...")
+def load_all_embeddings(version: str = None):
     """
-    Carrega embeddings de arquivos .pkl. Esta função ASSUME que os embeddings
-    já foram gerados pelo script 'generate_preprocessed_data.py'.
+    Carrega embeddings dos arquivos .npy gerados em lotes ou, na ausência deles,
+    dos .pkl. Esta função ASSUME que os embeddings já foram gerados pelo script
+    'generate_preprocessed_data.py'. `version` (ver `embeddings_version`) só
+    entra na chave do cache, para recarregar quando os arquivos mudarem.
+    Cache de recurso, não de dados: o st.cache_data serializaria os memmaps
+    dos .npy em cópias completas na RAM (e em disco), e o resultado é
+    compartilhado entre as sessões sem cópia. Os arrays não devem ser alterados.
+    Com USE_REDUCED_EMBEDDINGS e os vetores reduzidos gerados (ver
+    src/embedding_projection.py), candidatos e prospects usam os vetores
+    reduzidos e levam a projeção em 'projection', aplicada às consultas.
     """
     embeddings_data = {}
     files_to_load = {
@@ -67,24 +126,62 @@ def load_all_embeddings():
     }
 
     for key, file_path in files_to_load.items():
-        if not os.path.exists(file_path):
+        if not embeddings_file_exists(file_path):
             st.error(
                 f"ERRO: Arquivo de embeddings '{file_path}' não encontrado! Por favor, execute 'python scripts/generate_preprocessed_data.py' primeiro.")
             st.stop()  # Parar a aplicação se um arquivo essencial não for encontrado
 
         try:
-            with open(file_path, 'rb') as f:
-                embeddings_data[key] = pickle.load(f)
+            with metrics.span("load_all_embeddings", target=key):
+                embeddings_data[key] = _read_embeddings_file(file_path)
             print(
                 f"DEBUG_EMBED: Embeddings para '{key}' carregados de '{file_path}'.")
+            projection = load_projection(version=version) if USE_REDUCED_EMBEDDINGS else None
+            if key != 'jobs' and projection is not None:
+                reduced = load_reduced(file_path, len(embeddings_data[key]['ids']))
+                if reduced is not None:
+                    embeddings_data[key] = {'ids': embeddings_data[key]['ids'], 'embeddings': reduced,
+                                            'projection': projection, 'vectors_path': reduced_path(file_path)}
+                    print(f"DEBUG_EMBED: Usando embeddings reduzidos ({reduced.shape[1]} dimensões) "
+                          f"para '{key}'.")
         except Exception as e:
             st.error(
                 f"Erro ao carregar embeddings de '{file_path}': {e}. Tente regenerá-los.")
             st.stop()  # Parar em caso de erro grave de leitura
 
+    embeddings_data['prospects'] = _map_prospects(
+        embeddings_data['prospects'], embeddings_data['applicants'], PROSPECT_EMBEDDINGS_FILE)
     return embeddings_data
 
 
+def _map_prospects(prospects: dict, applicants: dict, file_path: str) -> dict:
+    """
+    Prospects mapeados no pré-processamento (ver src/prospect_mapping.py):
+    os vetores passam a vir dos candidatos e dos vetores próprios, sem cópia.
+    Só um prospect por candidato entra na busca (o vetor é o mesmo), então o
+    ranking não repete a mesma pessoa. Sem 'vectors_path', a busca dos
+    prospects não usa shards.
+    """
+    mapping = load_row_map(file_path)
+    if mapping is None:
+        return prospects
+    row_map, ids = mapping
+    # Candidatos e prospects precisam estar no mesmo espaço (ambos reduzidos ou ambos completos)
+    if (prospects.get('projection') is None) != (applicants.get('projection') is None):
+        print("DEBUG_EMBED: Só um dos alvos tem vetores reduzidos. Usando os completos nos prospects.")
+        applicants = _read_embeddings_file(CANDID_EMBEDDINGS_FILE)
+        prospects = _read_embeddings_file(file_path)
+    embeddings = MappedEmbeddings(applicants['embeddings'], prospects['embeddings'], row_map)
+    print(f"DEBUG_EMBED: {embeddings.candidate_share:.0%} dos prospects usam o vetor do candidato.")
+    unicos = unique_candidate_rows(row_map)
+    if len(unicos) < len(row_map):
+        print(f"DEBUG_EMBED: {len(row_map) - len(unicos)} prospects repetem um candidato "
+              f"já buscado e ficam fora da busca.")
+    ids = IdArray(ids.codes[unicos], ids.labels)
+    embeddings = MappedEmbeddings(applicants['embeddings'], prospects['embeddings'], row_map[unicos])
+    return {'ids': ids, 'embeddings': embeddings, 'projection': applicants.get('projection')}
+
+
 # # --- Funções de Cache para Explicações do LLM ---
 
 # def load_llm_explanations_cache():
@@ -120,37 +217,246 @@ def load_all_embeddings():
 
 # --- Funções de Matching ---
 
-def find_top_matches(query_embedding: np.ndarray, target_embeddings_data: dict, top_n: int = 5):
+# Tamanho do ranking guardado por consulta (paginação)
+MAX_RANKED_RESULTS = 500
+
+
+class MatchCursor:
     """
-    Encontra os top N itens mais compatíveis para um embedding de consulta.
-    `target_embeddings_data` deve ser um dicionário com 'ids' e 'embeddings'.
+    Ranking dos `k` alvos mais compatíveis com uma consulta, calculado uma
+    única vez. Páginas e iterações são fatias desse ranking (colunas 'id',
+    'similarity_score' e 'row'), sem recalcular nenhum score.
     """
-    target_ids = target_embeddings_data['ids']
-    target_embeddings_array = target_embeddings_data['embeddings']
 
-    if not target_embeddings_array.shape[0] > 0:
+    def __init__(self, ranked: pd.DataFrame, missing_shards=()):
+        self.ranked = ranked.reset_index(drop=True)
+        # Shards que não responderam (busca particionada): o ranking é parcial
+        self.missing_shards = list(missing_shards)
+
+    @classmethod
+    def from_query(cls, query_embedding: np.ndarray, target_embeddings_data: dict,
+                   k: int = MAX_RANKED_RESULTS, n_probe: int = None):
+        """
+        Ranqueia os alvos de `target_embeddings_data` ('ids', 'embeddings' e,
+        opcionalmente, 'clusters' e 'searcher'). Com `n_probe` e clusters,
+        compara só as linhas dos `n_probe` clusters mais próximos (busca
+        aproximada). Com um `ShardedSearcher` em 'searcher' (ver
+        src/sharded_search.py), a busca exata é feita pelos processos dos shards.
+        """
+        target_ids = IdArray.from_values(target_embeddings_data['ids'])
+        clusters = target_embeddings_data.get('clusters')
+        pruned = bool(n_probe) and clusters is not None
+        searcher = None if pruned else target_embeddings_data.get('searcher')
+        metrics.inc_counter("find_top_matches_total",
+                            mode="pruned" if pruned else "sharded" if searcher is not None else "exact")
+        found, missing_shards = None, ()
+        with metrics.span("find_top_matches"):
+            # Só as linhas dos clusters mais próximos da consulta
+            rows = probe_rows(clusters, query_embedding, n_probe) if pruned else None
+            # Alvos reduzidos: a consulta passa pela mesma projeção (os clusters usam a original)
+            if target_embeddings_data.get('projection') is not None:
+                query_embedding = project(query_embedding, target_embeddings_data['projection'])
+            if searcher is not None:
+                best_rows, best_scores, missing_shards = searcher.search(query_embedding, k)
+                if best_rows is not None:
+                    found = best_rows, best_scores
+            # Sem shards (ou nenhum respondeu): busca no próprio processo
+            if found is None:
+                found, missing_shards = scan_top_k(
+                    np.ravel(query_embedding), target_embeddings_data['embeddings'], k, rows), ()
+            best_rows, best_scores = found
+        return cls(pd.DataFrame({
+            'id': target_ids[best_rows],
+            'similarity_score': best_scores,
+            'row': best_rows
+        }), missing_shards)
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def head(self, n: int) -> pd.DataFrame:
+        return self.ranked.iloc[:n]
+
+    def page(self, number: int, page_size: int = 20) -> pd.DataFrame:
+        """Página `number` (a partir de 0) do ranking."""
+        return self.ranked.iloc[number * page_size:(number + 1) * page_size]
+
+    def pages(self, page_size: int = 20):
+        for start in range(0, len(self.ranked), page_size):
+            yield self.ranked.iloc[start:start + page_size]
+
+    def with_head(self, head_df: pd.DataFrame):
+        """
+        Novo cursor com os primeiros `len(head_df)` itens substituídos por
+        `head_df` (ex.: o shortlist reordenado pelo cross-encoder).
+        """
+        rest = self.ranked[~self.ranked['id'].isin(head_df['id'])]
+        return MatchCursor(pd.concat([head_df, rest], ignore_index=True), self.missing_shards)
+
+
+def iter_ranked(query_embedding: np.ndarray, target_embeddings_data: dict,
+                k: int = MAX_RANKED_RESULTS, page_size: int = 100, n_probe: int = None):
+    """
+    Percorre o ranking dos `k` melhores alvos em páginas de `page_size`
+    linhas, para exportações em lote.
+    """
+    yield from MatchCursor.from_query(
+        query_embedding, target_embeddings_data, k, n_probe).pages(page_size)
+
+
+def find_top_matches(query_embedding: np.ndarray, target_embeddings_data: dict, top_n: int = 5,
+                     n_probe: int = None, aggregation: str = 'max'):
+    """
+    Encontra os top N itens mais compatíveis para um embedding de consulta.
+    `target_embeddings_data` deve ser um dicionário com 'ids' (IdArray ou
+    lista/array de ids) e 'embeddings'.
+    Com `n_probe` e os clusters do alvo em `target_embeddings_data['clusters']`
+    (ver src/clustering.py), compara só as linhas dos `n_probe` clusters mais
+    próximos da consulta (busca aproximada). A coluna 'row' traz a posição de
+    cada match nos embeddings. Com várias consultas (array 2-D, uma vaga por
+    linha), delega para `find_top_matches_multi` com a `aggregation` indicada.
+    """
+    if not target_embeddings_data['embeddings'].shape[0] > 0:
         print("DEBUG_MATCH: Nenhum embedding alvo para comparar.")
         return pd.DataFrame()
 
-    query_embedding_reshaped = query_embedding.reshape(1, -1)
+    if np.ndim(query_embedding) == 2 and len(query_embedding) > 1:
+        return find_top_matches_multi(query_embedding, target_embeddings_data, top_n, aggregation)
 
-    # Calcula a similaridade de cosseno entre o embedding da query e todos os embeddings alvo
-    similarities = cosine_similarity(
-        query_embedding_reshaped, target_embeddings_array)[0]
+    top_matches = MatchCursor.from_query(
+        query_embedding, target_embeddings_data, top_n, n_probe).head(top_n)
 
-    # Cria um DataFrame para fácil ordenação e mapeamento de IDs
-    match_df = pd.DataFrame({
-        'id': target_ids,
-        'similarity_score': similarities
-    })
+    print(f"DEBUG_MATCH: Encontrados {len(top_matches)} top matches.")
+    return top_matches
 
-    # Ordena e retorna os top N matches
-    top_matches = match_df.sort_values(
-        by='similarity_score', ascending=False).head(top_n)
 
-    print(f"DEBUG_MATCH: Encontrados {len(top_matches)} top matches.")
+MULTI_AGGREGATIONS = ('max', 'mean', 'quota')
+
+
+def find_top_matches_multi(query_embeddings: np.ndarray, target_embeddings_data: dict, top_n: int = 5,
+                           aggregation: str = 'max', block_size: int = SCAN_BLOCK_SIZE):
+    """
+    Busca para várias vagas de uma vez (`query_embeddings`, uma por linha):
+    cada bloco de alvos é comparado com todas as vagas em um único produto
+    matriz x matriz. Agregações:
+    - 'max': top N alvos pelo maior score entre as vagas ('job' é a vaga desse score);
+    - 'mean': top N alvos pelo score médio nas vagas ('job' é a vaga de maior score);
+    - 'quota': N alvos por vaga, sem repetir um alvo em duas vagas. A atribuição é
+      gulosa pelo score: cada par (vaga, alvo), do maior para o menor, entra se a
+      vaga ainda tem vaga na cota e o alvo ainda não foi usado.
+    'job' é a posição da vaga em `query_embeddings`.
+    """
+    if aggregation not in MULTI_AGGREGATIONS:
+        raise ValueError(
+            f"Agregação '{aggregation}' inválida. Use uma de {MULTI_AGGREGATIONS}.")
+    target_ids = IdArray.from_values(target_embeddings_data['ids'])
+    if target_embeddings_data.get('projection') is not None:
+        query_embeddings = project(query_embeddings, target_embeddings_data['projection'])
+    queries = normalize(np.atleast_2d(query_embeddings))
+    n_jobs = len(queries)
+
+    metrics.inc_counter("find_top_matches_total", mode=f"multi_{aggregation}")
+    with metrics.span("find_top_matches_multi", aggregation=aggregation):
+        if aggregation == 'quota':
+            # Cada vaga guarda top_n * n_jobs candidatos: mesmo que os das outras vagas
+            # ocupem top_n * (n_jobs - 1) deles, sobram top_n para ela
+            rows, scores = batch_top_k(queries, target_embeddings_data['embeddings'], top_n * n_jobs,
+                                       block_size=block_size)
+            pairs = pd.DataFrame({
+                'job': np.repeat(np.arange(n_jobs), rows.shape[1]),
+                'row': rows.ravel(),
+                'similarity_score': scores.ravel(),
+            }).sort_values(['similarity_score', 'row'], ascending=[False, True], kind='stable')
+
+            taken, filled, chosen = set(), np.zeros(n_jobs, dtype=int), []
+            for job, row, score in pairs.itertuples(index=False):
+                if filled[job] < top_n and row not in taken:
+                    taken.add(row)
+                    filled[job] += 1
+                    chosen.append((job, score, row))
+            top_matches = pd.DataFrame(chosen, columns=['job', 'similarity_score', 'row'])
+            top_matches.insert(1, 'id', target_ids[top_matches['row'].to_numpy(dtype=np.int64)])
+            top_matches = top_matches.sort_values(['job', 'similarity_score'], ascending=[True, False], ignore_index=True)
+        else:
+            best_rows = np.empty(0, dtype=np.int64)
+            best_scores = np.empty(0, dtype=np.float32)
+            for block_rows, block in normalized_blocks(target_embeddings_data['embeddings'],
+                                                       block_size=block_size):
+                scores = block @ queries.T
+                aggregated = scores.max(axis=1) if aggregation == 'max' else scores.mean(axis=1)
+                best_rows, best_scores = merge_top_k(best_rows, best_scores, block_rows, aggregated, top_n)
+            best_rows, best_scores = sorted_by_score(best_rows, best_scores)
+            # Vaga de maior score de cada alvo escolhido (só as top_n linhas)
+            best_jobs = (normalize(target_embeddings_data['embeddings'][best_rows]) @ queries.T).argmax(axis=1)
+
+            top_matches = pd.DataFrame({
+                'job': best_jobs,
+                'id': target_ids[best_rows],
+                'similarity_score': best_scores,
+                'row': best_rows,
+            })
+
+    print(f"DEBUG_MATCH: Encontrados {len(top_matches)} matches para {n_jobs} vagas ({aggregation}).")
     return top_matches
 
+# Limite de caracteres de cada texto no prompt, para não exceder o n_ctx do LLM
+EXPLANATION_TEXT_LIMIT = 1500
+# No prompt em lote cada perfil recebe menos espaço, para o top-k inteiro caber no contexto
+BATCH_CANDIDATE_TEXT_LIMIT = 600
+BATCH_MAX_TOKENS_PER_CANDIDATE = 120
+
+
+def _job_prompt_prefix(job_text: str) -> str:
+    # A vaga vem primeiro para que prompts da mesma vaga compartilhem o prefixo (KV-cache)
+    return f"""Vaga:
+{str(job_text)[:EXPLANATION_TEXT_LIMIT]}
+
+"""
+
+
+def build_explanation_prompt(job_text: str, candidate_text: str, match_score: float) -> str:
+    """Monta o prompt que pede ao LLM a explicação do match vaga x perfil."""
+    return _job_prompt_prefix(job_text) + f"""Perfil do Candidato/Prospect:
+{str(candidate_text)[:EXPLANATION_TEXT_LIMIT]}
+
+Explique em português de forma concisa (máximo 150 palavras) por que o perfil do candidato/prospect descrito acima pode ser um bom match para a vaga, considerando uma similaridade de {match_score:.2f} (onde 1.0 é um match perfeito). Foco nos pontos relevantes.
+
+Explicação do Match:"""
+
+
+def build_batch_explanation_prompt(job_text: str, candidates) -> str:
+    """
+    Monta um único prompt que pede a explicação de todos os `candidates`
+    (lista de pares (texto, score)) de uma vez, numerados a partir de 1.
+    A resposta é lida com `parse_batch_explanations`.
+    """
+    perfis = "\n\n".join(
+        f"[{numero}] (similaridade {score:.2f})\n{str(texto)[:BATCH_CANDIDATE_TEXT_LIMIT]}"
+        for numero, (texto, score) in enumerate(candidates, start=1)
+    )
+    return _job_prompt_prefix(job_text) + f"""Perfis dos Candidatos/Prospects:
+{perfis}
+
+Para cada perfil acima, explique em português de forma concisa (máximo 80 palavras por perfil) por que ele pode ser um bom match para a vaga (similaridade de 1.0 é um match perfeito). Foco nos pontos relevantes. Responda com um parágrafo por perfil, na ordem, começando pelo número do perfil entre colchetes:
+[1] explicação do perfil 1
+[2] explicação do perfil 2
+
+Explicações dos Matches:"""
+
+
+def parse_batch_explanations(text: str, n_candidates: int) -> dict:
+    """
+    Separa a resposta do prompt em lote em {posição (0..n-1): explicação}.
+    Funciona com a resposta parcial, durante o streaming.
+    """
+    partes = re.split(r'^\s*\[(\d+)\]', text, flags=re.M)
+    explicacoes = {}
+    for numero, conteudo in zip(partes[1::2], partes[2::2]):
+        posicao = int(numero) - 1
+        if 0 <= posicao < n_candidates and posicao not in explicacoes:
+            explicacoes[posicao] = conteudo.strip()
+    return explicacoes
+
 # --- Função de Explicação do LLM para o Match (AGORA COM CACHE) ---
 
 
@@ -0,0 +1,170 @@
+"""
+Layout dos Parquets de data/processed_data otimizado para leitura.
+
+`write_table` grava as tabelas de vagas, candidatos e prospects:
+- ordenadas pelo id da entidade (marcado em `sorting_columns`), em row groups
+  de PARQUET_ROW_GROUP_SIZE linhas com estatísticas, para que filtros por id
+  leiam só os row groups necessários (predicate pushdown);
+- comprimidas com zstd;
+- com dicionário só nas colunas de baixa cardinalidade (nas demais o
+  dicionário só ocupa espaço);
+- opcionalmente (PARQUET_SPLIT_TEXT) sem a coluna `processed_text`, que
+  repete o conteúdo de todas as outras: ela vai para <base>_text.parquet
+  (colunas 'row', o índice da tabela, e 'processed_text', ordenado por 'row'),
+  lido sob demanda por `TextStore`.
+
+`optimize_dtypes` converte as colunas de perfil de poucos valores distintos
+(CATEGORICAL_COLUMNS) para category antes da gravação e, para Parquets
+antigos, na leitura: no Parquet elas ficam com dicionário e o pandas as lê de
+volta como category.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_COMPRESSION_LEVEL = int(os.getenv("PARQUET_COMPRESSION_LEVEL", "6"))
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "20000"))
+SPLIT_PROCESSED_TEXT = os.getenv("PARQUET_SPLIT_TEXT", "True") == "True"
+# Colunas de texto com até essa fração de valores distintos usam dicionário
+DICTIONARY_MAX_RATIO = 0.5
+
+TEXT_COLUMN = 'processed_text'
+ROW_COLUMN = 'row'
+
+# Colunas de perfil (após a limpeza) com poucos valores distintos, por tabela.
+# Só viram category se a cardinalidade nos dados confirmar (DICTIONARY_MAX_RATIO)
+CATEGORICAL_COLUMNS = {
+    'applicants': ('nivel_profissional', 'nivel_academico', 'nivel_ingles', 'nivel_espanhol',
+                   'sabendo_de_nos_por', 'unidade'),
+    'vagas': ('tipo_contratacao', 'prioridade_vaga', 'nivel profissional', 'nivel_academico',
+              'nivel_ingles', 'nivel_espanhol', 'vaga_especifica_para_pcd', 'estado', 'regiao'),
+    'prospects': ('situacao_candidado', 'modalidade', 'recrutador'),
+}
+
+
+def text_path(path: str) -> str:
+    """Arquivo com os textos processados de uma tabela (<base>_text.parquet)."""
+    return f"{os.path.splitext(path)[0]}_text.parquet"
+
+
+def dictionary_columns(df: pd.DataFrame, max_ratio: float = DICTIONARY_MAX_RATIO) -> list:
+    """Colunas de texto cuja cardinalidade justifica codificação por dicionário."""
+    limite = max_ratio * len(df)
+    return [coluna for coluna in df.columns
+            if (df[coluna].dtype == object or pd.api.types.is_string_dtype(df[coluna])
+                or isinstance(df[coluna].dtype, pd.CategoricalDtype))
+            and df[coluna].nunique(dropna=False) <= limite]
+
+
+def optimize_dtypes(df: pd.DataFrame, table: str, max_ratio: float = DICTIONARY_MAX_RATIO) -> pd.DataFrame:
+    """
+    Cópia de `df` com as colunas de CATEGORICAL_COLUMNS[table] como category
+    (ou o próprio `df`, se nenhuma precisa de conversão).
+    """
+    limite = max_ratio * len(df)
+    colunas = [coluna for coluna in CATEGORICAL_COLUMNS.get(table, ())
+               if coluna in df and not isinstance(df[coluna].dtype, pd.CategoricalDtype)
+               and df[coluna].nunique(dropna=False) <= limite]
+    if not colunas:
+        return df
+    return df.astype({coluna: 'category' for coluna in colunas})
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> str:
+    """Memória (deep) total e das colunas com dtype alterado, antes -> depois."""
+    antes, depois = before.memory_usage(deep=True), after.memory_usage(deep=True)
+    linhas = [f"total: {antes.sum() / 2**20:.1f} MB -> {depois.sum() / 2**20:.1f} MB"]
+    linhas += [f"  {coluna}: {antes[coluna] / 2**20:.2f} MB -> {depois[coluna] / 2**20:.2f} MB"
+               for coluna in after.columns
+               if coluna in before and after[coluna].dtype != before[coluna].dtype]
+    return "\n".join(linhas)
+
+
+def _write(df: pd.DataFrame, path: str, preserve_index: bool, sort_by: str = None,
+           row_group_size: int = PARQUET_ROW_GROUP_SIZE, compression: str = PARQUET_COMPRESSION):
+    tabela = pa.Table.from_pandas(df, preserve_index=preserve_index)
+    sorting_columns = None
+    if sort_by is not None:
+        sorting_columns = [pq.SortingColumn(tabela.schema.get_field_index(sort_by))]
+    pq.write_table(
+        tabela, path,
+        compression=compression,
+        compression_level=PARQUET_COMPRESSION_LEVEL if compression == 'zstd' else None,
+        row_group_size=row_group_size,
+        use_dictionary=dictionary_columns(df),
+        write_statistics=True,
+        sorting_columns=sorting_columns,
+    )
+
+
+def write_table(df: pd.DataFrame, path: str, sort_by: str = None, split_text: bool = SPLIT_PROCESSED_TEXT,
+                row_group_size: int = PARQUET_ROW_GROUP_SIZE, compression: str = PARQUET_COMPRESSION):
+    """
+    Grava `df` (com o índice, que é o id usado nos embeddings) em `path`,
+    ordenado por `sort_by`. Com `split_text`, `processed_text` vai para
+    `text_path(path)`; sem ele, um arquivo de textos antigo é removido.
+    """
+    ordenado = df.sort_values(sort_by, kind='stable') if sort_by else df
+    caminho_textos = text_path(path)
+    if split_text and TEXT_COLUMN in ordenado:
+        textos = pd.DataFrame({
+            ROW_COLUMN: ordenado.index.to_numpy(),
+            TEXT_COLUMN: ordenado[TEXT_COLUMN].to_numpy(),
+        }).sort_values(ROW_COLUMN, kind='stable')
+        _write(textos, caminho_textos, preserve_index=False, sort_by=ROW_COLUMN,
+               row_group_size=row_group_size, compression=compression)
+        ordenado = ordenado.drop(columns=TEXT_COLUMN)
+    elif os.path.exists(caminho_textos):
+        os.remove(caminho_textos)
+    _write(ordenado, path, preserve_index=True, sort_by=sort_by,
+           row_group_size=row_group_size, compression=compression)
+
+
+def read_table(path: str, columns=None, with_text: bool = False) -> pd.DataFrame:
+    """
+    Lê uma tabela gravada por `write_table` (ou no layout antigo). Com
+    `with_text`, devolve também `processed_text`, lido de `text_path(path)`
+    quando os textos estão separados.
+    """
+    df = pd.read_parquet(path, columns=columns)
+    if with_text and TEXT_COLUMN not in df and os.path.exists(text_path(path)):
+        df[TEXT_COLUMN] = TextStore(path=text_path(path)).all().reindex(df.index).fillna('')
+    return df
+
+
+class TextStore:
+    """
+    Textos processados por id (índice da tabela). Lê de <base>_text.parquet só
+    os row groups que contêm os ids pedidos; com `texts`, usa a própria coluna
+    (Parquets antigos, que ainda trazem `processed_text`).
+    """
+
+    def __init__(self, path: str = None, texts: pd.Series = None):
+        self.path = path
+        self._texts = texts
+
+    def get(self, ids) -> pd.Series:
+        """Textos dos `ids`, na mesma ordem (vazio para ids sem texto)."""
+        ids = list(ids)
+        if self._texts is not None:
+            return self._texts.reindex(ids).fillna('')
+        if not ids:
+            return pd.Series([], dtype=object)
+        tabela = pq.read_table(self.path, columns=[ROW_COLUMN, TEXT_COLUMN],
+                               filters=[(ROW_COLUMN, 'in', ids)])
+        textos = pd.Series(tabela.column(TEXT_COLUMN).to_pylist(),
+                           index=tabela.column(ROW_COLUMN).to_pylist(), dtype=object)
+        return textos.reindex(ids).fillna('')
+
+    def __getitem__(self, row_id):
+        return self.get([row_id]).iloc[0]
+
+    def all(self) -> pd.Series:
+        if self._texts is not None:
+            return self._texts
+        tabela = pq.read_table(self.path, columns=[ROW_COLUMN, TEXT_COLUMN])
+        return pd.Series(tabela.column(TEXT_COLUMN).to_pylist(),
+                         index=tabela.column(ROW_COLUMN).to_pylist(), dtype=object)
@@ -0,0 +1,119 @@
+"""
+Vetores dos prospects a partir dos embeddings dos candidatos.
+
+O prospect (`id_prospect`) é o código do candidato (`id_candidato`), e o
+texto próprio do prospect é curto (nome, situação, título da vaga). No
+pré-processamento cada prospect com registro em applicants passa a usar o
+vetor desse candidato, e só os demais são codificados em
+prospect_embeddings.npy. O mapeamento fica em `<base>_row_map.npy`, um int64
+por prospect: linha >= 0 em candid_embeddings, ou -(linha + 1) nos vetores
+próprios. Os ids de todos os prospects ficam em `<base>_row_map_ids.npy`.
+
+Na busca, `MappedEmbeddings` monta os blocos de vetores dos prospects sob
+demanda a partir dos dois arquivos, sem gravar uma cópia dos vetores. Um
+candidato prospectado para várias vagas aparece em vários prospects com o mesmo
+vetor; `unique_candidate_rows` deixa só um prospect por candidato, para que os
+k resultados da busca sejam k pessoas diferentes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.id_array import IdArray, labels_path
+
+
+def row_map_path(file_path: str) -> str:
+    return f"{os.path.splitext(file_path)[0]}_row_map.npy"
+
+
+def row_map_ids_path(file_path: str) -> str:
+    return f"{os.path.splitext(file_path)[0]}_row_map_ids.npy"
+
+
+def applicant_rows(prospect_codes, applicant_codes, applicant_ids, candid_ids) -> np.ndarray:
+    """
+    Linha em candid_embeddings do candidato de cada prospect, ou -1 se ele não
+    está em applicants. `applicant_codes` são os `id_candidato` de applicants,
+    cujo índice é `applicant_ids`; `candid_ids` os ids dos embeddings.
+    """
+    linhas = pd.Series(IdArray.from_values(candid_ids).positions(applicant_ids),
+                       index=np.asarray(applicant_codes))
+    linhas = linhas[~linhas.index.duplicated()]
+    return linhas.reindex(np.asarray(prospect_codes)).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def build_row_map(candidate_rows: np.ndarray) -> np.ndarray:
+    """Mapeamento gravado a partir de `applicant_rows`: os sem candidato recebem -(linha própria + 1)."""
+    row_map = np.asarray(candidate_rows, dtype=np.int64).copy()
+    proprios = row_map < 0
+    row_map[proprios] = -(np.arange(proprios.sum()) + 1)
+    return row_map
+
+
+def save_row_map(file_path: str, row_map: np.ndarray, ids):
+    np.save(row_map_path(file_path), np.asarray(row_map, dtype=np.int64))
+    IdArray.from_values(ids).save(row_map_ids_path(file_path))
+
+
+def remove_row_map(file_path: str):
+    """Apaga um mapeamento antigo (prospects todos com vetores próprios)."""
+    for caminho in (row_map_path(file_path), row_map_ids_path(file_path),
+                    labels_path(row_map_ids_path(file_path))):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def load_row_map(file_path: str):
+    """(row_map, IdArray dos prospects), ou None se os prospects não foram mapeados."""
+    if not (os.path.exists(row_map_path(file_path)) and os.path.exists(row_map_ids_path(file_path))):
+        return None
+    return np.load(row_map_path(file_path)), IdArray.load(row_map_ids_path(file_path))
+
+
+def unique_candidate_rows(row_map: np.ndarray) -> np.ndarray:
+    """
+    Posições (crescentes) dos prospects buscados: o primeiro prospect de cada
+    candidato e todos os que têm vetor próprio.
+    """
+    _, primeiros = np.unique(np.asarray(row_map, dtype=np.int64), return_index=True)
+    return np.sort(primeiros)
+
+
+class MappedEmbeddings:
+    """
+    Vetores dos prospects vistos como um array 2-D (len, shape, fatias e
+    indexação por linhas), buscados em `applicant_vectors` ou `own_vectors`
+    conforme `row_map`.
+    """
+
+    def __init__(self, applicant_vectors, own_vectors, row_map: np.ndarray):
+        self.applicant_vectors = applicant_vectors
+        self.own_vectors = own_vectors
+        self.row_map = np.asarray(row_map, dtype=np.int64)
+        self.shape = (len(self.row_map), applicant_vectors.shape[1])
+        self.ndim = 2
+        self.dtype = np.dtype(np.float32)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        linhas = self.row_map[key]
+        if np.ndim(linhas) == 0:
+            return self[np.atleast_1d(key)][0]
+        vetores = np.empty((len(linhas), self.shape[1]), dtype=np.float32)
+        candidatos = linhas >= 0
+        if candidatos.any():
+            vetores[candidatos] = self.applicant_vectors[linhas[candidatos]]
+        if not candidatos.all():
+            vetores[~candidatos] = self.own_vectors[-(linhas[~candidatos] + 1)]
+        return vetores
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self[:], dtype=dtype)
+
+    @property
+    def candidate_share(self) -> float:
+        """Fração dos prospects que usam o vetor do candidato."""
+        return float((self.row_map >= 0).mean()) if len(self.row_map) else 0.0
@@ -0,0 +1,34 @@
+"""
+Etapa do processo seletivo de cada situação do prospect.
+
+As situações de prospects.parquet (`situacao_candidado`, após limpar_texto)
+são agrupadas em três etapas: prospectado, avançou no processo (aprovado,
+encaminhado, entrevistas, documentação) e contratado. O funil do painel de
+recrutamento (src/analytics.py) usa essas etapas, e a avaliação offline
+(src/retrieval_eval.py) parte delas para os ganhos de relevância.
+"""
+
+STAGE_PROSPECTED = 1
+STAGE_ADVANCED = 2
+STAGE_HIRED = 3
+
+STAGE_LABELS = {
+    STAGE_PROSPECTED: 'prospectado',
+    STAGE_ADVANCED: 'avançou no processo',
+    STAGE_HIRED: 'contratado',
+}
+
+# Situações fora deste mapa são só prospectadas (DEFAULT_STAGE)
+SITUACAO_STAGES = {
+    'contratado pela decision': STAGE_HIRED,
+    'contratado como hunting': STAGE_HIRED,
+    'aprovado': STAGE_ADVANCED,
+    'proposta aceita': STAGE_ADVANCED,
+    'encaminhado ao requisitante': STAGE_ADVANCED,
+    'entrevista com cliente': STAGE_ADVANCED,
+    'entrevista tecnica': STAGE_ADVANCED,
+    'documentacao clt': STAGE_ADVANCED,
+    'documentacao pj': STAGE_ADVANCED,
+    'documentacao cooperado': STAGE_ADVANCED,
+}
+DEFAULT_STAGE = STAGE_PROSPECTED
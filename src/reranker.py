@@ -0,0 +1,148 @@
+"""
+Segundo estágio opcional de ranqueamento com cross-encoder.
+
+O `find_top_matches` (bi-encoder + cosseno) seleciona um shortlist de ~50
+alvos, que é reordenado por um cross-encoder aplicado aos pares
+(texto da vaga, texto do candidato). Textos longos são divididos em janelas
+que cabem no limite de tokens do modelo e o candidato recebe a maior nota
+entre as suas janelas. As notas de cada par ficam em um cache LRU, e se o
+orçamento de latência estourar o ranking do primeiro estágio é devolvido.
+"""
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.result_cache import LRUCache
+from src.utils import metrics
+
+# Cross-encoder multilíngue (os textos estão em português)
+RERANKER_MODEL_NAME = os.getenv(
+    "RERANKER_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANKER_MAX_LENGTH = 512
+# Tamanho do shortlist vindo do primeiro estágio
+RERANK_TOP_K = 50
+# Orçamento de latência (segundos) do reranqueamento
+RERANK_BUDGET_S = float(os.getenv("RERANK_BUDGET_S", "3.0"))
+RERANK_BATCH_SIZE = 16
+RERANK_CACHE_SIZE = 20_000
+
+# Janelas em palavras: vaga + janela do candidato devem caber em RERANKER_MAX_LENGTH tokens
+JOB_WINDOW_WORDS = 120
+CANDIDATE_WINDOW_WORDS = 200
+CANDIDATE_WINDOW_STRIDE = 150
+MAX_WINDOWS_PER_CANDIDATE = 3
+
+
+def pair_key(job_window: str, candidate_window: str) -> str:
+    """Chave do par (janela da vaga, janela do candidato) no cache de notas."""
+    return hashlib.sha1(
+        f"{job_window}\0{candidate_window}".encode('utf-8')).hexdigest()
+
+
+# Compartilhado entre sessões: o módulo é importado uma única vez pelo Streamlit
+pair_score_cache = LRUCache(RERANK_CACHE_SIZE)
+
+
+@st.cache_resource(show_spinner="Carregando cross-encoder para reranqueamento...")
+def load_cross_encoder():
+    """Carrega o cross-encoder uma única vez por processo."""
+    from sentence_transformers import CrossEncoder
+
+    print(f"DEBUG_RERANK: Carregando cross-encoder '{RERANKER_MODEL_NAME}'.")
+    with metrics.span("reranker_model_load"):
+        return CrossEncoder(RERANKER_MODEL_NAME, max_length=RERANKER_MAX_LENGTH)
+
+
+def text_windows(text: str, window_words: int, stride: int, max_windows: int):
+    """Divide `text` em janelas de palavras sobrepostas (no máximo `max_windows`)."""
+    palavras = str(text).split()
+    if len(palavras) <= window_words:
+        return [' '.join(palavras)]
+    janelas = []
+    for inicio in range(0, len(palavras), stride):
+        janelas.append(' '.join(palavras[inicio:inicio + window_words]))
+        if len(janelas) == max_windows or inicio + window_words >= len(palavras):
+            break
+    return janelas
+
+
+def _first_stage(top_matches_df: pd.DataFrame, top_n: int) -> pd.DataFrame:
+    resultado = top_matches_df.head(top_n).copy()
+    resultado['rerank_score'] = np.nan
+    return resultado
+
+
+def rerank_completed(reranked_df: pd.DataFrame) -> bool:
+    """
+    Falso se `reranked_df` (saída de `rerank_matches`) é o ranking do primeiro
+    estágio devolvido por orçamento estourado: esse resultado não deve ir para
+    caches compartilhados.
+    """
+    return reranked_df.empty or bool(reranked_df['rerank_score'].notna().all())
+
+
+def rerank_matches(job_text: str, top_matches_df: pd.DataFrame, candidate_texts,
+                   top_n: int = 5, budget_s: float = RERANK_BUDGET_S, model=None):
+    """
+    Reordena o shortlist `top_matches_df` (colunas 'id' e 'similarity_score')
+    pelo cross-encoder. `candidate_texts` mapeia id -> texto processado
+    (dict ou Series). Retorna os `top_n` melhores com a coluna 'rerank_score';
+    se o orçamento `budget_s` estourar, devolve o ranking original com
+    'rerank_score' vazio.
+    """
+    if top_matches_df.empty:
+        return top_matches_df
+
+    model = model or load_cross_encoder()
+    inicio = time.perf_counter()
+    job_window = text_windows(job_text, JOB_WINDOW_WORDS,
+                              JOB_WINDOW_WORDS, 1)[0]
+
+    # Monta os pares (janela da vaga, janela do candidato) ainda não cacheados
+    pares_por_alvo = []
+    notas_por_par = {}
+    pendentes = {}
+    for match_id in top_matches_df['id']:
+        chaves = []
+        for janela in text_windows(candidate_texts[match_id], CANDIDATE_WINDOW_WORDS,
+                                   CANDIDATE_WINDOW_STRIDE, MAX_WINDOWS_PER_CANDIDATE):
+            chave = pair_key(job_window, janela)
+            chaves.append(chave)
+            nota = pair_score_cache.get(chave)
+            if nota is None:
+                pendentes[chave] = (job_window, janela)
+            else:
+                notas_por_par[chave] = nota
+        pares_por_alvo.append(chaves)
+
+    metrics.inc_counter("rerank_pairs_total", len(pendentes), cache="miss")
+    metrics.inc_counter("rerank_pairs_total",
+                        sum(map(len, pares_por_alvo)) - len(pendentes), cache="hit")
+
+    with metrics.span("rerank"):
+        itens = list(pendentes.items())
+        for posicao in range(0, len(itens), RERANK_BATCH_SIZE):
+            if time.perf_counter() - inicio > budget_s:
+                print(
+                    f"DEBUG_RERANK: Orçamento de {budget_s}s excedido, usando o ranking do primeiro estágio.")
+                metrics.inc_counter("rerank_budget_exceeded_total")
+                return _first_stage(top_matches_df, top_n)
+            lote = itens[posicao:posicao + RERANK_BATCH_SIZE]
+            notas = model.predict([par for _, par in lote],
+                                  batch_size=RERANK_BATCH_SIZE, show_progress_bar=False)
+            for (chave, _), nota in zip(lote, np.asarray(notas).ravel()):
+                notas_por_par[chave] = float(nota)
+                pair_score_cache.put(chave, float(nota))
+
+    resultado = top_matches_df.copy()
+    resultado['rerank_score'] = [
+        max(notas_por_par[chave] for chave in chaves) for chaves in pares_por_alvo
+    ]
+    resultado = resultado.sort_values(by='rerank_score', ascending=False).head(top_n)
+    print(
+        f"DEBUG_RERANK: {len(itens)} pares avaliados em {time.perf_counter() - inicio:.2f}s.")
+    return resultado
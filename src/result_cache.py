@@ -0,0 +1,86 @@
+"""
+Cache dos resultados de matching, compartilhado entre as sessões do app.
+
+Vagas populares são consultadas por vários recrutadores: o resultado de
+cada busca (após o reranqueamento, se usado) fica em um cache LRU em memória,
+com chave (versão dos artefatos, vaga, tipo de alvo, k, filtros). A versão é
+derivada do mtime/tamanho dos arquivos de embeddings, então publicar novos
+embeddings invalida automaticamente as entradas antigas.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from src.utils import metrics
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+
+
+def artifact_version(paths) -> str:
+    """Identificador curto do estado atual (mtime e tamanho) dos arquivos `paths`."""
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        h.update(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}\0".encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+class LRUCache:
+    """
+    Cache LRU (thread-safe) compartilhado entre as sessões: resultados de
+    busca, notas do cross-encoder, consultas analíticas. Os valores não devem
+    ser alterados. Com `metric`, `get_or_compute` conta acertos e faltas no
+    contador `metric` (result="hit" / "miss").
+    """
+
+    def __init__(self, max_size: int, metric: str = None):
+        self.max_size = max_size
+        self.metric = metric
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """
+        Devolve o resultado cacheado de `key` ou executa `compute()` e guarda,
+        a menos que `cacheable(resultado)` seja falso (ex.: resultado parcial).
+        """
+        resultado = self.get(key)
+        if resultado is not None:
+            if self.metric:
+                metrics.inc_counter(self.metric, result="hit")
+            return resultado
+        if self.metric:
+            metrics.inc_counter(self.metric, result="miss")
+        resultado = compute()
+        if cacheable is None or cacheable(resultado):
+            self.put(key, resultado)
+        return resultado
+
+
+# Compartilhado entre sessões: o módulo é importado uma única vez pelo Streamlit
+match_result_cache = LRUCache(RESULT_CACHE_SIZE, metric="match_result_cache_total")
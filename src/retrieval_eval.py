@@ -0,0 +1,107 @@
+"""
+Avaliação offline da busca usando os prospects como gabarito.
+
+prospects.parquet registra quais candidatos foram de fato prospectados para
+cada vaga (`id_vaga_associada`, `id_prospect` = código do candidato) e a
+situação de cada um. Para cada vaga com prospects, esses candidatos são os
+relevantes, com ganho pela situação (contratado > aprovado/encaminhado >
+demais prospectados), e o ranking da busca é avaliado com recall@k, MRR e
+nDCG@k. Todas as vagas são avaliadas de uma vez, sobre as matrizes
+(vagas x k) devolvidas por `batch_top_k`.
+"""
+import numpy as np
+import pandas as pd
+
+from src.prospect_stages import DEFAULT_STAGE, SITUACAO_STAGES
+
+# Ganho de cada situação do prospect: a etapa do processo (contratado 3, avançou 2);
+# as demais situações valem DEFAULT_GAIN
+SITUACAO_GAINS = dict(SITUACAO_STAGES)
+DEFAULT_GAIN = DEFAULT_STAGE
+EVAL_KS = (10, 50)
+
+
+def build_relevance(df_jobs: pd.DataFrame, df_prospects: pd.DataFrame, job_ids, df_candidates: pd.DataFrame,
+                    candidate_ids, gains: dict = None) -> dict:
+    """
+    Gabarito da avaliação:
+    - 'queries': linha de cada vaga avaliada nos embeddings de vagas;
+    - 'keys' / 'gains': pares (consulta, linha do candidato) relevantes,
+      codificados como consulta * n_candidatos + linha e ordenados, com o
+      ganho de cada par;
+    - 'n_candidates'.
+    `job_ids` e `candidate_ids` são os ids dos embeddings (índices de df_jobs e
+    df_candidates). Prospects de candidatos sem embedding são ignorados.
+    """
+    gains = SITUACAO_GAINS if gains is None else gains
+    vaga_por_linha = df_jobs['id_vaga'].reindex(np.asarray(job_ids)).to_numpy()
+    codigo_por_linha = df_candidates['id_candidato'].reindex(np.asarray(candidate_ids)).to_numpy()
+    linha_da_vaga = pd.Series(np.arange(len(vaga_por_linha)), index=vaga_por_linha)
+    linha_do_candidato = pd.Series(np.arange(len(codigo_por_linha)), index=codigo_por_linha)
+    linha_da_vaga = linha_da_vaga[~linha_da_vaga.index.duplicated()]
+    linha_do_candidato = linha_do_candidato[~linha_do_candidato.index.duplicated()]
+
+    pares = pd.DataFrame({
+        'job_row': linha_da_vaga.reindex(df_prospects['id_vaga_associada']).to_numpy(),
+        'row': linha_do_candidato.reindex(df_prospects['id_prospect']).to_numpy(),
+        'gain': df_prospects['situacao_candidado'].astype(str).map(gains).fillna(DEFAULT_GAIN).to_numpy(),
+    }).dropna(subset=['job_row', 'row'])
+    # O mesmo candidato prospectado duas vezes para a vaga conta uma vez, com o maior ganho
+    pares = pares.astype({'job_row': np.int64, 'row': np.int64})
+    pares = pares.groupby(['job_row', 'row'], as_index=False)['gain'].max()
+
+    queries, query_codes = np.unique(pares['job_row'].to_numpy(), return_inverse=True)
+    n_candidates = len(codigo_por_linha)
+    keys = query_codes.astype(np.int64) * n_candidates + pares['row'].to_numpy()
+    order = np.argsort(keys)
+    return {
+        'queries': queries,
+        'keys': keys[order],
+        'gains': pares['gain'].to_numpy(dtype=np.float64)[order],
+        'query_codes': query_codes[order],
+        'n_candidates': n_candidates,
+    }
+
+
+def ranked_gains(ranked_rows: np.ndarray, relevance: dict) -> np.ndarray:
+    """
+    Ganho (0 se irrelevante) de cada posição das matrizes de ranking (consultas
+    x k). Posições vazias do ranking devem vir como -1.
+    """
+    ranked_rows = np.asarray(ranked_rows, dtype=np.int64)
+    keys = np.arange(len(ranked_rows), dtype=np.int64)[:, None] * relevance['n_candidates'] + ranked_rows
+    posicoes = np.searchsorted(relevance['keys'], keys)
+    posicoes = np.minimum(posicoes, len(relevance['keys']) - 1)
+    encontrados = relevance['keys'][posicoes] == keys
+    return np.where(encontrados & (ranked_rows >= 0), relevance['gains'][posicoes], 0.0)
+
+
+def evaluate_rankings(ranked_rows: np.ndarray, relevance: dict, ks=EVAL_KS) -> dict:
+    """
+    Médias por vaga de recall@k, nDCG@k (para cada k em `ks`) e MRR, dado o
+    ranking (consultas x k) das vagas em `relevance['queries']`, na mesma ordem.
+    """
+    ganhos = ranked_gains(ranked_rows, relevance)
+    relevantes = ganhos > 0
+    n_queries, profundidade = ganhos.shape
+    n_relevantes = np.bincount(relevance['query_codes'], minlength=n_queries)
+
+    primeiro = np.where(relevantes.any(axis=1), relevantes.argmax(axis=1) + 1, np.inf)
+    resultado = {'mrr': float(np.mean(1.0 / primeiro))}
+
+    descontos = 1.0 / np.log2(np.arange(2, profundidade + 2))
+    # Ganhos ideais: os de cada consulta em ordem decrescente, completados com zeros
+    ideais = np.zeros((n_queries, profundidade))
+    ordem = np.lexsort((-relevance['gains'], relevance['query_codes']))
+    codigos, ganhos_ordenados = relevance['query_codes'][ordem], relevance['gains'][ordem]
+    posicao = np.arange(len(codigos)) - np.searchsorted(codigos, codigos)
+    dentro = posicao < profundidade
+    ideais[codigos[dentro], posicao[dentro]] = ganhos_ordenados[dentro]
+
+    for k in ks:
+        k_efetivo = min(k, profundidade)
+        resultado[f'recall@{k}'] = float(np.mean(relevantes[:, :k_efetivo].sum(axis=1) / n_relevantes))
+        dcg = ganhos[:, :k_efetivo] @ descontos[:k_efetivo]
+        idcg = ideais[:, :k_efetivo] @ descontos[:k_efetivo]
+        resultado[f'ndcg@{k}'] = float(np.mean(dcg / idcg))
+    return resultado
@@ -0,0 +1,198 @@
+"""
+Busca particionada (scatter-gather) em processos locais.
+
+Os vetores de um alvo (arquivo .npy de candidatos ou prospects, completo ou
+reduzido) são divididos em `n_shards` faixas contíguas de linhas. Cada faixa
+é atendida por um processo próprio, que mapeia só a sua parte do arquivo em
+memória e responde o top k local. O coordenador (`ShardedSearcher`) envia a
+consulta a todos os shards, junta os tops locais e devolve o top k global.
+
+Se um shard não responde dentro de `timeout_s` a busca segue com os shards
+que responderam (resultado parcial, devolvido com a lista dos shards que
+faltaram), e um processo que morreu é recriado na consulta seguinte. Um shard
+atrasado descarta as consultas abandonadas da sua fila e responde só a mais
+recente. Sem nenhuma resposta,
+`search` devolve None e o chamador faz a busca no próprio processo.
+"""
+import contextlib
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import streamlit as st
+
+from src.utils import metrics
+from src.vector_search import merge_top_k, normalize, scan_top_k, sorted_by_score
+
+SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", "0"))
+SHARD_TIMEOUT_S = float(os.getenv("SHARD_TIMEOUT_S", "2.0"))
+SHARD_STARTUP_TIMEOUT_S = 60.0
+SHARD_BLOCK_SIZE = 65536
+
+
+@contextlib.contextmanager
+def _bare_main():
+    """
+    O spawn reexecuta o módulo __main__ nos filhos; no Streamlit ele é o
+    script do app, que iniciaria os shards de novo. Durante o start os filhos
+    veem um __main__ vazio.
+    """
+    main = sys.modules.get('__main__')
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+def _serve_shard(shard, vectors_path, start, stop, requests, responses, delay_s):
+    """Laço do processo de um shard: responde (id, shard, linhas, scores) à consulta mais recente."""
+    vectors = np.load(vectors_path, mmap_mode='r')[start:stop]
+    responses.put((None, shard, None, None))  # pronto
+    while True:
+        request = requests.get()
+        # Consultas que o coordenador já abandonou (timeout) continuam na fila:
+        # responde só a mais recente, para o shard não ficar atrasado para sempre
+        try:
+            while request is not None:
+                request = requests.get_nowait()
+        except queue.Empty:
+            pass
+        if request is None:
+            break
+        request_id, query, k = request
+        if delay_s:
+            time.sleep(delay_s)
+        rows, scores = scan_top_k(query, vectors, k, block_size=SHARD_BLOCK_SIZE)
+        responses.put((request_id, shard, rows + start, scores))
+
+
+class ShardedSearcher:
+    """
+    Coordenador da busca particionada sobre o arquivo `vectors_path` (.npy).
+    `shard_delay_s` ({shard: segundos}) atrasa shards de propósito, para testar
+    a degradação.
+    """
+
+    def __init__(self, vectors_path: str, n_shards: int = SEARCH_SHARDS,
+                 timeout_s: float = SHARD_TIMEOUT_S, shard_delay_s: dict = None):
+        self.vectors_path = vectors_path
+        self.n_rows = len(np.load(vectors_path, mmap_mode='r'))
+        self.n_shards = max(1, min(n_shards, self.n_rows))
+        self.timeout_s = timeout_s
+        self.shard_delay_s = shard_delay_s or {}
+        self.bounds = np.linspace(0, self.n_rows, self.n_shards + 1).astype(np.int64)
+
+        # spawn: o processo do app tem threads (Streamlit), fork não é seguro
+        self._context = multiprocessing.get_context('spawn')
+        self._responses = self._context.Queue()
+        self._requests = [None] * self.n_shards
+        self._processes = [None] * self.n_shards
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        for shard in range(self.n_shards):
+            self._start_shard(shard)
+
+        # Espera os processos carregarem (spawn); os que não subirem contam como lentos
+        self.ready_shards, deadline = 0, time.monotonic() + SHARD_STARTUP_TIMEOUT_S
+        while self.ready_shards < self.n_shards and time.monotonic() < deadline:
+            try:
+                self._responses.get(timeout=0.5)
+                self.ready_shards += 1
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    break
+        print(f"DEBUG_SHARD: {self.ready_shards}/{self.n_shards} shards iniciados para {vectors_path} "
+              f"({self.n_rows} linhas).")
+
+    def _start_shard(self, shard):
+        self._requests[shard] = self._context.Queue()
+        self._processes[shard] = self._context.Process(
+            target=_serve_shard, daemon=True, name=f"shard-{shard}",
+            args=(shard, self.vectors_path, int(self.bounds[shard]), int(self.bounds[shard + 1]),
+                  self._requests[shard], self._responses, self.shard_delay_s.get(shard, 0)))
+        with _bare_main():
+            self._processes[shard].start()
+
+    def search(self, query_embedding: np.ndarray, k: int):
+        """
+        Top k global: (linhas, scores em ordem decrescente, shards que não
+        responderam a tempo). Linhas e scores são None se nenhum shard
+        respondeu. O coordenador é compartilhado entre as sessões, então os
+        shards que faltaram voltam com o resultado, não ficam na instância.
+        """
+        query = normalize(np.ravel(query_embedding))
+
+        with self._lock, metrics.span("sharded_search", shards=self.n_shards):
+            request_id = next(self._ids)
+            for shard, process in enumerate(self._processes):
+                if not process.is_alive():
+                    print(f"DEBUG_SHARD: Shard {shard} parado. Reiniciando.")
+                    metrics.inc_counter("shard_restarts_total", shard=str(shard))
+                    self._start_shard(shard)
+                self._requests[shard].put((request_id, query, k))
+
+            rows, scores, answered = [], [], set()
+            deadline = time.monotonic() + self.timeout_s
+            while len(answered) < self.n_shards:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    response_id, shard, shard_rows, shard_scores = self._responses.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                # Respostas atrasadas de consultas anteriores (e avisos de pronto) são descartadas
+                if response_id != request_id:
+                    continue
+                answered.add(shard)
+                rows.append(shard_rows)
+                scores.append(shard_scores)
+
+        missing_shards = sorted(set(range(self.n_shards)) - answered)
+        for shard in missing_shards:
+            metrics.inc_counter("shard_timeouts_total", shard=str(shard))
+        if missing_shards:
+            print(f"DEBUG_SHARD: Shards {missing_shards} não responderam em {self.timeout_s}s. "
+                  f"Resultado parcial.")
+        if not rows:
+            return None, None, missing_shards
+
+        rows, scores = sorted_by_score(*merge_top_k(
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32),
+            np.concatenate(rows), np.concatenate(scores), k))
+        return rows, scores, missing_shards
+
+    def close(self):
+        for shard, process in enumerate(self._processes):
+            if process.is_alive():
+                self._requests[shard].put(None)
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+
+@st.cache_resource(show_spinner="Iniciando shards de busca...")
+def get_sharded_searcher(vectors_path: str, n_shards: int = SEARCH_SHARDS, version: str = None):
+    """
+    Coordenador compartilhado entre as sessões, ou None se a busca particionada
+    está desligada (SEARCH_SHARDS < 2), os vetores não estão em .npy ou
+    nenhum shard conseguiu iniciar.
+    `version` só entra na chave do cache, para recriar os shards quando os
+    arquivos mudarem.
+    """
+    if n_shards < 2 or not vectors_path or not os.path.exists(vectors_path):
+        return None
+    searcher = ShardedSearcher(vectors_path, n_shards)
+    if searcher.ready_shards == 0:
+        print("DEBUG_SHARD: Nenhum shard iniciou. Usando a busca no próprio processo.")
+        searcher.close()
+        return None
+    return searcher
@@ -0,0 +1,146 @@
+"""
+Distribuição global de candidatos entre todas as vagas abertas.
+
+O top N de cada vaga, calculado isoladamente, costuma indicar o mesmo
+candidato forte para dezenas de vagas. Aqui a recomendação é feita para
+todas as vagas de uma vez:
+1. grafo esparso vaga x candidato com os `k` candidatos mais próximos de cada
+   vaga, calculado com produtos matriz x matriz em blocos (nunca existe a
+   matriz densa de similaridades);
+2. atribuição com capacidade (b-matching): cada vaga recebe até `per_job`
+   candidatos e cada candidato é proposto a no máximo `max_per_candidate`
+   vagas, maximizando a soma das similaridades. A matriz de restrições do
+   grafo bipartido é totalmente unimodular, então o LP resolvido pelo HiGHS
+   (simplex) já devolve uma solução inteira; sem o SciPy, ou se o solver
+   falhar, usa uma atribuição gulosa pelos maiores scores.
+"""
+import numpy as np
+import pandas as pd
+
+from src.embedding_projection import project
+from src.id_array import IdArray
+from src.utils import metrics
+from src.vector_search import batch_top_k
+
+STAFFING_TOP_K = 50
+DEFAULT_PER_JOB = 5
+DEFAULT_MAX_PER_CANDIDATE = 1
+GRAPH_CANDIDATE_BLOCK = 16384
+GRAPH_JOB_BLOCK = 512
+
+
+def build_match_graph(job_embeddings: np.ndarray, candidate_embeddings: np.ndarray,
+                      k: int = STAFFING_TOP_K, candidate_block: int = GRAPH_CANDIDATE_BLOCK,
+                      job_block: int = GRAPH_JOB_BLOCK):
+    """
+    Arestas (vaga, linha do candidato, similaridade) com os `k` candidatos mais
+    próximos de cada vaga, via `batch_top_k` (vagas em grupos de `job_block`,
+    candidatos, que podem ser um memmap, em blocos de `candidate_block`).
+    """
+    with metrics.span("staffing_graph", jobs=len(job_embeddings)):
+        rows, scores = batch_top_k(job_embeddings, candidate_embeddings, k,
+                                   block_size=candidate_block, query_block=job_block)
+    return np.repeat(np.arange(len(job_embeddings)), rows.shape[1]), rows.ravel(), scores.ravel()
+
+
+def _greedy_assignment(jobs, rows, scores, per_job, max_per_candidate):
+    """Aceita as arestas do maior para o menor score enquanto houver capacidade."""
+    job_load = np.zeros(jobs.max() + 1 if len(jobs) else 0, dtype=np.int64)
+    candidate_load = {}
+    chosen = np.zeros(len(jobs), dtype=bool)
+    for edge in np.lexsort((rows, jobs, -scores)):
+        job, row = jobs[edge], rows[edge]
+        if job_load[job] < per_job and candidate_load.get(row, 0) < max_per_candidate:
+            job_load[job] += 1
+            candidate_load[row] = candidate_load.get(row, 0) + 1
+            chosen[edge] = True
+    return chosen
+
+
+def _lp_assignment(jobs, rows, scores, per_job, max_per_candidate):
+    """b-matching de peso máximo via LP (HiGHS). Devolve None se o solver falhar."""
+    from scipy import sparse
+    from scipy.optimize import linprog
+
+    n_edges = len(jobs)
+    job_codes = np.unique(jobs, return_inverse=True)[1]
+    candidate_codes = np.unique(rows, return_inverse=True)[1]
+    n_job_nodes, n_candidate_nodes = job_codes.max() + 1, candidate_codes.max() + 1
+
+    # Uma linha por vaga e uma por candidato; cada aresta entra nas duas
+    restricoes = sparse.csr_matrix(
+        (np.ones(2 * n_edges),
+         (np.concatenate([job_codes, n_job_nodes + candidate_codes]), np.tile(np.arange(n_edges), 2))),
+        shape=(n_job_nodes + n_candidate_nodes, n_edges))
+    capacidades = np.concatenate([np.full(n_job_nodes, per_job), np.full(n_candidate_nodes, max_per_candidate)])
+
+    resultado = linprog(-np.asarray(scores, dtype=np.float64), A_ub=restricoes, b_ub=capacidades,
+                        bounds=(0, 1), method='highs-ds')
+    if resultado.status != 0:
+        print(f"DEBUG_STAFFING: Solver LP falhou ({resultado.message}). Usando atribuição gulosa.")
+        return None
+    return resultado.x > 0.5
+
+
+def solve_assignment(jobs: np.ndarray, rows: np.ndarray, scores: np.ndarray,
+                     per_job: int = DEFAULT_PER_JOB, max_per_candidate: int = DEFAULT_MAX_PER_CANDIDATE,
+                     method: str = 'lp') -> np.ndarray:
+    """
+    Máscara das arestas escolhidas. `method`: 'lp' (ótimo, com fallback
+    guloso) ou 'greedy'. Arestas com similaridade <= 0 nunca são escolhidas.
+    """
+    if method not in ('lp', 'greedy'):
+        raise ValueError(f"Método '{method}' inválido. Use 'lp' ou 'greedy'.")
+    chosen = np.zeros(len(jobs), dtype=bool)
+    positivas = np.flatnonzero(scores > 0)
+    if len(positivas) == 0:
+        return chosen
+
+    with metrics.span("staffing_assignment", method=method):
+        mask = None
+        if method == 'lp':
+            try:
+                mask = _lp_assignment(jobs[positivas], rows[positivas], scores[positivas],
+                                      per_job, max_per_candidate)
+            except ImportError:
+                print("DEBUG_STAFFING: SciPy não disponível. Usando atribuição gulosa.")
+        if mask is None:
+            mask = _greedy_assignment(jobs[positivas], rows[positivas], scores[positivas],
+                                      per_job, max_per_candidate)
+    chosen[positivas[mask]] = True
+    return chosen
+
+
+def optimize_staffing(job_embeddings: np.ndarray, job_ids, target_embeddings_data: dict,
+                      per_job: int = DEFAULT_PER_JOB, max_per_candidate: int = DEFAULT_MAX_PER_CANDIDATE,
+                      k: int = STAFFING_TOP_K, method: str = 'lp') -> pd.DataFrame:
+    """
+    Candidatos propostos para cada vaga na distribuição global. Devolve um
+    DataFrame com 'job_id', 'id' (candidato), 'similarity_score', 'row' e
+    'rank' (posição do candidato no top k da vaga, 1 = mais próximo),
+    ordenado por vaga e score.
+    """
+    # Com o candidato limitado a poucas vagas, o top k precisa folga além do per_job
+    k = max(k, per_job)
+    metrics.inc_counter("staffing_optimizer_total", method=method)
+    with metrics.span("optimize_staffing", method=method):
+        if target_embeddings_data.get('projection') is not None:
+            job_embeddings = project(job_embeddings, target_embeddings_data['projection'])
+        jobs, rows, scores = build_match_graph(job_embeddings, target_embeddings_data['embeddings'], k)
+        rank = pd.Series(scores).groupby(jobs).rank(method='first', ascending=False).to_numpy(dtype=np.int64)
+        chosen = solve_assignment(jobs, rows, scores, per_job, max_per_candidate, method)
+
+    job_ids = np.asarray(job_ids)
+    target_ids = IdArray.from_values(target_embeddings_data['ids'])
+    resultado = pd.DataFrame({
+        'job_id': job_ids[jobs[chosen]],
+        'id': target_ids[rows[chosen]],
+        'similarity_score': scores[chosen],
+        'row': rows[chosen],
+        'rank': rank[chosen],
+        '_job': jobs[chosen],
+    }).sort_values(['_job', 'similarity_score'], ascending=[True, False], ignore_index=True)
+
+    print(f"DEBUG_STAFFING: {len(resultado)} propostas para {len(job_ids)} vagas "
+          f"({resultado['id'].nunique()} candidatos distintos, {method}).")
+    return resultado.drop(columns='_job')
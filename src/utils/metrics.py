@@ -0,0 +1,267 @@
+"""
+Camada leve de métricas (spans de tempo, contadores e histogramas).
+
+Desabilitada por padrão: sem METRICS_ENABLED=True, `span` devolve um
+contexto nulo compartilhado e os contadores retornam imediatamente, então o
+custo nos caminhos críticos é de uma verificação de booleano.
+
+Exposição:
+- `render_prometheus()` gera o texto no formato de exposição do Prometheus;
+- `start_http_server(porta)` serve esse texto em /metrics (METRICS_PORT);
+- `start_periodic_dump(caminho, intervalo)` grava um JSON periodicamente
+  (METRICS_DUMP_PATH / METRICS_DUMP_INTERVAL);
+- `render_streamlit_panel()` mostra as métricas no app.
+"""
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+_enabled = os.getenv("METRICS_ENABLED", "False") == "True"
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_started = False
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, limite in enumerate(self.buckets):
+            if value <= limite:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+
+def enable(active: bool = True):
+    """Liga ou desliga a coleta em tempo de execução."""
+    global _enabled
+    _enabled = active
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Descarta todas as métricas coletadas."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def inc_counter(name: str, value: float = 1, **labels):
+    """Incrementa um contador."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    """Registra uma observação em um histograma."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(value)
+
+
+@contextlib.contextmanager
+def _timed_span(name, labels):
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        inc_counter(f"{name}_errors_total", **labels)
+        raise
+    finally:
+        observe(f"{name}_seconds", time.perf_counter() - inicio, **labels)
+
+
+def span(name: str, **labels):
+    """
+    Context manager que mede a duração do bloco no histograma `<name>_seconds`
+    e conta exceções em `<name>_errors_total`.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _timed_span(name, labels)
+
+
+def _format_labels(labels, extra=None):
+    pares = list(labels) + (list(extra) if extra else [])
+    if not pares:
+        return ""
+    texto = ",".join(f'{k}="{str(v)}"' for k, v in pares)
+    return "{" + texto + "}"
+
+
+def render_prometheus() -> str:
+    """Gera as métricas no formato de texto do Prometheus."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: (h.buckets, list(h.counts), h.sum, h.count)
+                      for k, h in _histograms.items()}
+
+    linhas = []
+    tipos_emitidos = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in tipos_emitidos:
+            linhas.append(f"# TYPE {name} counter")
+            tipos_emitidos.add(name)
+        linhas.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), (buckets, counts, soma, total) in sorted(histograms.items()):
+        if name not in tipos_emitidos:
+            linhas.append(f"# TYPE {name} histogram")
+            tipos_emitidos.add(name)
+        acumulado = 0
+        for limite, quantidade in zip(buckets, counts):
+            acumulado += quantidade
+            le = "+Inf" if math.isinf(limite) else repr(limite)
+            linhas.append(
+                f"{name}_bucket{_format_labels(labels, [('le', le)])} {acumulado}")
+        linhas.append(f"{name}_sum{_format_labels(labels)} {soma}")
+        linhas.append(f"{name}_count{_format_labels(labels)} {total}")
+    return "\n".join(linhas) + "\n"
+
+
+def snapshot() -> dict:
+    """Retorna as métricas atuais como dicionário serializável em JSON."""
+    with _lock:
+        return {
+            "timestamp": time.time(),
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in _counters.items()
+            ],
+            "histograms": [
+                {"name": name, "labels": dict(labels), "count": h.count,
+                 "sum": h.sum, "max": h.max,
+                 "mean": h.sum / h.count if h.count else 0.0}
+                for (name, labels), h in _histograms.items()
+            ],
+        }
+
+
+def dump_json(path: str):
+    """Grava o snapshot atual em `path` (escrita atômica)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporario = f"{path}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(temporario, path)
+
+
+def start_periodic_dump(path: str, interval_s: float = 60.0):
+    """Inicia uma thread daemon que grava o snapshot a cada `interval_s` segundos."""
+    def _loop():
+        while True:
+            time.sleep(interval_s)
+            try:
+                dump_json(path)
+            except Exception as e:
+                print(f"DEBUG_METRICS: ERRO ao gravar métricas em {path}: {e}")
+
+    thread = threading.Thread(target=_loop, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "0.0.0.0"):
+    """Serve /metrics no formato Prometheus em uma thread daemon."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever,
+                              name="metrics-http", daemon=True)
+    thread.start()
+    print(f"DEBUG_METRICS: Endpoint Prometheus em http://{host}:{port}/metrics")
+    return server
+
+
+def start_from_env():
+    """
+    Inicia os exportadores configurados por variáveis de ambiente
+    (METRICS_PORT, METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL). Idempotente.
+    """
+    global _started
+    with _lock:
+        if _started or not _enabled:
+            return
+        _started = True
+
+    porta = os.getenv("METRICS_PORT")
+    if porta:
+        try:
+            start_http_server(int(porta))
+        except OSError as e:
+            print(f"DEBUG_METRICS: ERRO ao iniciar endpoint na porta {porta}: {e}")
+
+    caminho = os.getenv("METRICS_DUMP_PATH")
+    if caminho:
+        start_periodic_dump(caminho, float(
+            os.getenv("METRICS_DUMP_INTERVAL", "60")))
+
+
+def render_streamlit_panel():
+    """Mostra contadores e histogramas em um painel de debug do Streamlit."""
+    import pandas as pd
+    import streamlit as st
+
+    dados = snapshot()
+    if not dados["histograms"] and not dados["counters"]:
+        st.caption("Nenhuma métrica coletada ainda.")
+        return
+
+    if dados["histograms"]:
+        df_hist = pd.DataFrame(dados["histograms"])
+        df_hist["labels"] = df_hist["labels"].astype(str)
+        st.dataframe(df_hist.sort_values("sum", ascending=False),
+                     use_container_width=True)
+    if dados["counters"]:
+        df_count = pd.DataFrame(dados["counters"])
+        df_count["labels"] = df_count["labels"].astype(str)
+        st.dataframe(df_count, use_container_width=True)
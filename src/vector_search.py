@@ -0,0 +1,94 @@
+"""
+Busca exata por cosseno em blocos (top k), sem dependência do modelo.
+
+Usado pelo matching do app (src/nlp_matcher.py), pelos shards
+(src/sharded_search.py), pela distribuição global, pelos clusters e pelos
+scripts de avaliação. Os embeddings, que podem ser um memmap maior que a RAM,
+são varridos em blocos normalizados; cada bloco é comparado com todas as
+consultas em um único produto matriz x matriz e só os `k` melhores de cada
+consulta são mantidos.
+"""
+import numpy as np
+
+# Linhas dos embeddings avaliadas por bloco
+SCAN_BLOCK_SIZE = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Vetores (1-D ou um por linha) com norma 1, em float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+
+def normalized_blocks(embeddings: np.ndarray, rows: np.ndarray = None, block_size: int = SCAN_BLOCK_SIZE):
+    """Percorre os embeddings (ou só as `rows`) em blocos normalizados (linhas, vetores)."""
+    total = embeddings.shape[0] if rows is None else len(rows)
+    for start in range(0, total, block_size):
+        if rows is None:
+            block_rows = np.arange(start, min(start + block_size, total))
+            block = embeddings[start:start + block_size]
+        else:
+            block_rows = np.asarray(rows[start:start + block_size], dtype=np.int64)
+            block = embeddings[block_rows]
+        yield block_rows, normalize(block)
+
+
+def merge_top_k(best_rows, best_scores, rows, scores, k):
+    """
+    Junta os candidatos novos aos melhores até agora e mantém só os `k` maiores
+    scores, por consulta (último eixo: arrays 1-D ou uma linha por consulta).
+    """
+    best_rows = np.concatenate([best_rows, rows], axis=-1)
+    best_scores = np.concatenate([best_scores, scores], axis=-1)
+    if best_scores.shape[-1] > k:
+        keep = np.argpartition(-best_scores, k - 1, axis=-1)[..., :k]
+        best_rows = np.take_along_axis(best_rows, keep, axis=-1)
+        best_scores = np.take_along_axis(best_scores, keep, axis=-1)
+    return best_rows, best_scores
+
+
+def sorted_by_score(rows, scores):
+    """Score decrescente por consulta; empates pela posição nos embeddings."""
+    order = np.lexsort((rows, -scores), axis=-1)
+    return np.take_along_axis(rows, order, axis=-1), np.take_along_axis(scores, order, axis=-1)
+
+
+def scan_top_k(query_embeddings: np.ndarray, embeddings: np.ndarray, k: int, rows: np.ndarray = None,
+               block_size: int = SCAN_BLOCK_SIZE):
+    """
+    Linhas e scores de cosseno dos `k` embeddings mais próximos de cada
+    consulta, em ordem decrescente. Com uma consulta 1-D devolve arrays 1-D;
+    com várias (uma por linha), matrizes (consultas x k). Os embeddings (ou só
+    as `rows` indicadas) são varridos em blocos, sem materializar a matriz de
+    scores completa.
+    """
+    queries = normalize(np.atleast_2d(query_embeddings))
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for block_rows, block in normalized_blocks(embeddings, rows, block_size):
+        best_rows, best_scores = merge_top_k(
+            best_rows, best_scores,
+            np.broadcast_to(block_rows, (len(queries), len(block_rows))), queries @ block.T, k)
+    best_rows, best_scores = sorted_by_score(best_rows, best_scores)
+    if np.ndim(query_embeddings) == 1:
+        return best_rows[0], best_scores[0]
+    return best_rows, best_scores
+
+
+def batch_top_k(query_embeddings: np.ndarray, embeddings: np.ndarray, k: int,
+                block_size: int = 16384, query_block: int = 512):
+    """
+    Top `k` para muitas consultas de uma vez: matrizes (consultas x k) com as
+    linhas e os scores de cosseno, em ordem decrescente por consulta. As
+    consultas são processadas em grupos de `query_block` (limita a matriz de
+    scores de cada bloco de alvos) com `scan_top_k`.
+    """
+    n_queries, k = len(query_embeddings), min(k, embeddings.shape[0])
+    all_rows = np.empty((n_queries, k), dtype=np.int64)
+    all_scores = np.empty((n_queries, k), dtype=np.float32)
+    for query_start in range(0, n_queries, query_block):
+        queries = np.atleast_2d(query_embeddings[query_start:query_start + query_block])
+        rows, scores = scan_top_k(queries, embeddings, k, block_size=block_size)
+        all_rows[query_start:query_start + len(queries)] = rows
+        all_scores[query_start:query_start + len(queries)] = scores
+    return all_rows, all_scores